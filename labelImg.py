@@ -7,6 +7,7 @@ import platform
 import shutil
 import sys
 import webbrowser as wb
+from collections import Counter
 from functools import partial
 
 import cv2
@@ -45,13 +46,27 @@ from libs.colorDialog import ColorDialog
 from libs.labelFile import LabelFile, LabelFileError, LabelFileFormat
 from libs.toolBar import ToolBar
 from libs.pascal_voc_io import PascalVocReader
-from libs.pascal_voc_io import XML_EXT
+from libs.pascal_voc_io import XML_EXT, is_verified
 from libs.yolo_io import YoloReader
 from libs.yolo_io import TXT_EXT
 from libs.create_ml_io import CreateMLReader
 from libs.create_ml_io import JSON_EXT
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
+from libs.imageBuffer import ImageBuffer
+from libs.annotationIndex import AnnotationIndex
+from libs.dirManifest import DirectoryManifest, ManifestScanWorker
+from libs.fileIndex import FileIndex
+from libs.fileListModel import STATUS_EMPTY, STATUS_LABELLED, STATUS_VERIFIED, FileListModel
+from libs.imagePrefetcher import PREFETCH_NEXT, PREFETCH_PREV, ImagePrefetcher, decode_image, decode_preview
+from libs.fog_metrics import DEFAULT_FOG_METRIC, batch_fog_metrics, detect_fog, select_metric
+from libs.fog_extract import FogTrainDataJob, default_worker_count, read_txt_labels
+from libs.dataset_tools import (CopyBboxRandomlyJob, CopyImagesWithBboxJob, ExtractClass0Job, ExtractTrainDataJob,
+                                FogVideoLabelJob, RotationAugmentationJob, UnifyBboxSizesJob, VideoLabelJob,
+                                boxes_overlap, label_path_for, rotate_roi)
+from libs.batchJob import JobCheckpoint
+from libs.jobDock import JobProgressDock
+from libs.polygon_mask import PolygonCoverage
 
 __appname__ = 'labelImg'
 
@@ -99,6 +114,10 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # For loading all image under a directory
         self.m_img_list = []
+        # 目录中的全部图像；按文件名搜索时 m_img_list 只含搜索结果
+        self.all_img_list = self.m_img_list
+        self.search_index = FileIndex(self.all_img_list)
+        self.file_index = self.search_index
         self.dir_name = None
         self.label_hist = []
         self.last_open_dir = None
@@ -126,6 +145,8 @@ class MainWindow(QMainWindow, WindowMixin):
 
         self.items_to_shapes = {}
         self.shapes_to_items = {}
+        # 标签 -> 检测框数量，随标签列表增量维护
+        self.label_counts = Counter()
         self.prev_label_text = ''
 
         list_layout = QVBoxLayout()
@@ -207,12 +228,31 @@ class MainWindow(QMainWindow, WindowMixin):
         self.fog_threshold_edit.setStyleSheet("QLineEdit{background-color:white;color:black;font-size:14px;font-weight:bold;border-radius:6px;padding:5px;}")
         self.fog_threshold_edit.setFixedHeight(30)
         self.fog_threshold_edit.setAlignment(Qt.AlignCenter)
+        # 修改阈值时实时重新评估当前图像的所有检测框
+        self.fog_threshold_edit.textChanged.connect(self.refresh_fog_results)
         
         # 阈值设置水平布局
         self.h_layout = QHBoxLayout()
         self.h_layout.addWidget(self.fog_threshold_label)
         self.h_layout.addWidget(self.fog_threshold_edit)
         fog_layout.addLayout(self.h_layout)
+
+        # 并行进程数设置
+        self.fog_workers_label = QLabel('提取训练数据的并行进程数:')
+        self.fog_workers_label.setAlignment(Qt.AlignCenter)
+        self.fog_workers_label.setStyleSheet("QLabel{background-color:white;color:black;font-size:14px;font-weight:bold;border-radius:6px;padding:5px;}")
+
+        self.fog_workers_edit = QLineEdit(str(default_worker_count()))
+        self.fog_workers_edit.setValidator(QIntValidator(1, 256))
+        self.fog_workers_edit.setFixedWidth(200)
+        self.fog_workers_edit.setStyleSheet("QLineEdit{background-color:white;color:black;font-size:14px;font-weight:bold;border-radius:6px;padding:5px;}")
+        self.fog_workers_edit.setFixedHeight(30)
+        self.fog_workers_edit.setAlignment(Qt.AlignCenter)
+
+        self.workers_layout = QHBoxLayout()
+        self.workers_layout.addWidget(self.fog_workers_label)
+        self.workers_layout.addWidget(self.fog_workers_edit)
+        fog_layout.addLayout(self.workers_layout)
         
         # 根据阈值生成视频标签按钮
         self.generate_video_label_with_fog_threshold_button = QPushButton('根据阈值生成视频标签')
@@ -512,12 +552,32 @@ class MainWindow(QMainWindow, WindowMixin):
         self.dock.setWidget(label_list_container)
 
         # 文件列表区域（变大）
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.itemDoubleClicked.connect(self.file_item_double_clicked)
+        # 文件列表直接显示 m_img_list，只为可见行生成标注状态图标
+        self.file_list_model = FileListModel(self.annotation_status, self)
+        self.file_list_widget = QListView()
+        self.file_list_widget.setUniformItemSizes(True)
+        # 分批布局，几十万行时界面也不会卡住
+        self.file_list_widget.setLayoutMode(QListView.Batched)
+        self.file_list_widget.setBatchSize(1000)
+        self.file_list_widget.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.file_list_widget.setModel(self.file_list_model)
+        self.file_list_widget.doubleClicked.connect(self.file_item_double_clicked)
         self.file_list_widget.setMinimumHeight(300)  # 设置最小高度，让文件列表变大
-        
+
+        # 按文件名过滤文件列表，回车打开第一个结果
+        self.file_search_edit = QLineEdit()
+        self.file_search_edit.setPlaceholderText("搜索文件名，回车打开")
+        self.file_search_edit.setClearButtonEnabled(True)
+        self.file_search_timer = QTimer(self)
+        self.file_search_timer.setSingleShot(True)
+        self.file_search_timer.setInterval(200)
+        self.file_search_timer.timeout.connect(self.apply_file_filter)
+        self.file_search_edit.textChanged.connect(self.file_search_timer.start)
+        self.file_search_edit.returnPressed.connect(self.open_first_search_result)
+
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
+        file_list_layout.addWidget(self.file_search_edit)
         file_list_layout.addWidget(self.file_list_widget)
         file_list_container = QWidget()
         file_list_container.setLayout(file_list_layout)
@@ -554,6 +614,12 @@ class MainWindow(QMainWindow, WindowMixin):
         self.addDockWidget(Qt.RightDockWidgetArea, self.file_dock)
         self.file_dock.setFeatures(QDockWidget.DockWidgetFloatable)
 
+        # 批处理任务面板：后台任务的进度、取消和失败条目
+        self.job_dock = JobProgressDock('批处理任务', self)
+        self.job_dock.setObjectName('jobs')
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.job_dock)
+        self.job_dock.hide()
+
         self.dock_features = QDockWidget.DockWidgetClosable | QDockWidget.DockWidgetFloatable
         self.dock.setFeatures(self.dock.features() ^ self.dock_features)
 
@@ -827,6 +893,23 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # Application state.
         self.image = QImage()
+        # NumPy view of self.image shared by fog detection, cutting and augmentation
+        self.image_buffer = ImageBuffer()
+        # 后台预解码相邻图像，翻页时不再等待解码
+        self.image_prefetcher = ImagePrefetcher(self)
+        self.image_prefetcher.image_decoded.connect(self.full_image_decoded)
+        # 各目录中已有的标注文件，代替每次载入图像时逐个探测
+        self.annotation_index = AnnotationIndex(self)
+        self.annotation_index.changed.connect(self.file_list_model.invalidate_status)
+        # 后台扫描当前打开目录的任务
+        self._scan_worker = None
+        # 以预览分辨率显示、正在后台解码原图的图像：(路径, 缩小倍数)
+        self._preview = None
+        self._full_image = None
+        # 当前图像各检测框的雾度量：(图像 key, ROI 元组, (mean_ratio, ratio_of_means))
+        self._fog_scores = None
+        # 雾检测计算方式，批处理与交互检测共用同一个
+        self.fog_metric = DEFAULT_FOG_METRIC
         self.file_path = ustr(default_filename)
         self.last_open_dir = None
         self.recent_files = []
@@ -865,11 +948,9 @@ class MainWindow(QMainWindow, WindowMixin):
             self.statusBar().show()
 
         self.restoreState(settings.get(SETTING_WIN_STATE, QByteArray()))
-        Shape.line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR, DEFAULT_LINE_COLOR))
-        Shape.fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR, DEFAULT_FILL_COLOR))
+        Shape.default_line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR, DEFAULT_LINE_COLOR))
+        Shape.default_fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR, DEFAULT_FILL_COLOR))
         self.canvas.set_drawing_color(self.line_color)
-        # Add chris
-        Shape.difficult = self.difficult
 
         def xbool(x):
             if isinstance(x, QVariant):
@@ -926,84 +1007,60 @@ class MainWindow(QMainWindow, WindowMixin):
         label_folder = os.path.join(input_folder, 'labels')
         threshold = float(self.fog_threshold_edit.text())
         MainWindow.process_images(self, image_folder, label_folder, save_dir, threshold=threshold)
-        # 弹出提示框
-        QMessageBox.information(self, "Information", "提取阈值有雾训练数据完成。")
 
 
     def process_images(self, image_folder, label_folder, output_folder, threshold=0.0):
         """
-        处理图像并提取雾检测结果。
-        :param input_folder: 图像文件夹路径
+        处理图像并提取雾检测结果，读取、评估和写出在后台进程池中并行执行。
+        :param image_folder: 图像文件夹路径
         :param label_folder: TXT标签文件夹路径
         :param output_folder: 输出文件夹路径
         """
-        os.makedirs(output_folder, exist_ok=True)
-
-        # 遍历所有标签文件
-        for label_file in os.listdir(label_folder):
-            if label_file.lower().endswith('.txt'):
-                ima_name = os.path.splitext(label_file)[0] + ".jpg"
-                ima_path = os.path.join(image_folder, ima_name)
-                if not os.path.exists(ima_path):
-                    # 弹窗提示文件不存在
-                    QMessageBox.warning(self, "Warning", f"文件不存在: {ima_path}")
-                    # 跳过当前文件
-                    continue
-                # 读取图像
-                image = cv2.imread(ima_path)# 避免中文路径报错
-                if image is None:
-                    # 弹窗提示无法读取图像
-                    QMessageBox.warning(self, "Warning", f"无法读取图像: {ima_path}")
-                    # 跳过当前文件
-                    continue
-                # 检查第一行第一个值是否为 0
-                with open(os.path.join(label_folder, label_file), 'r') as original_txt:
-                    lines = original_txt.readlines()
-                    first_line = lines[0].strip().split()
-                    if not first_line or first_line[0] != '0':
-                        # 弹窗提示第一行第一个值不是 0
-                        QMessageBox.warning(self, "Warning", f"跳过文件: {label_file}，第一行第一个值不是 0")
-                        # 跳过当前文件
-                        continue
-
-                    # 读取TXT标签并转换为ROI
-                    rois = MainWindow.read_txt_labels(os.path.join(label_folder, label_file), image.shape[:2])
-                    if not rois:
-                        # 弹窗提示未找到ROI区域
-                        QMessageBox.warning(self, "Warning", f"未找到ROI区域: {label_file}")
-                        # 跳过当前文件
-                        continue
-                    # 创建输出路径
-                    output_txt_path = os.path.join(output_folder, 'labels')
-                    output_image_path = os.path.join(output_folder, 'images')
-                    if not os.path.exists(output_txt_path):
-                        os.makedirs(output_txt_path)
-                    if not os.path.exists(output_image_path):
-                        os.makedirs(output_image_path)
-
-                    # 用于存储符合条件的行
-                    filtered_lines = []
-
-                    # 遍历所有ROI区域
-                    for idx, roi in enumerate(rois):
-                        is_fog, ratio = MainWindow.detect_fog(image, roi, threshold)
-                        if is_fog:
-                            # 保存符合条件的ROI区域
-                            filtered_lines.append(lines[idx])
-
-                    # 如果有符合条件的行，则写入到新的txt文件中，并保存对应的图像
-                    if filtered_lines:
-                        # 写入新的txt文件
-                        with open(os.path.join(output_txt_path, label_file), 'w') as new_txt:
-                            for line in filtered_lines:
-                                new_txt.write(line)
-                        # 保存对应的图像
-                        cv2.imwrite(os.path.join(output_image_path, ima_name), image)
-                    else:
-                        # 输出没有符合条件的ROI
-                        print(f"没有符合条件的ROI: {label_file}")
-                        # 跳过当前文件
-                        continue
+        try:
+            workers = int(self.fog_workers_edit.text())
+        except ValueError:
+            workers = default_worker_count()
+        job = FogTrainDataJob(image_folder, label_folder, output_folder, threshold, self.fog_metric)
+        self.run_batch_job(job, output_folder, workers=workers, use_processes=True)
+
+    def run_batch_job(self, job, work_dir, workers=1, use_processes=False, on_finished=None):
+        """
+        在后台运行批处理任务，进度、取消和失败条目显示在批处理任务面板中。
+        :param job: libs.batchJob.BatchJob
+        :param work_dir: 检查点文件所在文件夹，任务中断后再次运行时从检查点继续
+        :param on_finished: 可选回调 on_finished(report)
+        """
+        if self.job_dock.is_running():
+            QMessageBox.warning(self, "警告", "已有批处理任务正在运行，请等待完成或取消。")
+            return
+        checkpoint_path = os.path.join(work_dir, '.labelImg_%s.checkpoint' % type(job).__name__)
+        checkpoint = JobCheckpoint(checkpoint_path)
+        params = job.param_values()
+        if checkpoint.matches(job.title, params):
+            settings = "\n".join("%s = %s" % (name, value) for name, value in params.items())
+            answer = QMessageBox.question(self, job.title,
+                                          "发现上次未完成的任务，参数相同：\n\n%s\n\n是否从中断处继续？" % settings,
+                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if answer != QMessageBox.Yes:
+                checkpoint.remove()
+        elif checkpoint.exists():
+            # 参数不同的旧检查点不能继续，重新开始
+            checkpoint.remove()
+
+        def job_finished(report):
+            if report.failed is not None:
+                QMessageBox.warning(self, "警告", report.failed)
+            elif report.cancelled:
+                self.status(report.summary)
+            else:
+                message = report.summary
+                if report.errors:
+                    message += "\n\n%d 项处理失败，详见批处理任务面板。" % len(report.errors)
+                QMessageBox.information(self, job.title, message)
+            if on_finished is not None:
+                on_finished(report)
+
+        self.job_dock.start(job, workers, checkpoint_path, use_processes, job_finished)
 
     @staticmethod
     def read_txt_labels(txt_path, image_shape):
@@ -1013,20 +1070,8 @@ class MainWindow(QMainWindow, WindowMixin):
         :param image_shape: 图像的形状 (height, width)
         :return: ROI区域列表 [(x, y, w, h)]
         """
-        rois = []
-        with open(txt_path, 'r') as file:
-            for line in file.readlines():
-                values = line.strip().split()
-                if len(values) == 5:
-                    # 解析归一化坐标
-                    _, x_center, y_center, width, height = map(float, values)
-                    # 转换为像素坐标
-                    x = int((x_center - width / 2) * image_shape[1])
-                    y = int((y_center - height / 2) * image_shape[0])
-                    w = int(width * image_shape[1])
-                    h = int(height * image_shape[0])
-                    rois.append((x, y, w, h))
-        return rois
+        return read_txt_labels(txt_path, image_shape)
+
     def extract_train_data(self):
         # 如果当前self.file_path为空，则弹出警告框
         if not self.file_path:
@@ -1040,35 +1085,9 @@ class MainWindow(QMainWindow, WindowMixin):
         save_dir = os.path.join(save_dir, 'Label_fog_train_data')
         if not save_dir:
             return
-        # 获取所有txt文件
         dir_path = os.path.dirname(self.file_path)
-        txt_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.txt')]
-        # 创建labels和images文件夹
-        if not os.path.exists(os.path.join(save_dir, 'labels')):
-            os.makedirs(os.path.join(save_dir, 'labels'))
-        if not os.path.exists(os.path.join(save_dir, 'images')):
-            os.makedirs(os.path.join(save_dir, 'images'))
-        # 读取所有txt文件，除了名为classes.txt的文件
-        for file in txt_files:
-            if os.path.basename(file) == 'classes.txt':
-                continue
-            with open(file, 'r', encoding='utf-8') as f:
-                # 如果该txt文件第一行第一个字符为0，则移动到保存路径下的labels文件夹，没有labels和images文件夹则创建
-                first_line = f.readline().strip()
-                if first_line and first_line.split() and first_line.split()[0] == '0':
-                    # 复制txt文件到保存路径下的labels文件夹
-                    shutil.copy(file, os.path.join(save_dir, 'labels'))
-                    # 复制对应的图片文件到保存路径下的images文件夹
-                    image_file = os.path.join(dir_path, os.path.splitext(os.path.basename(file))[0] + '.jpg')
-                    if os.path.exists(image_file):
-                        shutil.copy(image_file, os.path.join(save_dir, 'images'))
-                    else:
-                        # 弹出提示框
-                        QMessageBox.warning(self, "Warning", "Corresponding image file not found.")
-                        return
-
-        # 弹出提示框
-        QMessageBox.information(self, "Extract Train Data", "Train data has been extracted successfully.")
+        # 复制第一行第一个值为0的txt文件及对应图片到保存路径下的labels和images文件夹
+        self.run_batch_job(ExtractTrainDataJob(dir_path, save_dir), save_dir)
 
     def extract_class0_labels(self):
         """提取类别ID为0的标签文件，不进行V/S比计算"""
@@ -1091,108 +1110,8 @@ class MainWindow(QMainWindow, WindowMixin):
             os.makedirs(class0_folder)
         
         # 直接使用当前目录命名的文件夹，不创建子文件夹
-        
-        # 获取所有txt文件
         dir_path = os.path.dirname(self.file_path)
-        txt_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.txt')]
-        
-        # 处理classes.txt文件
-        classes_file = os.path.join(dir_path, 'classes.txt')
-        target_classes_file = os.path.join(class0_folder, 'classes.txt')
-        
-        if os.path.exists(classes_file):
-            # 如果存在classes.txt，直接复制
-            shutil.copy(classes_file, class0_folder)
-        else:
-            # 如果不存在classes.txt，创建一个包含标签的classes.txt
-            # 从标签文件中收集所有唯一的标签
-            unique_labels = set()
-            for file in txt_files:
-                if os.path.basename(file) == 'classes.txt':
-                    continue
-                try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            line = line.strip()
-                            if line:
-                                parts = line.split()
-                                if parts:
-                                    class_id = parts[0]
-                                    # 尝试从现有的标签历史中获取标签名称
-                                    if hasattr(self, 'label_hist') and self.label_hist:
-                                        try:
-                                            class_index = int(class_id)
-                                            if 0 <= class_index < len(self.label_hist):
-                                                unique_labels.add(self.label_hist[class_index])
-                                            else:
-                                                unique_labels.add(f'class_{class_id}')
-                                        except (ValueError, IndexError):
-                                            unique_labels.add(f'class_{class_id}')
-                                    else:
-                                        # 如果没有标签历史，使用默认命名
-                                        unique_labels.add(f'class_{class_id}')
-                except Exception as e:
-                    continue
-            
-            # 创建classes.txt文件
-            if unique_labels:
-                with open(target_classes_file, 'w', encoding='utf-8') as f:
-                    for label in sorted(unique_labels):
-                        f.write(f"{label}\n")
-        
-        # 统计信息
-        total_files = 0
-        class0_files = 0
-        copied_images = 0
-        
-        # 读取所有txt文件，除了名为classes.txt的文件
-        for file in txt_files:
-            if os.path.basename(file) == 'classes.txt':
-                continue
-            
-            total_files += 1
-            
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    first_line = f.readline().strip()
-                    if first_line and first_line.split():
-                        first_value = first_line.split()[0]
-                        # 如果该txt文件第一行第一个字符为0，则复制
-                        if first_value == '0':
-                            class0_files += 1
-                            
-                            # 复制txt文件到目标文件夹
-                            shutil.copy(file, class0_folder)
-                            
-                            # 复制对应的图片文件到目标文件夹
-                            image_file = os.path.join(dir_path, os.path.splitext(os.path.basename(file))[0] + '.jpg')
-                            if os.path.exists(image_file):
-                                shutil.copy(image_file, class0_folder)
-                                copied_images += 1
-                            else:
-                                # 尝试其他图像格式
-                                for ext in ['.png', '.jpeg', '.bmp', '.tiff', '.tif']:
-                                    alt_image_file = os.path.join(dir_path, os.path.splitext(os.path.basename(file))[0] + ext)
-                                    if os.path.exists(alt_image_file):
-                                        shutil.copy(alt_image_file, class0_folder)
-                                        copied_images += 1
-                                        break
-                                else:
-                                    print(f"警告：未找到对应的图像文件: {os.path.basename(file)}")
-            except Exception as e:
-                print(f"处理文件 {file} 时出错: {e}")
-                continue
-        
-        # 显示结果
-        result_msg = f"提取完成！\n\n"
-        result_msg += f"总标签文件数: {total_files}\n"
-        result_msg += f"类别0文件数: {class0_files}\n"
-        result_msg += f"成功复制图像数: {copied_images}\n"
-        classes_status = "已复制" if os.path.exists(classes_file) else "已创建"
-        result_msg += f"classes.txt状态: {classes_status}\n"
-        result_msg += f"保存位置: {class0_folder}"
-        
-        QMessageBox.information(self, "提取类别0标签完成", result_msg)
+        self.run_batch_job(ExtractClass0Job(dir_path, class0_folder, self.label_hist), class0_folder)
 
     def generate_video_label(self):
         # 如果当前self.file_path为空，则弹出警告框
@@ -1201,197 +1120,65 @@ class MainWindow(QMainWindow, WindowMixin):
             return
         # 获取当前文件夹路径
         dir_path = os.path.dirname(self.file_path)
-        # 统计文件夹中含有图片数量
-        image_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.jpg')]
-        # 视频帧数
-        frame_num = len(image_files)
-        # 设置一个储存视频标签的变量
-        video_labels = []
-        # 按照视频帧数填充视频标签
-        for i in range(frame_num):
-            video_labels.append(f"{i}-{i} 4 0")
-        # 获取当前文件夹下所有的txt文件
-        txt_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.txt')]
-        # 删除文件夹中的空txt文件
-        for file in txt_files:
-            if os.path.getsize(file) == 0:
-                os.remove(file)
-        # 再次获取当前文件夹下所有的txt文件
-        txt_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.txt')]
-        # 获取txt文件中的类别，并且将视频标签与类别对应
-        # 循环所有txt文件
-        for file in txt_files:
-            # 读取txt文件
-            # 如果txt文件名为classses.txt，则跳过
-            if os.path.basename(file) == 'classes.txt':
-                # 储存标签中数字对应的类别名称
-                with open(file, 'r', encoding='utf-8') as f:
-                    # 将文件内容按照换行符分割
-                    lines = f.readlines()
-                    # 储存为一个字符串
-                    classes_str = ''.join(lines)
-                    # 按照换行符分割字符串
-                    classes = classes_str.split('\n')
-                continue
-            with open(file, 'r', encoding='utf-8') as f:
-                # 根据文件名获取视频帧号(后缀前面的数字)
-                # 例如：fog-T01S01I01L0202H700BTctotalLtotal_video_1_20250102_125143_ori_2.txt
-                # 则获取的视频帧号为_2.txt中的2
-                frame = int(os.path.splitext(os.path.basename(file))[0].split('_')[-1])
-                lines = f.readlines()
-                # 读取第一行
-                if lines and lines[0].strip() and lines[0].strip().split():
-                    label = int(lines[0].strip().split()[0])
-                else:
-                    continue
-                if classes[label] == 'fog':
-                    label_name = '5'
-                elif classes[label] == '999':
-                    label_name = '999'
-                # 填充视频标签
-                video_labels[int(frame - 1)] = f"{frame - 1}-{frame - 1} {label_name} 0"
-
-        # 写入视频标签文件
-        # 视频标签文件名按照文件夹的名称命名
-        # 可以自行选择储存位置
-        save_dir = os.path.join(dir_path, 'video_labels')
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-        video_label_file = os.path.join(save_dir, os.path.basename(dir_path) + '.txt')
-        with open(video_label_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(video_labels))
-        # 弹出提示框
-        QMessageBox.information(self, "Generate Video Label", "Video label file has been generated successfully.")
+        # 视频标签保存在 video_labels 文件夹，按照文件夹的名称命名
+        self.run_batch_job(VideoLabelJob(dir_path), dir_path)
 
     def generate_video_label_with_fog_threshold(self):
         # 如果当前self.file_path为空，则弹出警告框
         if not self.file_path:
             QMessageBox.warning(self, "Warning", "No image loaded.")
             return
+        # 获取判断有雾阈值
+        try:
+            threshold = float(self.fog_threshold_edit.text())
+        except ValueError:
+            QMessageBox.warning(self, "Warning", "Please input the fog threshold.")
+            return
         # 获取当前文件夹路径
         dir_path = os.path.dirname(self.file_path)
-        # 统计文件夹中含有图片数量
-        image_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.jpg')]
-        # 视频帧数
-        frame_num = len(image_files)
-        # 设置一个储存视频标签的变量
-        video_labels = []
-        # 按照视频帧数填充视频标签
-        for i in range(frame_num):
-            video_labels.append(f"{i}-{i} 4 0")
-        # 获取当前文件夹下所有的txt文件
-        txt_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.txt')]
-        # 删除文件夹中的空txt文件
-        for file in txt_files:
-            if os.path.getsize(file) == 0:
-                os.remove(file)
-        # 再次获取当前文件夹下所有的txt文件
-        txt_files = [os.path.join(dir_path, file) for file in os.listdir(dir_path) if file.endswith('.txt')]
-        # 获取txt文件中的类别，并且将视频标签与类别对应
-        # 循环所有txt文件
-        for file in txt_files:
-            # 读取txt文件
-            # 如果txt文件名为classses.txt，则跳过
-            if os.path.basename(file) == 'classes.txt':
-                continue
-            with open(file, 'r', encoding='utf-8') as f:
-                # 根据文件名获取视频帧号(后缀前面的数字)
-                # 例如：fog-T01S01I01L0202H700BTctotalLtotal_video_1_20250102_125143_ori_2.txt
-                # 则获取的视频帧号为_2.txt中的2
-                frame = int(os.path.splitext(os.path.basename(file))[0].split('_')[-1])
-                # label = f.readline().strip().split()[0]
-                lines = f.readlines()
-                if lines and lines[0].strip() and lines[0].strip().split():
-                    label = lines[0].strip().split()[0]
-                else:
-                    continue
-                # 标签为999的情况
-                if label == '1':
-                    video_labels[int(frame - 1)] = f"{frame - 1}-{frame - 1} 999 0"
-                    continue
-                elif label == '0':# 标签为有雾的情况
-                    # 读取标签文件对应的图像
-                    image_file = os.path.join(dir_path, os.path.splitext(os.path.basename(file))[0] + '.jpg')
-                    if not os.path.exists(image_file):
-                        # 弹出提示框
-                        QMessageBox.warning(self, "Warning", "Corresponding image file not found.")
-                        return
-                    # 获取图像的image_shape
-                    image = cv2.imread(image_file)
-                    if image is None:
-                        # 弹出提示框
-                        QMessageBox.warning(self, "Warning", f"无法读取图像: {image_file}")
-                        return
-                    image_shape = image.shape[:2]
-                    rois = []  # 储存标签中的标注框
-                    # 用于判断是否是有雾标签的条件
-                    is_fog_label = False
-                    for line in lines:
-                        values = line.strip().split()
-                        if len(values) == 5 and values[0] == '0':  # 标签为有雾
-                            # 解析归一化坐标
-                            _, x_center, y_center, width, height = map(float, values)
-                            # 转换为像素坐标
-                            x = int((x_center - width / 2) * image_shape[1])
-                            y = int((y_center - height / 2) * image_shape[0])
-                            w = int(width * image_shape[1])
-                            h = int(height * image_shape[0])
-                            rois.append((x, y, w, h))
-                    # 获取判断有雾阈值
-                    if not self.fog_threshold_edit:
-                        # 弹出提示框
-                        QMessageBox.warning(self, "Warning", "Please input the fog threshold.")
-                        return
-                    threshold = float(self.fog_threshold_edit.text())
-                    # 判断是否有雾
-                    for idx, roi in enumerate(rois):
-                        is_fog, ratio = self.detect_fog(image, roi, threshold)
-                        if is_fog:
-                            is_fog_label = True
-                            break
-                    # 标签为有雾的情况
-                    if is_fog_label:
-                        video_labels[int(frame - 1)] = f"{frame - 1}-{frame - 1} 5 0"
-                    else:
-                        video_labels[int(frame - 1)] = f"{frame - 1}-{frame - 1} 4 0"
-
-        # 写入视频标签文件
-        # 视频标签文件名按照文件夹的名称命名
-        # 可以自行选择储存位置
-        save_dir = os.path.join(dir_path, 'thread_video_labels')
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-        video_label_file = os.path.join(save_dir, os.path.basename(dir_path) + '.txt')
-        with open(video_label_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(video_labels))
-        # 弹出提示框
-        QMessageBox.information(self, "Generate Video Label",
-                                "Video label file has been generated successfully.")
+        # 视频标签保存在 thread_video_labels 文件夹，按照文件夹的名称命名
+        self.run_batch_job(FogVideoLabelJob(dir_path, threshold, self.fog_metric), dir_path,
+                           workers=default_worker_count())
+
+    def current_fog_scores(self, rois):
+        """
+        Both fog metrics of rois in the current image. Editing the threshold only
+        compares again, the boxes are scored once until they or the image change.
+        """
+        rois = tuple(tuple(roi) for roi in rois)
+        if self._fog_scores is None or self._fog_scores[:2] != (self.image_buffer.key, rois):
+            self._fog_scores = (self.image_buffer.key, rois, batch_fog_metrics(self.image_buffer.bgr(), rois))
+        return self._fog_scores[2]
+
+    def refresh_fog_results(self):
+        """阈值改变时，重新评估当前图像中所有可见检测框"""
+        if not self.canvas.shapes or self.image_buffer.is_null():
+            return
+        try:
+            threshold = float(self.fog_threshold_edit.text())
+        except ValueError:
+            return
+        shapes = [shape for shape in self.canvas.shapes if self.canvas.isVisible(shape)]
+        fog_count = 0
+        if shapes:
+            rois = [self.canvas.shape_roi(shape) for shape in shapes]
+            ratios = select_metric(self.current_fog_scores(rois), self.fog_metric)
+            fog_count = int((ratios > threshold).sum())
+        self.status('有雾检测框: %d / %d (阈值 %.2f)' % (fog_count, len(shapes), threshold))
+        if self.canvas.selected_shape:
+            self.canvas.update_fog_result(self.canvas.shape_roi(self.canvas.selected_shape))
 
     @staticmethod
-    def detect_fog(image, roi, threshold):
+    def detect_fog(image, roi, threshold, metric=DEFAULT_FOG_METRIC):
         """
         检测图像中是否存在雾。
         :param image: 输入图像（BGR格式）
         :param roi: 感兴趣区域（ROI）的坐标 [x, y, width, height]
         :param threshold: V/S比值的阈值
+        :param metric: 计算方式，见 libs.fog_metrics
         :return: 是否存在雾，V/S比值
         """
-        x, y, w, h = roi
-        roi_image = image[y:y + h, x:x + w]
-
-        if roi_image.size == 0:
-            return False, 0.0
-
-        hsv_image = cv2.cvtColor(roi_image, cv2.COLOR_BGR2HSV)
-        s = hsv_image[:, :, 1].astype(np.float32)  # 饱和度
-        v = hsv_image[:, :, 2].astype(np.float32)  # 亮度
-
-        with np.errstate(divide='ignore', invalid='ignore'):
-            ratio = np.nanmean(v / s)  # 忽略NaN值
-            ratio = ratio * 10
-
-        return ratio > threshold, ratio
+        return detect_fog(image, roi, threshold, metric)
 
     def keyReleaseEvent(self, event):
         if event.key() == Qt.Key_Control:
@@ -1501,6 +1288,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.items_to_shapes.clear()
         self.shapes_to_items.clear()
         self.label_list.clear()
+        self.label_counts.clear()
         self.file_path = None
         self.image_data = None
         self.label_file = None
@@ -1621,8 +1409,8 @@ class MainWindow(QMainWindow, WindowMixin):
             self.update_combo_box()
 
     # Tzutalin 20160906 : Add file list and dock to move faster
-    def file_item_double_clicked(self, item=None):
-        self.cur_img_idx = self.m_img_list.index(ustr(item.text()))
+    def file_item_double_clicked(self, index=None):
+        self.cur_img_idx = index.row()
         filename = self.m_img_list[self.cur_img_idx]
         if filename:
             self.load_file(filename)
@@ -1675,14 +1463,37 @@ class MainWindow(QMainWindow, WindowMixin):
         self.copy_all_bbox_randomly_button.setEnabled(bool(self.dir_name))
 
     def add_label(self, shape):
-        shape.paint_label = self.display_label_option.isChecked()
-        item = HashableQListWidgetItem(shape.label)
-        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Checked)
-        item.setBackground(generate_color_by_text(shape.label))
-        self.items_to_shapes[item] = shape
-        self.shapes_to_items[shape] = item
-        self.label_list.addItem(item)
+        self.add_labels([shape])
+
+    def add_labels(self, shapes):
+        """
+        批量添加标签列表项。
+        The label list is not repainted while the items are added, and the combo box is refreshed once.
+        """
+        if not shapes:
+            # 计数可能在清空时已变化，仍需刷新下拉框
+            self.update_combo_box()
+            return
+        paint_label = self.display_label_option.isChecked()
+        colors = {}
+        self.label_list.setUpdatesEnabled(False)
+        try:
+            for shape in shapes:
+                shape.paint_label = paint_label
+                item = HashableQListWidgetItem(shape.label)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked)
+                if shape.label not in colors:
+                    colors[shape.label] = generate_color_by_text(shape.label)
+                item.setBackground(colors[shape.label])
+                self.items_to_shapes[item] = shape
+                self.shapes_to_items[shape] = item
+                self.label_list.addItem(item)
+                self.label_counts[shape.label] += 1
+        finally:
+            self.label_list.setUpdatesEnabled(True)
+        # paint_label 变化后重新统计显示的标签
+        self.canvas.shape_index.invalidate()
         for action in self.actions.onShapesPresent:
             action.setEnabled(True)
         self.update_combo_box()
@@ -1695,8 +1506,14 @@ class MainWindow(QMainWindow, WindowMixin):
         self.label_list.takeItem(self.label_list.row(item))
         del self.shapes_to_items[shape]
         del self.items_to_shapes[item]
+        self.discount_label(shape.label)
         self.update_combo_box()
 
+    def discount_label(self, label):
+        self.label_counts[label] -= 1
+        if self.label_counts[label] <= 0:
+            del self.label_counts[label]
+
     def load_labels(self, shapes):
         s = []
         for label, points, line_color, fill_color, difficult in shapes:
@@ -1723,20 +1540,12 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 shape.fill_color = generate_color_by_text(label)
 
-            self.add_label(shape)
-        self.update_combo_box()
+        self.add_labels(s)
         self.canvas.load_shapes(s)
 
     def update_combo_box(self):
-        # Get the unique labels and add them to the Combobox.
-        items_text_list = [str(self.label_list.item(i).text()) for i in range(self.label_list.count())]
-
-        unique_text_list = list(set(items_text_list))
-        # Add a null row for showing all the labels
-        unique_text_list.append("")
-        unique_text_list.sort()
-
-        self.combo_box.update_items(unique_text_list)
+        # The unique labels and their counts are kept in label_counts; the combo box only applies the changes.
+        self.combo_box.update_counts(self.label_counts)
 
     def save_labels(self, annotation_file_path):
         annotation_file_path = ustr(annotation_file_path)
@@ -1775,6 +1584,8 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 self.label_file.save(annotation_file_path, shapes, self.file_path, self.image_data,
                                      self.line_color.getRgb(), self.fill_color.getRgb())
+            self.annotation_index.add(annotation_file_path)
+            self.file_list_model.invalidate_status()
             print('Image:{0} -> Annotation:{1}'.format(self.file_path, annotation_file_path))
             return True
         except LabelFileError as e:
@@ -1787,7 +1598,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.shape_selection_changed(True)
 
     def combo_selection_changed(self, index):
-        text = self.combo_box.cb.itemText(index)
+        text = self.combo_box.cb.itemData(index) or ""
         for i in range(self.label_list.count()):
             if text == "":
                 self.label_list.item(i).setCheckState(2)
@@ -1812,9 +1623,13 @@ class MainWindow(QMainWindow, WindowMixin):
         shape = self.items_to_shapes[item]
         label = item.text()
         if label != shape.label:
+            self.discount_label(shape.label)
+            self.label_counts[label] += 1
             shape.label = item.text()
             shape.line_color = generate_color_by_text(shape.label)
+            self.canvas.shape_index.invalidate()
             self.set_dirty()
+            self.update_combo_box()
         else:  # User probably changed item visibility
             self.canvas.set_shape_visible(shape, item.checkState() == Qt.Checked)
 
@@ -1958,6 +1773,8 @@ class MainWindow(QMainWindow, WindowMixin):
         """Load the specified file, or the last opened file if None."""
         self.reset_state()
         self.canvas.setEnabled(False)
+        self._preview = None
+        preview_factor = 1
         if file_path is None:
             file_path = self.settings.get(SETTING_FILENAME)
         # Make sure that filePath is a regular python string, rather than QString
@@ -1968,14 +1785,16 @@ class MainWindow(QMainWindow, WindowMixin):
         unicode_file_path = os.path.abspath(unicode_file_path)
         # Tzutalin 20160906 : Add file list and dock to move faster
         # Highlight the file item
-        if unicode_file_path and self.file_list_widget.count() > 0:
-            if unicode_file_path in self.m_img_list:
-                index = self.m_img_list.index(unicode_file_path)
-                file_widget_item = self.file_list_widget.item(index)
-                file_widget_item.setSelected(True)
+        if unicode_file_path and self.all_img_list:
+            if unicode_file_path not in self.file_index and unicode_file_path in self.search_index:
+                # 打开的图像不在搜索结果中，取消过滤
+                self.file_search_edit.clear()
+                self.apply_file_filter()
+            row = self.file_index.row(unicode_file_path)
+            if row is not None:
+                self.select_file_row(row)
             else:
-                self.file_list_widget.clear()
-                self.m_img_list.clear()
+                self.set_file_list([])
 
         if unicode_file_path and os.path.exists(unicode_file_path):
             if LabelFile.is_label_file(unicode_file_path):
@@ -1996,7 +1815,13 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 # Load image:
                 # read data first and store for saving into label file.
-                self.image_data = read(unicode_file_path, None)
+                self.image_data = self.take_decoded_image(unicode_file_path)
+                if self.image_data is None:
+                    # 超大图像先解码缩小的预览，原图在后台解码
+                    self.image_data, preview_factor = decode_preview(
+                        unicode_file_path, self.scroll_area.viewport().size())
+                if self.image_data is None:
+                    self.image_data = read(unicode_file_path, None)
                 self.label_file = None
                 self.canvas.verified = False
 
@@ -2009,10 +1834,14 @@ class MainWindow(QMainWindow, WindowMixin):
                                    u"<p>Make sure <i>%s</i> is a valid image file." % unicode_file_path)
                 self.status("Error reading %s" % unicode_file_path)
                 return False
-            self.status("Loaded %s" % os.path.basename(unicode_file_path))
             self.image = image
             self.file_path = unicode_file_path
-            self.canvas.load_pixmap(QPixmap.fromImage(image))
+            self.canvas.load_image(image)
+            if preview_factor > 1:
+                self.show_preview(preview_factor)
+                return True
+            self.status("Loaded %s" % os.path.basename(unicode_file_path))
+            self.image_buffer.set_image(image)
             if self.label_file:
                 self.load_labels(self.label_file.shapes)
             self.set_clean()
@@ -2022,6 +1851,7 @@ class MainWindow(QMainWindow, WindowMixin):
             self.add_recent_file(self.file_path)
             self.toggle_actions(True)
             self.show_bounding_box_from_annotation_file(self.file_path)
+            self.prefetch_neighbour_images()
 
             counter = self.counter_str()
             self.setWindowTitle(__appname__ + ' ' + file_path + ' ' + counter)
@@ -2035,6 +1865,63 @@ class MainWindow(QMainWindow, WindowMixin):
             return True
         return False
 
+    def show_preview(self, factor):
+        """
+        Show the reduced image decoded by load_file while the full one is decoded
+        in the background. Annotations are loaded and editing is enabled only
+        after full_image_decoded swaps in the original, since box coordinates,
+        fog detection, cutting and saving all need the exact pixels.
+        """
+        self._preview = (self.file_path, factor)
+        self.image_buffer.clear()
+        self.image_prefetcher.prefetch([self.file_path], priority=1)
+        self.toggle_actions(True)
+        for action in self.actions.onLoadActive:
+            action.setEnabled(False)
+        self.adjust_scale(initial=True)
+        self.paint_canvas()
+        self.status("Loading full resolution of %s" % os.path.basename(self.file_path), 0)
+        self.setWindowTitle(__appname__ + ' ' + self.file_path + ' ' + self.counter_str())
+
+    def full_image_decoded(self, path, image):
+        if self._preview is None or self._preview[0] != path:
+            return
+        factor = self._preview[1]
+        if image.isNull():
+            # 后台解码失败（文件损坏、内存不足等），在主线程再试一次
+            image = decode_image(path)
+        if image.isNull():
+            self._preview = None
+            self.actions.close.setEnabled(True)
+            self.status("Error reading %s" % path)
+            self.error_message(u'Error opening file',
+                               u"<p>Could not decode <i>%s</i> at full resolution; "
+                               u"only the preview was shown and nothing can be edited." % path)
+            return
+        zoom = self.zoom_widget.value() if self.zoom_mode == self.MANUAL_ZOOM else None
+        self._full_image = (path, image)
+        self.load_file(path)
+        if zoom is not None:
+            # 预览时手动缩放过，换成原图后保持相同的显示大小
+            self.zoom_widget.setValue(max(1, int(round(zoom / float(factor)))))
+
+    def take_decoded_image(self, path):
+        """:return: 后台已解码的原图，没有时返回 None"""
+        if self._full_image is not None:
+            full_path, image = self._full_image
+            self._full_image = None
+            if full_path == path:
+                return image
+        return self.image_prefetcher.take(path)
+
+    def prefetch_neighbour_images(self):
+        """在后台解码当前图像之后 PREFETCH_NEXT 张和之前 PREFETCH_PREV 张图像"""
+        index = self.cur_img_idx
+        if not (0 <= index < len(self.m_img_list)) or self.m_img_list[index] != self.file_path:
+            return
+        indices = list(range(index + 1, index + 1 + PREFETCH_NEXT)) + list(range(index - 1, index - 1 - PREFETCH_PREV, -1))
+        self.image_prefetcher.prefetch([self.m_img_list[i] for i in indices if 0 <= i < len(self.m_img_list)])
+
     def counter_str(self):
         """
         Converts image counter to string representation.
@@ -2046,33 +1933,22 @@ class MainWindow(QMainWindow, WindowMixin):
         if file_path is None:
             return
             
+        """Annotation file priority:
+        PascalXML > YOLO > CreateML
+        """
+        stem = os.path.basename(os.path.splitext(file_path)[0])
         if self.default_save_dir is not None:
-            basename = os.path.basename(os.path.splitext(file_path)[0])
-            xml_path = os.path.join(self.default_save_dir, basename + XML_EXT)
-            txt_path = os.path.join(self.default_save_dir, basename + TXT_EXT)
-            json_path = os.path.join(self.default_save_dir, basename + JSON_EXT)
-
-            """Annotation file priority:
-            PascalXML > YOLO
-            """
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
-
+            annotation_path = self.annotation_index.find(self.default_save_dir, stem)
         else:
-            xml_path = os.path.splitext(file_path)[0] + XML_EXT
-            txt_path = os.path.splitext(file_path)[0] + TXT_EXT
-            json_path = os.path.splitext(file_path)[0] + JSON_EXT
-
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
+            annotation_path = self.annotation_index.find(os.path.dirname(file_path), stem)
+        if annotation_path is None:
+            return
+        if annotation_path.endswith(XML_EXT):
+            self.load_pascal_xml_by_filename(annotation_path)
+        elif annotation_path.endswith(TXT_EXT):
+            self.load_yolo_txt_by_filename(annotation_path)
+        else:
+            self.load_create_ml_json_by_filename(annotation_path, file_path)
 
     def resizeEvent(self, event):
         if self.canvas and not self.image.isNull() \
@@ -2099,15 +1975,15 @@ class MainWindow(QMainWindow, WindowMixin):
         h1 = self.centralWidget().height() - e
         a1 = w1 / h1
         # Calculate a new scale value based on the pixmap's aspect ratio.
-        w2 = self.canvas.pixmap.width() - 0.0
-        h2 = self.canvas.pixmap.height() - 0.0
+        w2 = self.canvas.image_size.width() - 0.0
+        h2 = self.canvas.image_size.height() - 0.0
         a2 = w2 / h2
         return w1 / w2 if a2 >= a1 else h1 / h2
 
     def scale_fit_width(self):
         # The epsilon does not seem to work too well here.
         w = self.centralWidget().width() - 2.0
-        return w / self.canvas.pixmap.width()
+        return w / self.canvas.image_size.width()
 
     def closeEvent(self, event):
         if not self.may_continue():
@@ -2147,18 +2023,93 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.may_continue():
             self.load_file(filename)
 
+    def image_extensions(self):
+        return ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
+
     def scan_all_images(self, folder_path):
-        extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
-        images = []
-
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relative_path = os.path.join(root, file)
-                    path = ustr(os.path.abspath(relative_path))
-                    images.append(path)
-        natural_sort(images, key=lambda x: x.lower())
-        return images
+        """
+        Start listing the images under folder_path on a pool thread.
+        The list saved in the directory manifest by the last scan is shown at once,
+        and the scan only lists again the directories that changed since then.
+        """
+        manifest = DirectoryManifest(folder_path, self.image_extensions())
+        manifest.load()
+        worker = ManifestScanWorker(manifest)
+        worker.signals.first_level.connect(partial(self.image_scan_progress, worker))
+        worker.signals.finished.connect(partial(self.image_scan_finished, worker))
+        self._scan_worker = worker
+        QThreadPool.globalInstance().start(worker)
+        return list(manifest.paths)
+
+    def image_scan_progress(self, worker, paths):
+        # 首次打开的目录：最浅一层的图像列出后就可以开始标注
+        if worker is self._scan_worker and not self.all_img_list:
+            self.set_image_list(paths)
+
+    def image_scan_finished(self, worker, paths, changed):
+        if worker is not self._scan_worker:
+            return
+        self._scan_worker = None
+        if changed:
+            self.set_image_list(paths)
+
+    def select_file_row(self, row):
+        self.file_list_widget.setCurrentIndex(self.file_list_model.index(row))
+
+    def annotation_status(self, path):
+        """File list decoration of one image, looked up in the annotation index."""
+        stem = os.path.basename(os.path.splitext(path)[0])
+        dir_path = self.default_save_dir if self.default_save_dir is not None else os.path.dirname(path)
+        annotation_path = self.annotation_index.find(dir_path, stem)
+        if annotation_path is None:
+            return STATUS_EMPTY
+        if annotation_path.endswith(XML_EXT) and is_verified(annotation_path):
+            return STATUS_VERIFIED
+        return STATUS_LABELLED
+
+    def set_image_list(self, paths):
+        """Show paths in the file list. The open image stays open, otherwise the first image is opened."""
+        self.all_img_list = paths
+        self.search_index = FileIndex(paths)
+        self.apply_file_filter()
+        if self.file_path is None:
+            self.open_next_image()
+
+    def set_file_list(self, paths):
+        """Replace the whole image list without a filter, e.g. to empty it when a file outside it is opened."""
+        self.all_img_list = paths
+        self.search_index = FileIndex(paths)
+        self.file_search_edit.clear()
+        self.file_search_timer.stop()
+        self.apply_file_filter()
+
+    def apply_file_filter(self):
+        """Narrow m_img_list to the images whose file name matches the search text."""
+        self.file_search_timer.stop()
+        text = self.file_search_edit.text().strip()
+        if text:
+            matches = [self.all_img_list[row] for row in self.search_index.search(text)]
+            self.file_index = FileIndex(matches)
+        else:
+            self.file_index = self.search_index
+        self.m_img_list = self.file_index.paths
+        self.img_count = len(self.m_img_list)
+        self.file_list_model.set_paths(self.m_img_list)
+        row = self.file_index.row(self.file_path)
+        if row is not None:
+            self.cur_img_idx = row
+            self.select_file_row(row)
+        elif text:
+            # 当前图像不在结果中，“下一张”从第一个结果开始
+            self.cur_img_idx = -1
+        if self.file_path is not None:
+            self.setWindowTitle(__appname__ + ' ' + self.file_path + ' ' + self.counter_str())
+
+    def open_first_search_result(self):
+        self.apply_file_filter()
+        if self.m_img_list and self.may_continue():
+            self.cur_img_idx = 0
+            self.load_file(self.m_img_list[0])
 
     def change_save_dir_dialog(self, _value=False):
         if self.default_save_dir is not None:
@@ -2173,6 +2124,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         if dir_path is not None and len(dir_path) > 1:
             self.default_save_dir = dir_path
+            self.file_list_model.invalidate_status()
 
         self.show_bounding_box_from_annotation_file(self.file_path)
 
@@ -2225,6 +2177,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.last_open_dir = target_dir_path
         self.import_dir_images(target_dir_path)
         self.default_save_dir = target_dir_path
+        self.file_list_model.invalidate_status()
         if self.file_path:
             self.show_bounding_box_from_annotation_file(file_path=self.file_path)
 
@@ -2235,13 +2188,10 @@ class MainWindow(QMainWindow, WindowMixin):
         self.last_open_dir = dir_path
         self.dir_name = dir_path
         self.file_path = None
-        self.file_list_widget.clear()
-        self.m_img_list = self.scan_all_images(dir_path)
-        self.img_count = len(self.m_img_list)
-        self.open_next_image()
-        for imgPath in self.m_img_list:
-            item = QListWidgetItem(imgPath)
-            self.file_list_widget.addItem(item)
+        self.image_prefetcher.clear()
+        self.annotation_index.clear()
+        self.all_img_list = []
+        self.set_image_list(self.scan_all_images(dir_path))
 
     def verify_image(self, _value=False):
         # Proceeding next image without dialog if having any label
@@ -2389,8 +2339,16 @@ class MainWindow(QMainWindow, WindowMixin):
             idx = self.cur_img_idx
             if os.path.exists(delete_path):
                 os.remove(delete_path)
-            self.import_dir_images(self.last_open_dir)
-            if self.img_count > 0:
+            # 只从列表中移除，不重新扫描目录
+            row = self.file_index.row(delete_path)
+            if row is not None:
+                idx = row
+                self.file_list_model.remove_row(row)
+                self.file_index.remove(delete_path)
+            if self.search_index is not self.file_index:
+                self.search_index.remove(delete_path)
+            self.img_count = len(self.m_img_list)
+            if self.m_img_list:
                 self.cur_img_idx = min(idx, self.img_count - 1)
                 filename = self.m_img_list[self.cur_img_idx]
                 self.load_file(filename)
@@ -2433,7 +2391,7 @@ class MainWindow(QMainWindow, WindowMixin):
                                            default=DEFAULT_LINE_COLOR)
         if color:
             self.line_color = color
-            Shape.line_color = color
+            Shape.default_line_color = color
             self.canvas.set_drawing_color(color)
             self.canvas.update()
             self.set_dirty()
@@ -2465,6 +2423,7 @@ class MainWindow(QMainWindow, WindowMixin):
                             # 从canvas的shapes列表中移除形状
                             if shape in self.canvas.shapes:
                                 self.canvas.shapes.remove(shape)
+                                self.canvas.shape_index.invalidate()
                         except Exception as e:
                             print(f"Error deleting shape: {e}")
                     
@@ -2567,8 +2526,8 @@ class MainWindow(QMainWindow, WindowMixin):
         self.canvas.verified = create_ml_parse_reader.verified
 
     def copy_previous_bounding_boxes(self):
-        current_index = self.m_img_list.index(self.file_path)
-        if current_index - 1 >= 0:
+        current_index = self.file_index.row(self.file_path)
+        if current_index is not None and current_index - 1 >= 0:
             prev_file_path = self.m_img_list[current_index - 1]
             self.show_bounding_box_from_annotation_file(prev_file_path)
             self.save_file()
@@ -2576,6 +2535,7 @@ class MainWindow(QMainWindow, WindowMixin):
     def toggle_paint_labels_option(self):
         for shape in self.canvas.shapes:
             shape.paint_label = self.display_label_option.isChecked()
+        self.canvas.shape_index.invalidate()
 
     def toggle_draw_square(self):
         self.canvas.set_drawing_shape_to_square(self.draw_squares_option.isChecked())
@@ -2629,8 +2589,8 @@ class MainWindow(QMainWindow, WindowMixin):
         source_points = [(p.x(), p.y()) for p in source_shape.points]
         source_bbox = self._get_bbox_from_points(source_points)
         
-        # 读取源图像并提取检测框内容
-        source_img = cv2.imread(current_image_path)
+        # 读取源图像并提取检测框内容（当前图像已解码，直接复用）
+        source_img = self.image_buffer.bgr()
         if source_img is None:
             QMessageBox.warning(self, "错误", "无法读取源图像")
             return
@@ -2730,14 +2690,7 @@ class MainWindow(QMainWindow, WindowMixin):
     
     def _get_label_path(self, image_path):
         """根据图像路径获取对应的标签文件路径"""
-        if self.label_file_format == LabelFileFormat.PASCAL_VOC:
-            return os.path.splitext(image_path)[0] + '.xml'
-        elif self.label_file_format == LabelFileFormat.YOLO:
-            return os.path.splitext(image_path)[0] + '.txt'
-        elif self.label_file_format == LabelFileFormat.CREATE_ML:
-            return os.path.splitext(image_path)[0] + '.json'
-        else:
-            return os.path.splitext(image_path)[0] + '.xml'
+        return label_path_for(image_path, self.label_file_format)
     
     def _get_image_path_from_label(self, label_path):
         """根据标签文件路径获取对应的图像文件路径"""
@@ -2933,29 +2886,7 @@ class MainWindow(QMainWindow, WindowMixin):
     
     def _check_overlap(self, bbox1, bbox2):
         """检查两个边界框是否重叠"""
-        if not bbox1 or not bbox2:
-            return False
-        
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        # 计算重叠区域
-        overlap_x1 = max(x1_1, x1_2)
-        overlap_y1 = max(y1_1, y1_2)
-        overlap_x2 = min(x2_1, x2_2)
-        overlap_y2 = min(y2_1, y2_2)
-        
-        # 如果有重叠区域，计算重叠面积
-        if overlap_x1 < overlap_x2 and overlap_y1 < overlap_y2:
-            overlap_area = (overlap_x2 - overlap_x1) * (overlap_y2 - overlap_y1)
-            bbox1_area = (x2_1 - x1_1) * (y2_1 - y1_1)
-            bbox2_area = (x2_2 - x1_2) * (y2_2 - y1_2)
-            
-            # 如果重叠面积超过任一检测框面积的20%，认为重叠
-            overlap_ratio = overlap_area / min(bbox1_area, bbox2_area)
-            return overlap_ratio > 0.2
-        
-        return False
+        return boxes_overlap(bbox1, bbox2)
 
     def copy_all_bbox_randomly(self):
         """从当前目录下所有图像中收集检测框，随机复制到其他图像"""
@@ -2970,152 +2901,8 @@ class MainWindow(QMainWindow, WindowMixin):
             QMessageBox.warning(self, "警告", "请输入有效的图像数量")
             return
             
-        # 获取目录中的所有图像文件
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
-        all_image_files = []
-        for file in os.listdir(self.dir_name):
-            if any(file.lower().endswith(ext) for ext in image_extensions):
-                all_image_files.append(os.path.join(self.dir_name, file))
-        
-        if len(all_image_files) < copy_count + 1:  # +1 因为需要排除源图像
-            QMessageBox.warning(self, "警告", f"目录中图像数量不足")
-            return
-        
-        # 收集当前目录下所有图像的检测框信息
-        all_bbox_info = []  # 存储 (图像路径, 检测框信息, 标签)
-        
-        for image_path in all_image_files:
-            label_path = self._get_label_path(image_path)
-            if os.path.exists(label_path):
-                try:
-                    # 读取图像获取尺寸
-                    img = cv2.imread(image_path)
-                    if img is not None:
-                        shapes = self._load_existing_labels(label_path, img.shape)
-                        for shape in shapes:
-                            shape_points = [(p.x(), p.y()) for p in shape.points]
-                            bbox = self._get_bbox_from_points(shape_points)
-                            if bbox:
-                                all_bbox_info.append((image_path, bbox, shape.label))
-                except Exception as e:
-                    print(f"处理图像 {image_path} 时出错: {str(e)}")
-                    continue
-        
-        if not all_bbox_info:
-            QMessageBox.warning(self, "警告", "当前目录下没有找到任何检测框")
-            return
-        
-        # 随机选择检测框进行复制（使用更合理的数量）
-        import random
-        # 计算要复制的检测框数量：取用户设置数量和检测框总数的较小值
-        num_to_copy = min(copy_count, len(all_bbox_info))
-        if num_to_copy == 0:
-            QMessageBox.warning(self, "警告", "没有可用的检测框进行复制")
-            return
-            
-        selected_bboxes = random.sample(all_bbox_info, num_to_copy)
-        
-        # 随机选择目标图像
-        selected_images = random.sample(all_image_files, copy_count)
-        
-        # 打乱检测框顺序，确保随机分配
-        random.shuffle(selected_bboxes)
-        
-        success_count = 0
-        
-        # 将检测框分散分配到不同的图像上
-        for i, (source_image_path, source_bbox, source_label) in enumerate(selected_bboxes):
-            try:
-                # 随机选择旋转角度：0, 90, 180, 270度
-                rotation_angle = random.choice([0, 90, 180, 270])
-                
-                # 计算目标图像索引，确保均匀分布
-                target_image_index = i % copy_count
-                target_image_path = selected_images[target_image_index]
-                
-                # 读取目标图像
-                target_img = cv2.imread(target_image_path)
-                if target_img is None:
-                    continue
-                    
-                # 获取目标图像的标签文件路径
-                target_label_path = self._get_label_path(target_image_path)
-                
-                # 读取现有的标签
-                existing_shapes = []
-                if os.path.exists(target_label_path):
-                    existing_shapes = self._load_existing_labels(target_label_path, target_img.shape)
-                
-                # 读取源图像并提取检测框内容
-                source_img = cv2.imread(source_image_path)
-                if source_img is None:
-                    continue
-                
-                # 提取检测框内的图像内容
-                x1, y1, x2, y2 = source_bbox
-                source_roi = source_img[y1:y2, x1:x2]
-                
-                # 应用旋转
-                rotated_roi = self._rotate_roi(source_roi, rotation_angle)
-                
-                # 寻找合适的位置放置检测框（避免重叠）
-                new_bbox = self._find_non_overlapping_position(
-                    target_img, rotated_roi, existing_shapes, source_bbox
-                )
-                
-                if new_bbox:
-                    # 将检测框内容粘贴到目标图像
-                    x1, y1, x2, y2 = new_bbox
-                    target_img[y1:y2, x1:x2] = rotated_roi
-                    
-                    # 保存修改后的图像
-                    cv2.imwrite(target_image_path, target_img)
-                    
-                    # 添加新的标签
-                    new_shape = Shape(label=source_label)
-                    
-                    # 根据旋转角度调整检测框坐标
-                    if rotation_angle == 0:
-                        # 0度：正常坐标
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[2], new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[2], new_bbox[3]))
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[3]))
-                    elif rotation_angle == 90:
-                        # 90度顺时针：宽高互换
-                        width = new_bbox[2] - new_bbox[0]
-                        height = new_bbox[3] - new_bbox[1]
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[0] + height, new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[0] + height, new_bbox[1] + width))
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[1] + width))
-                    elif rotation_angle == 180:
-                        # 180度：坐标不变
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[2], new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[2], new_bbox[3]))
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[3]))
-                    elif rotation_angle == 270:
-                        # 270度逆时针：宽高互换
-                        width = new_bbox[2] - new_bbox[0]
-                        height = new_bbox[3] - new_bbox[1]
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[0] + height, new_bbox[1]))
-                        new_shape.add_point(QPointF(new_bbox[0] + height, new_bbox[1] + width))
-                        new_shape.add_point(QPointF(new_bbox[0], new_bbox[1] + width))
-                    
-                    new_shape.close()
-                    
-                    # 保存标签文件
-                    self._save_label_file(target_label_path, existing_shapes + [new_shape])
-                    
-                    success_count += 1
-                    
-            except Exception as e:
-                print(f"处理图像 {target_image_path} 时出错: {str(e)}")
-                continue
-        
-        QMessageBox.information(self, "完成", f"成功从目录中随机复制检测框到 {success_count} 张图像")
+        job = CopyBboxRandomlyJob(self.dir_name, copy_count, self.label_file_format, self.label_hist)
+        self.run_batch_job(job, self.dir_name)
 
     def generate_rotation_augmentation(self):
         """生成当前图像的旋转增强版本"""
@@ -3163,333 +2950,27 @@ class MainWindow(QMainWindow, WindowMixin):
         # 获取当前图像路径
         image_path = self.file_path
         
-        # 读取图像
-        image = cv2.imread(image_path)
+        # 读取图像（当前图像已解码，直接复用）
+        image = self.image_buffer.bgr()
         if image is None:
             QMessageBox.warning(self, "Warning", "读取图像失败。")
             return
-        
-        # 获取图像尺寸
-        height, width = image.shape[:2]
-        
+
+        boxes = []
+        for shape in shapes:
+            points = shape.points
+            if len(points) >= 2:
+                x_coords = [p.x() for p in points]
+                y_coords = [p.y() for p in points]
+                boxes.append([shape.label, min(x_coords), min(y_coords), max(x_coords), max(y_coords),
+                              bool(shape.difficult)])
+
+        verified = self.label_file.verified if self.label_file else False
+        job = RotationAugmentationJob(image_path, boxes, aug_count, rotation_range, self.label_file_format,
+                                      self.label_hist, verified, image)
         # 保存到当前图像所在的文件夹
-        save_dir = os.path.dirname(image_path)
-        
-        success_count = 0
-        
-        try:
-            import albumentations as A
-            use_albumentations = True
-        except ImportError:
-            use_albumentations = False
-            print("警告: 未安装albumentations库，将使用OpenCV进行旋转（精度较低）")
-        
-        for i in range(aug_count):
-            # 随机生成旋转角度
-            angle = random.uniform(-rotation_range, rotation_range)
-            
-            if use_albumentations:
-                # 使用albumentations库进行精确的旋转和坐标变换
-                transform = A.Compose([
-                    A.Rotate(limit=angle, p=1.0, border_mode=cv2.BORDER_CONSTANT, value=0)
-                ], bbox_params=A.BboxParams(format='pascal_voc', label_fields=['class_labels']))
-                
-                # 准备边界框数据
-                bboxes = []
-                class_labels = []
-                for shape in shapes:
-                    points = shape.points
-                    if len(points) >= 2:
-                        # 计算边界框
-                        x_coords = [p.x() for p in points]
-                        y_coords = [p.y() for p in points]
-                        x_min, x_max = min(x_coords), max(x_coords)
-                        y_min, y_max = min(y_coords), max(y_coords)
-                        
-                        # 转换为Pascal VOC格式 (x_min, y_min, x_max, y_max)
-                        # 这是albumentations期望的格式
-                        bboxes.append([x_min, y_min, x_max, y_max])
-                        class_labels.append(shape.label)
-                
-                # 应用变换
-                transformed = transform(image=image, bboxes=bboxes, class_labels=class_labels)
-                rotated_image = transformed['image']
-                transformed_bboxes = transformed['bboxes']
-                
-                # 生成增强后的文件名
-                base_name = os.path.splitext(os.path.basename(image_path))[0]
-                aug_image_name = f"{base_name}_aug_{i+1:02d}.jpg"
-                aug_image_path = os.path.join(save_dir, aug_image_name)
-                
-                # 保存增强后的图像
-                cv2.imwrite(aug_image_path, rotated_image)
-                
-                # 处理标签坐标
-                if self.label_file_format == LabelFileFormat.YOLO:
-                    # YOLO格式：归一化坐标 (x_center, y_center, width, height)
-                    aug_labels = []
-                    for bbox, class_label in zip(transformed_bboxes, class_labels):
-                        x_min, y_min, x_max, y_max = bbox
-                        
-                        # 转换为YOLO格式
-                        x_center = (x_min + x_max) / 2
-                        y_center = (y_min + y_max) / 2
-                        w = x_max - x_min
-                        h = y_max - y_min
-                        
-                        # 归一化坐标
-                        x_center_norm = x_center / width
-                        y_center_norm = y_center / height
-                        w_norm = w / width
-                        h_norm = h / height
-                        
-                        # 确保坐标在有效范围内
-                        x_center_norm = max(0, min(1, x_center_norm))
-                        y_center_norm = max(0, min(1, y_center_norm))
-                        w_norm = max(0, min(1, w_norm))
-                        h_norm = max(0, min(1, h_norm))
-                        
-                        # 获取类别索引
-                        class_list = self._get_class_list()
-                        if class_label in class_list:
-                            class_index = class_list.index(class_label)
-                        else:
-                            class_index = 0
-                        
-                        aug_labels.append(f"{class_index} {x_center_norm:.6f} {y_center_norm:.6f} {w_norm:.6f} {h_norm:.6f}")
-                    
-                    # 保存增强后的标签文件
-                    aug_label_name = f"{base_name}_aug_{i+1:02d}.txt"
-                    aug_label_path = os.path.join(save_dir, aug_label_name)
-                    with open(aug_label_path, 'w', encoding='utf-8') as f:
-                        f.write('\n'.join(aug_labels))
-                
-                elif self.label_file_format == LabelFileFormat.PASCAL_VOC:
-                    # Pascal VOC格式：XML文件
-                    aug_label_name = f"{base_name}_aug_{i+1:02d}.xml"
-                    aug_label_path = os.path.join(save_dir, aug_label_name)
-                    self._save_pascal_voc_augmented_albumentations(shapes, transformed_bboxes, aug_label_path, aug_image_path, width, height, class_labels)
-            
-            else:
-                # 使用OpenCV进行旋转（精度较低）
-                # 计算旋转矩阵
-                center = (width // 2, height // 2)
-                rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
-                
-                # 执行图像旋转
-                rotated_image = cv2.warpAffine(image, rotation_matrix, (width, height))
-                
-                # 生成增强后的文件名
-                base_name = os.path.splitext(os.path.basename(image_path))[0]
-                aug_image_name = f"{base_name}_aug_{i+1:02d}.jpg"
-                aug_image_path = os.path.join(save_dir, aug_image_name)
-                
-                # 保存增强后的图像
-                cv2.imwrite(aug_image_path, rotated_image)
-                
-                # 处理标签坐标（使用改进的OpenCV方法）
-                if self.label_file_format == LabelFileFormat.YOLO:
-                    aug_labels = []
-                    for shape in shapes:
-                        points = shape.points
-                        if len(points) >= 2:
-                            # 计算边界框
-                            x_coords = [p.x() for p in points]
-                            y_coords = [p.y() for p in points]
-                            x_min, x_max = min(x_coords), max(x_coords)
-                            y_min, y_max = min(y_coords), max(y_coords)
-                            
-                            # 转换为YOLO格式
-                            x_center = (x_min + x_max) / 2 / width
-                            y_center = (y_min + y_max) / 2 / height
-                            w = (x_max - x_min) / width
-                            h = (y_max - y_min) / height
-                            
-                            # 使用改进的旋转坐标计算
-                            rotated_x_center, rotated_y_center = self._rotate_bbox_improved(
-                                x_center * width, y_center * height, w * width, h * height, center, angle
-                            )
-                            
-                            # 重新归一化
-                            rotated_x_center = max(0, min(1, rotated_x_center / width))
-                            rotated_y_center = max(0, min(1, rotated_y_center / height))
-                            
-                            # 获取类别索引
-                            label = shape.label
-                            class_list = self._get_class_list()
-                            if label in class_list:
-                                class_index = class_list.index(label)
-                            else:
-                                class_index = 0
-                            
-                            aug_labels.append(f"{class_index} {rotated_x_center:.6f} {rotated_y_center:.6f} {w:.6f} {h:.6f}")
-                    
-                    # 保存增强后的标签文件
-                    aug_label_name = f"{base_name}_aug_{i+1:02d}.txt"
-                    aug_label_path = os.path.join(save_dir, aug_label_name)
-                    with open(aug_label_path, 'w', encoding='utf-8') as f:
-                        f.write('\n'.join(aug_labels))
-                
-                elif self.label_file_format == LabelFileFormat.PASCAL_VOC:
-                    # Pascal VOC格式：XML文件
-                    aug_label_name = f"{base_name}_aug_{i+1:02d}.xml"
-                    aug_label_path = os.path.join(save_dir, aug_label_name)
-                    self._save_pascal_voc_augmented(shapes, aug_label_path, aug_image_path, width, height, center, angle)
-            
-            success_count += 1
-        
-        # 显示完成消息
-        result_msg = f"旋转增强完成！\n\n"
-        result_msg += f"增强数量: {success_count}\n"
-        result_msg += f"旋转角度范围: ±{rotation_range}°\n"
-        result_msg += f"保存位置: {save_dir}"
-        
-        QMessageBox.information(self, "旋转增强完成", result_msg)
-    
-    def _rotate_point(self, x, y, center, angle):
-        """旋转点坐标"""
-        import math
-        cx, cy = center
-        rad = math.radians(angle)
-        cos_a = math.cos(rad)
-        sin_a = math.sin(rad)
-        
-        # 平移到原点
-        x -= cx
-        y -= cy
-        
-        # 旋转
-        new_x = x * cos_a - y * sin_a
-        new_y = x * sin_a + y * cos_a
-        
-        # 平移回原位置
-        new_x += cx
-        new_y += cy
-        
-        return new_x, new_y
-    
-    def _rotate_bbox_improved(self, x_center, y_center, width, height, center, angle):
-        """改进的边界框旋转方法"""
-        import math
-        cx, cy = center
-        rad = math.radians(angle)
-        cos_a = math.cos(rad)
-        sin_a = math.sin(rad)
-        
-        # 计算边界框的四个角点
-        corners = [
-            (x_center - width/2, y_center - height/2),  # 左上
-            (x_center + width/2, y_center - height/2),  # 右上
-            (x_center + width/2, y_center + height/2),  # 右下
-            (x_center - width/2, y_center + height/2)   # 左下
-        ]
-        
-        # 旋转所有角点
-        rotated_corners = []
-        for x, y in corners:
-            # 平移到原点
-            x -= cx
-            y -= cy
-            
-            # 旋转
-            new_x = x * cos_a - y * sin_a
-            new_y = x * sin_a + y * cos_a
-            
-            # 平移回原位置
-            new_x += cx
-            new_y += cy
-            
-            rotated_corners.append((new_x, new_y))
-        
-        # 计算旋转后的边界框中心点和尺寸
-        x_coords = [x for x, y in rotated_corners]
-        y_coords = [y for x, y in rotated_corners]
-        
-        new_x_center = (min(x_coords) + max(x_coords)) / 2
-        new_y_center = (min(y_coords) + max(y_coords)) / 2
-        new_width = max(x_coords) - min(x_coords)
-        new_height = max(y_coords) - min(y_coords)
-        
-        return new_x_center, new_y_center
-    
-    def _get_class_list(self):
-        """获取类别列表"""
-        if hasattr(self, 'label_hist') and self.label_hist:
-            return self.label_hist
-        else:
-            # 如果没有预定义类别，返回默认类别
-            return ['object']
-    
-    def _save_pascal_voc_augmented(self, shapes, label_path, image_path, width, height, center, angle):
-        """保存Pascal VOC格式的增强标签"""
-        try:
-            from libs.pascal_voc_io import PascalVocWriter
-            
-            img_folder_name = os.path.basename(os.path.dirname(image_path))
-            img_file_name = os.path.basename(image_path)
-            image_shape = [height, width, 3]
-            
-            writer = PascalVocWriter(img_folder_name, img_file_name, image_shape, local_img_path=image_path)
-            writer.verified = self.label_file.verified if self.label_file else False
-            
-            for shape in shapes:
-                points = shape.points  # 使用shape.points而不是shape['points']
-                label = shape.label  # 使用shape.label而不是shape['label']
-                difficult = int(shape.difficult if hasattr(shape, 'difficult') else 0)
-                
-                # 旋转边界框坐标
-                rotated_points = []
-                for point in points:
-                    rotated_x, rotated_y = self._rotate_point(point.x(), point.y(), center, angle)
-                    rotated_points.append([rotated_x, rotated_y])
-                
-                # 计算旋转后的边界框
-                x_coords = [p[0] for p in rotated_points]
-                y_coords = [p[1] for p in rotated_points]
-                x_min = max(0, min(x_coords))
-                y_min = max(0, min(y_coords))
-                x_max = min(width, max(x_coords))
-                y_max = min(height, max(y_coords))
-                
-                # 确保边界框在图像范围内
-                if x_max > x_min and y_max > y_min:
-                    writer.add_bnd_box(x_min, y_min, x_max, y_max, label, difficult)
-            
-            writer.save(target_file=label_path)
-            
-        except Exception as e:
-            print(f"保存Pascal VOC格式标签时出错: {str(e)}")
-    
-    def _save_pascal_voc_augmented_albumentations(self, shapes, transformed_bboxes, label_path, image_path, width, height, class_labels):
-        """使用albumentations结果保存Pascal VOC格式的增强标签"""
-        try:
-            from libs.pascal_voc_io import PascalVocWriter
-            
-            img_folder_name = os.path.basename(os.path.dirname(image_path))
-            img_file_name = os.path.basename(image_path)
-            image_shape = [height, width, 3]
-            
-            writer = PascalVocWriter(img_folder_name, img_file_name, image_shape, local_img_path=image_path)
-            writer.verified = self.label_file.verified if self.label_file else False
-            
-            for bbox, class_label in zip(transformed_bboxes, class_labels):
-                x_min, y_min, x_max, y_max = bbox
-                
-                # 确保边界框在图像范围内
-                x_min = max(0, min(width, x_min))
-                y_min = max(0, min(height, y_min))
-                x_max = max(0, min(width, x_max))
-                y_max = max(0, min(height, y_max))
-                
-                # 确保边界框有效
-                if x_max > x_min and y_max > y_min:
-                    writer.add_bnd_box(x_min, y_min, x_max, y_max, class_label, 0)
-            
-            writer.save(target_file=label_path)
-            
-        except Exception as e:
-            print(f"保存Pascal VOC格式标签时出错: {str(e)}")
-    
+        self.run_batch_job(job, os.path.dirname(image_path))
+
     def copy_images_with_bbox(self):
         """自动识别整个目录下所有图像和检测框，复制指定数量的图像，随机保留指定百分比的检测框"""
         if not self.dir_name:
@@ -3512,80 +2993,10 @@ class MainWindow(QMainWindow, WindowMixin):
             QMessageBox.warning(self, "警告", "检测框保留百分比必须在1-100之间")
             return
         
-        # 获取目录中的所有图像文件
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
-        all_image_files = []
-        for file in os.listdir(self.dir_name):
-            if any(file.lower().endswith(ext) for ext in image_extensions):
-                all_image_files.append(os.path.join(self.dir_name, file))
-        
-        if not all_image_files:
-            QMessageBox.warning(self, "警告", "目录中没有找到图像文件")
-            return
-        
-        # 收集所有图像的检测框信息
-        all_images_with_bbox = []  # 存储 (图像路径, 检测框列表, 标签列表)
-        
-        for image_path in all_image_files:
-            label_path = self._get_label_path(image_path)
-            if os.path.exists(label_path):
-                try:
-                    # 读取图像获取尺寸
-                    img = cv2.imread(image_path)
-                    if img is not None:
-                        shapes = self._load_existing_labels(label_path, img.shape)
-                        if shapes:  # 只处理有检测框的图像
-                            all_images_with_bbox.append((image_path, shapes, img))
-                except Exception as e:
-                    print(f"处理图像 {image_path} 时出错: {str(e)}")
-                    continue
-        
-        if not all_images_with_bbox:
-            QMessageBox.warning(self, "警告", "目录中没有找到包含检测框的图像")
-            return
-        
         # 直接使用当前目录，不创建子文件夹
-        output_dir = self.dir_name
-        
-        success_count = 0
-        
-        # 为每张有检测框的图像创建指定数量的副本
-        for source_image_path, source_shapes, source_img in all_images_with_bbox:
-            base_name = os.path.splitext(os.path.basename(source_image_path))[0]
-            
-            for i in range(copy_count):
-                try:
-                    # 创建新的图像文件名
-                    new_image_name = f"{base_name}_aug_{i+1:03d}.jpg"
-                    new_image_path = os.path.join(output_dir, new_image_name)
-                    
-                    # 复制图像
-                    new_img = source_img.copy()
-                    
-                    # 计算要保留的检测框数量（向上取整）
-                    total_bboxes = len(source_shapes)
-                    keep_count = max(1, int((total_bboxes * bbox_keep_percent + 99) / 100))  # 向上取整
-                    
-                    # 随机选择要保留的检测框
-                    import random
-                    selected_shapes = random.sample(source_shapes, min(keep_count, total_bboxes))
-                    
-                    # 创建新的标签文件
-                    new_label_path = self._get_label_path(new_image_path)
-                    
-                    # 保存新图像
-                    cv2.imwrite(new_image_path, new_img)
-                    
-                    # 保存新的标签文件
-                    self._save_label_file(new_label_path, selected_shapes)
-                    
-                    success_count += 1
-                    
-                except Exception as e:
-                    print(f"创建图像副本 {new_image_name} 时出错: {str(e)}")
-                    continue
-        
-        QMessageBox.information(self, "完成", f"成功创建 {success_count} 张增强图像到 {output_dir} 目录")
+        job = CopyImagesWithBboxJob(self.dir_name, copy_count, bbox_keep_percent, self.label_file_format,
+                                    self.label_hist)
+        self.run_batch_job(job, self.dir_name, workers=default_worker_count())
     
     def unify_bbox_sizes(self):
         """统一调整目录下所有标签的宽高为设定的值，保持检测框中心点不变"""
@@ -3606,87 +3017,8 @@ class MainWindow(QMainWindow, WindowMixin):
             return
         
         # 直接执行，不显示确认弹窗
-        
-        # 获取目录中的所有图像文件
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
-        all_image_files = []
-        for file in os.listdir(self.dir_name):
-            if any(file.lower().endswith(ext) for ext in image_extensions):
-                all_image_files.append(os.path.join(self.dir_name, file))
-        
-        if not all_image_files:
-            QMessageBox.warning(self, "警告", "目录中没有找到图像文件")
-            return
-        
-        # 统计需要处理的标签文件
-        processed_count = 0
-        modified_count = 0
-        
-        for image_path in all_image_files:
-            label_path = self._get_label_path(image_path)
-            if os.path.exists(label_path):
-                try:
-                    # 读取图像获取尺寸
-                    img = cv2.imread(image_path)
-                    if img is not None:
-                        shapes = self._load_existing_labels(label_path, img.shape)
-                        if shapes:
-                            processed_count += 1
-                            
-                            # 修改每个检测框的尺寸
-                            modified_shapes = []
-                            for shape in shapes:
-                                # 计算当前检测框的中心点
-                                shape_points = [(p.x(), p.y()) for p in shape.points]
-                                if len(shape_points) >= 4:
-                                    current_bbox = self._get_bbox_from_points(shape_points)
-                                    if current_bbox:
-                                        x1, y1, x2, y2 = current_bbox
-                                        center_x = (x1 + x2) / 2
-                                        center_y = (y1 + y2) / 2
-                                        
-                                        # 计算新的边界框，保持中心点不变
-                                        new_x1 = int(center_x - target_width / 2)
-                                        new_y1 = int(center_y - target_height / 2)
-                                        new_x2 = int(center_x + target_width / 2)
-                                        new_y2 = int(center_y + target_height / 2)
-                                        
-                                        # 确保边界框在图像范围内
-                                        img_height, img_width = img.shape[:2]
-                                        new_x1 = max(0, min(img_width - target_width, new_x1))
-                                        new_y1 = max(0, min(img_height - target_height, new_y1))
-                                        new_x2 = new_x1 + target_width
-                                        new_y2 = new_y1 + target_height
-                                        
-                                        # 创建新的Shape对象
-                                        new_shape = Shape(label=shape.label)
-                                        new_shape.add_point(QPointF(new_x1, new_y1))
-                                        new_shape.add_point(QPointF(new_x2, new_y1))
-                                        new_shape.add_point(QPointF(new_x2, new_y2))
-                                        new_shape.add_point(QPointF(new_x1, new_y2))
-                                        new_shape.close()
-                                        
-                                        modified_shapes.append(new_shape)
-                                    else:
-                                        # 如果无法获取边界框，保持原样
-                                        modified_shapes.append(shape)
-                                else:
-                                    # 如果点数不足，保持原样
-                                    modified_shapes.append(shape)
-                            
-                            # 保存修改后的标签文件
-                            if modified_shapes:
-                                self._save_label_file(label_path, modified_shapes)
-                                modified_count += 1
-                                
-                except Exception as e:
-                    print(f"处理标签文件 {label_path} 时出错: {str(e)}")
-                    continue
-        
-        if processed_count == 0:
-            QMessageBox.information(self, "完成", "目录中没有找到需要处理的标签文件")
-        else:
-            QMessageBox.information(self, "完成", f"成功处理 {processed_count} 个标签文件，修改了 {modified_count} 个文件")
+        job = UnifyBboxSizesJob(self.dir_name, target_width, target_height, self.label_file_format, self.label_hist)
+        self.run_batch_job(job, self.dir_name, workers=default_worker_count())
     
     def toggle_group_box(self, group_box, checked):
         """切换GroupBox的折叠/展开状态"""
@@ -3699,16 +3031,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def _rotate_roi(self, roi, angle):
         """旋转ROI图像，角度为0, 90, 180, 270度"""
-        if angle == 0:
-            return roi
-        elif angle == 90:
-            return cv2.rotate(roi, cv2.ROTATE_90_CLOCKWISE)
-        elif angle == 180:
-            return cv2.rotate(roi, cv2.ROTATE_180)
-        elif angle == 270:
-            return cv2.rotate(roi, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        else:
-            return roi
+        return rotate_roi(roi, angle)
 
     def _rotate_bbox_coordinates(self, bbox, roi_width, roi_height, angle):
         """根据旋转角度计算检测框的新坐标"""
@@ -3846,15 +3169,17 @@ class MainWindow(QMainWindow, WindowMixin):
             if reply == QMessageBox.Yes:
                 # 清空所有形状
                 self.canvas.shapes = []
+                self.canvas.shape_index.invalidate()
                 self.label_list.clear()
                 
                 # 更新shapes_to_items映射
                 self.shapes_to_items = {}
                 self.items_to_shapes = {}
+                self.label_counts.clear()
+                self.update_combo_box()
                 
                 # 更新画布显示
                 self.canvas.update()
-                self.canvas.repaint()
                 self.set_dirty()
                 
                 # 显示删除完成提示
@@ -3871,9 +3196,8 @@ class MainWindow(QMainWindow, WindowMixin):
         original_shape = self.canvas.selected_shape
         original_label = original_shape.label if original_shape else ""
         
-        # 复制原始形状用于后续重叠度计算
-        import copy
-        original_shape_copy = copy.deepcopy(original_shape)
+        # 将原始选区栅格化一次，用于后续重叠度计算
+        coverage = PolygonCoverage([(p.x(), p.y()) for p in original_shape.points])
         
         # 删除原始检测框
         self.canvas.delete_selected()
@@ -3931,6 +3255,15 @@ class MainWindow(QMainWindow, WindowMixin):
             
             return overlap_area / smaller_area if smaller_area > 0 else 0
         
+        # 已添加方块的均匀网格索引，只需检查相邻网格中的方块
+        block_index = {}
+        
+        def index_cells(rect):
+            """矩形覆盖的索引网格坐标"""
+            for ix in range(int(rect[0] // grid_step_x), int(rect[2] // grid_step_x) + 1):
+                for iy in range(int(rect[1] // grid_step_y), int(rect[3] // grid_step_y) + 1):
+                    yield ix, iy
+        
         # 判断一个区域是否为角落区域或边界区域
         def is_corner_or_edge_region(x1, y1, x2, y2):
             """判断当前方块是否靠近原始边界的角落或边缘区域"""
@@ -3964,6 +3297,12 @@ class MainWindow(QMainWindow, WindowMixin):
                     dist_to_top < edge_threshold or
                     dist_to_bottom < edge_threshold)
         
+        # 一次性计算所有网格方块与原始选区的重叠度
+        grid_x1 = grid_start_x + np.arange(cols) * grid_step_x
+        grid_y1 = grid_start_y + np.arange(rows) * grid_step_y
+        cell_x1, cell_y1 = np.meshgrid(grid_x1, grid_y1)
+        overlap_ratios = coverage.ratios(cell_x1, cell_y1, cell_x1 + cut_width, cell_y1 + cut_height)
+        
         # 按照网格布局创建方块，实现更灵活的边界处理
         for row in range(rows):
             for col in range(cols):
@@ -3973,9 +3312,8 @@ class MainWindow(QMainWindow, WindowMixin):
                 x2 = x1 + cut_width
                 y2 = y1 + cut_height
                 
-                # 计算这个方块与原始选区的重叠度
-                overlap_ratio = self._calculate_overlap_ratio(
-                    x1, y1, x2, y2, original_shape_copy)
+                # 这个方块与原始选区的重叠度
+                overlap_ratio = overlap_ratios[row, col]
                 
                 # 判断是否为角落或边缘区域，使用不同的重叠度阈值
                 current_threshold = CORNER_OVERLAP_THRESHOLD if is_corner_or_edge_region(x1, y1, x2, y2) else OVERLAP_THRESHOLD
@@ -3984,25 +3322,19 @@ class MainWindow(QMainWindow, WindowMixin):
                 if overlap_ratio < current_threshold:
                     continue
                 
-                # 检查与已添加的相邻区块的重叠度
-                too_much_overlap = False
-                for existing_shape in new_shapes:
-                    # 获取已有形状的边界
-                    existing_points = existing_shape.points
-                    ex1, ey1 = existing_points[0].x(), existing_points[0].y()
-                    ex2, ey2 = existing_points[2].x(), existing_points[2].y()
-                    
-                    # 计算与当前方块的重叠比例
-                    adj_overlap = calculate_rect_overlap((x1, y1, x2, y2), (ex1, ey1, ex2, ey2))
-                    
-                    # 如果重叠度超过最大允许值，则跳过这个方块
-                    if adj_overlap > MAX_ADJACENT_OVERLAP:
-                        too_much_overlap = True
-                        break
+                # 检查与相邻网格中已添加区块的重叠度
+                rect = (x1, y1, x2, y2)
+                cells = list(index_cells(rect))
+                too_much_overlap = any(
+                    calculate_rect_overlap(rect, existing_rect) > MAX_ADJACENT_OVERLAP
+                    for cell in cells for existing_rect in block_index.get(cell, ()))
                 
                 if too_much_overlap:
                     continue
                 
+                for cell in cells:
+                    block_index.setdefault(cell, []).append(rect)
+                
                 # 创建新形状
                 new_shape = Shape()
                 new_shape.add_point(QPointF(x1, y1))
@@ -4017,35 +3349,17 @@ class MainWindow(QMainWindow, WindowMixin):
         
         # 确保新创建的形状被正确添加到画布
         if new_shapes:  # 只有当有新形状创建时才执行添加操作
-            for shape in new_shapes:
-                self.canvas.shapes.append(shape)
-                self.add_label(shape)
+            self.canvas.shapes.extend(new_shapes)
+            self.canvas.shape_index.invalidate()
+            self.add_labels(new_shapes)
             
-            # 立即更新画布显示
-            self.canvas.repaint()
+            # 更新画布显示
+            self.canvas.update()
             self.set_dirty()
             
             # 显示切割完成的提示信息
             QMessageBox.information(self, "切割完成", f"已将检测框切割为 {len(new_shapes)} 个小检测框")
     
-    def _calculate_overlap_ratio(self, x1, y1, x2, y2, original_shape, sample_step=5):
-        """计算矩形块与原始形状的重叠像素比例"""
-        overlap_pixels = 0
-        total_pixels = 0
-        
-        # 使用适当的采样步长进行计算
-        for px in range(int(x1), int(x2), sample_step):
-            for py in range(int(y1), int(y2), sample_step):
-                total_pixels += 1
-                # 检查点是否在原始选区的边界上或内部
-                if original_shape.contains_point(QPointF(px, py)):
-                    overlap_pixels += 1
-        
-        # 返回重叠比例
-        return overlap_pixels / total_pixels if total_pixels > 0 else 0
-        
-        # 该部分代码已移除，避免重复执行
-    
     def _calculate_coverage_score(self, x1, y1, x2, y2, original_shape, sample_step=5):
         """计算一个矩形块对原始形状的覆盖得分"""
         overlap_pixels = 0
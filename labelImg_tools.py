@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+labelImg-tools: 不启动界面，在命令行中运行数据集批处理工具。
+
+    python labelImg_tools.py --workers 32 fog-extract DATASET OUTPUT --threshold 12
+    python labelImg_tools.py video-label FRAME_DIR
+    python labelImg_tools.py unify DIR --width 35 --height 35 --format yolo
+
+Every command runs the same BatchJob as the corresponding MainWindow button,
+without a QApplication or any dialog. Use --checkpoint to make a long run
+resumable and --seed to make the random tools reproducible.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import cv2
+
+from libs.batchJob import run_job
+from libs.dataset_tools import (CopyBboxRandomlyJob, CopyImagesWithBboxJob, ExtractClass0Job, ExtractTrainDataJob,
+                                FogVideoLabelJob, RotationAugmentationJob, UnifyBboxSizesJob, VideoLabelJob,
+                                label_path_for, load_boxes)
+from libs.fog_extract import FogTrainDataJob, default_worker_count
+from libs.fog_metrics import DEFAULT_FOG_METRIC, DEFAULT_FOG_THRESHOLD, FOG_METRICS
+from libs.labelFile import LabelFileFormat
+
+LABEL_FORMATS = {
+    'voc': LabelFileFormat.PASCAL_VOC,
+    'yolo': LabelFileFormat.YOLO,
+    'createml': LabelFileFormat.CREATE_ML,
+}
+DEFAULT_CLASS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'predefined_classes.txt')
+
+
+def read_class_list(class_file, dir_path):
+    """类别列表：--classes 指定的文件，否则目录中的classes.txt，否则预定义类别"""
+    for path in (class_file, os.path.join(dir_path, 'classes.txt'), DEFAULT_CLASS_FILE):
+        if path and os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+    return []
+
+
+def fog_extract_job(args):
+    return FogTrainDataJob(os.path.join(args.dataset, 'images'), os.path.join(args.dataset, 'labels'),
+                           args.output, args.threshold, args.metric, allow_link=args.link), True
+
+
+def video_label_job(args):
+    return VideoLabelJob(args.dir), False
+
+
+def fog_video_label_job(args):
+    return FogVideoLabelJob(args.dir, args.threshold, args.metric), False
+
+
+def extract_train_job(args):
+    return ExtractTrainDataJob(args.dir, os.path.join(args.output, 'Label_fog_train_data')), False
+
+
+def extract_class0_job(args):
+    class0_folder = os.path.join(args.output, os.path.basename(os.path.normpath(args.dir)))
+    return ExtractClass0Job(args.dir, class0_folder, read_class_list(args.classes, args.dir)), False
+
+
+def copy_bbox_job(args):
+    return CopyBboxRandomlyJob(args.dir, args.count, LABEL_FORMATS[args.format],
+                               read_class_list(args.classes, args.dir)), False
+
+
+def copy_images_job(args):
+    return CopyImagesWithBboxJob(args.dir, args.count, args.keep_percent, LABEL_FORMATS[args.format],
+                                 read_class_list(args.classes, args.dir)), False
+
+
+def unify_job(args):
+    return UnifyBboxSizesJob(args.dir, args.width, args.height, LABEL_FORMATS[args.format],
+                             read_class_list(args.classes, args.dir)), False
+
+
+def rotate_job(args):
+    label_format = LABEL_FORMATS[args.format]
+    image = cv2.imread(args.image)
+    if image is None:
+        raise SystemExit("无法读取图像: %s" % args.image)
+    label_path = label_path_for(args.image, label_format)
+    if not os.path.exists(label_path):
+        raise SystemExit("未找到标签文件: %s" % label_path)
+    boxes = load_boxes(label_path, image.shape, label_format)
+    if not boxes:
+        raise SystemExit("当前图像没有标签数据: %s" % label_path)
+    class_list = read_class_list(args.classes, os.path.dirname(args.image))
+    return RotationAugmentationJob(args.image, boxes, args.count, args.range, label_format,
+                                   class_list, image=image), False
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='labelImg-tools', description='labelImg 数据集批处理工具（无界面）')
+    parser.add_argument('--workers', type=int, default=default_worker_count(),
+                        help='并行数，默认为CPU核数')
+    parser.add_argument('--checkpoint', help='检查点文件，中断后使用同一个文件再次运行将从中断处继续')
+    parser.add_argument('--seed', type=int, help='随机种子，配合 --workers 1 使随机复制和旋转增强可复现')
+    parser.add_argument('--quiet', action='store_true', help='不输出进度')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    def add_command(name, factory, help_text):
+        command = commands.add_parser(name, help=help_text)
+        command.set_defaults(factory=factory)
+        return command
+
+    def add_fog_options(command):
+        command.add_argument('--threshold', type=float, default=DEFAULT_FOG_THRESHOLD, help='有雾阈值')
+        command.add_argument('--metric', choices=FOG_METRICS, default=DEFAULT_FOG_METRIC, help='V/S比值计算方式')
+
+    def add_label_options(command):
+        command.add_argument('--format', choices=sorted(LABEL_FORMATS), default='yolo', help='标签格式')
+        command.add_argument('--classes', help='类别文件，默认为目录中的classes.txt')
+
+    command = add_command('fog-extract', fog_extract_job, '提取阈值有雾训练数据')
+    command.add_argument('dataset', help='包含images和labels文件夹的目录')
+    command.add_argument('output', help='输出目录')
+    command.add_argument('--link', action='store_true',
+                         help='输出图像硬链接到源图像，速度快且不占额外空间；之后原地修改输出图像会同时修改源数据集')
+    add_fog_options(command)
+
+    command = add_command('video-label', video_label_job, '根据标签类别生成视频标签')
+    command.add_argument('dir', help='视频帧目录')
+
+    command = add_command('fog-video-label', fog_video_label_job, '根据有雾阈值生成视频标签')
+    command.add_argument('dir', help='视频帧目录')
+    add_fog_options(command)
+
+    command = add_command('extract-train', extract_train_job, '提取有雾训练数据')
+    command.add_argument('dir', help='图像和txt标签所在目录')
+    command.add_argument('output', help='输出目录，结果保存在其中的Label_fog_train_data文件夹')
+
+    command = add_command('extract-class0', extract_class0_job, '提取类别0标签')
+    command.add_argument('dir', help='图像和txt标签所在目录')
+    command.add_argument('output', help='输出目录，结果保存在与输入目录同名的文件夹')
+    command.add_argument('--classes', help='类别文件，用于生成classes.txt')
+
+    command = add_command('copy-bbox', copy_bbox_job, '随机复制所有检测框到其他图像')
+    command.add_argument('dir', help='图像目录')
+    command.add_argument('--count', type=int, required=True, help='目标图像数量')
+    add_label_options(command)
+
+    command = add_command('copy-images', copy_images_job, '复制图像并随机保留检测框')
+    command.add_argument('dir', help='图像目录')
+    command.add_argument('--count', type=int, default=1, help='每张图像的副本数量')
+    command.add_argument('--keep-percent', type=int, default=100, help='检测框保留百分比')
+    add_label_options(command)
+
+    command = add_command('unify', unify_job, '统一检测框大小')
+    command.add_argument('dir', help='图像目录')
+    command.add_argument('--width', type=int, default=35, help='检测框宽度')
+    command.add_argument('--height', type=int, default=35, help='检测框高度')
+    add_label_options(command)
+
+    command = add_command('rotate', rotate_job, '生成一张图像的旋转增强版本')
+    command.add_argument('image', help='图像路径，标签文件与图像同名')
+    command.add_argument('--count', type=int, default=5, help='增强数量')
+    command.add_argument('--range', type=int, default=30, help='旋转角度范围（±度）')
+    add_label_options(command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    job, use_processes = args.factory(args)
+
+    def progress(done, total):
+        if not args.quiet:
+            sys.stderr.write('\r%s: %d / %d' % (job.title, done, total))
+            sys.stderr.flush()
+
+    start = time.time()
+    report = run_job(job, workers=args.workers, progress=progress, checkpoint_path=args.checkpoint,
+                     use_processes=use_processes)
+    if not args.quiet:
+        sys.stderr.write('\n')
+    if report.failed is not None:
+        print('失败: %s' % report.failed, file=sys.stderr)
+        return 2
+    for item, message in report.errors:
+        print('%s: %s' % (item, message), file=sys.stderr)
+    print(report.summary)
+    print('%d / %d 项，失败 %d 项，用时 %.2f 秒' % (report.done, report.total, len(report.errors), time.time() - start))
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+try:
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtCore import *
+
+import os
+
+from libs.ustr import ustr
+from libs.pascal_voc_io import XML_EXT
+from libs.yolo_io import TXT_EXT
+from libs.create_ml_io import JSON_EXT
+
+# 按优先级排列：PascalXML > YOLO > CreateML
+ANNOTATION_EXTS = (XML_EXT, TXT_EXT, JSON_EXT)
+
+
+class AnnotationIndex(QObject):
+    """
+    Which annotation files exist next to the images, one os.scandir per directory.
+
+    A directory is listed the first time an image in it is looked up and then
+    watched; when it changes only that directory is listed again. Lookups never
+    touch the filesystem, which matters on network shares where every stat is
+    a round trip.
+    """
+    changed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super(AnnotationIndex, self).__init__(parent)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._directory_changed)
+        # 目录 -> {文件名主干: {扩展名: mtime}}
+        self._dirs = {}
+
+    def clear(self):
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self._dirs.clear()
+
+    def scan(self, dir_path):
+        """List dir_path again and start watching it."""
+        dir_path = os.path.normcase(os.path.abspath(dir_path))
+        entries = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext not in ANNOTATION_EXTS:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    entries.setdefault(os.path.normcase(stem), {})[ext] = mtime
+        except OSError:
+            # 目录不存在或不可读时不缓存，下次查找时重新列出
+            if self._dirs.pop(dir_path, None) is not None:
+                self.watcher.removePath(dir_path)
+            return {}
+        if dir_path not in self._dirs:
+            self.watcher.addPath(dir_path)
+        self._dirs[dir_path] = entries
+        return entries
+
+    def annotations(self, dir_path, stem):
+        """:return: {扩展名: mtime}，dir_path 下名为 stem 的标注文件"""
+        dir_path = os.path.normcase(os.path.abspath(dir_path))
+        entries = self._dirs.get(dir_path)
+        if entries is None:
+            entries = self.scan(dir_path)
+        return entries.get(os.path.normcase(stem), {})
+
+    def find(self, dir_path, stem):
+        """:return: 优先级最高的标注文件路径，没有时返回 None"""
+        found = self.annotations(dir_path, stem)
+        for ext in ANNOTATION_EXTS:
+            if ext in found:
+                return os.path.join(dir_path, stem + ext)
+        return None
+
+    def add(self, path):
+        """Record an annotation file written by the application without waiting for the watcher."""
+        dir_path, name = os.path.split(os.path.abspath(path))
+        dir_path = os.path.normcase(dir_path)
+        stem, ext = os.path.splitext(name)
+        entries = self._dirs.get(dir_path)
+        if entries is None or ext not in ANNOTATION_EXTS:
+            return
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+        entries.setdefault(os.path.normcase(stem), {})[ext] = mtime
+
+    def _directory_changed(self, dir_path):
+        dir_path = ustr(dir_path)
+        if os.path.normcase(dir_path) in self._dirs:
+            self.scan(dir_path)
+            self.changed.emit(dir_path)
+
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batch jobs for the dataset tools.
+
+A job splits its work into independent items. run_job() processes the items,
+collects per-item errors instead of stopping at the first one, honours
+cancellation, and appends every finished item to a checkpoint file so an
+interrupted job resumes where it stopped. Nothing in here depends on Qt.
+"""
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+
+class BatchJob(object):
+    """
+    Base class of a batch tool.
+
+    prepare() lists the items, process() handles one item and returns a
+    JSON-serialisable result, finish() turns all results into a summary.
+    Items and results are stored in the checkpoint, so both must be plain
+    JSON values (tuples come back as lists after a resume).
+    """
+    title = ''
+    # Names of the attributes that hold the job's settings. They are written
+    # into the checkpoint, and a checkpoint made with other settings is not resumed.
+    params = ()
+    # 1 for jobs whose items touch the same files and must run one after another
+    max_workers = None
+
+    def param_values(self):
+        """:return: {参数名: 参数值}，转换为 JSON 值，与检查点中读出的值可以直接比较"""
+        return json.loads(json.dumps(dict((name, getattr(self, name)) for name in self.params),
+                                     ensure_ascii=False, default=_plain))
+
+    def setup(self):
+        """Called before any item is processed, both for a new run and for a resumed one."""
+        pass
+
+    def prepare(self):
+        """:return: list of items to process"""
+        return []
+
+    def process(self, item):
+        raise NotImplementedError
+
+    def finish(self, results):
+        """
+        :param results: [(item, result)] of all successfully processed items, in item order
+        :return: summary text
+        """
+        return ''
+
+
+class JobReport(object):
+
+    def __init__(self, title):
+        self.title = title
+        self.total = 0
+        self.done = 0
+        self.resumed = 0
+        self.errors = []
+        self.cancelled = False
+        self.failed = None
+        self.summary = ''
+
+    def ok(self):
+        return not self.cancelled and self.failed is None
+
+
+def _plain(value):
+    # Enum 等非 JSON 类型的参数按名称记录
+    return getattr(value, 'name', None) or str(value)
+
+
+class JobCheckpoint(object):
+    """
+    JSON lines file: a header with the job title, its parameters and its items, then one line per finished item.
+    Appending and flushing after each item means a crash loses at most the items in flight.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def exists(self):
+        return bool(self.path) and os.path.isfile(self.path)
+
+    def header(self):
+        """:return: 检查点的第一行，没有或无法读取时返回 None"""
+        if not self.exists():
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            try:
+                return json.loads(f.readline())
+            except ValueError:
+                return None
+
+    def matches(self, title, params):
+        """Whether the checkpoint was written by a job with this title and these parameters."""
+        header = self.header()
+        return header is not None and header.get('title') == title and header.get('params', {}) == params
+
+    def load(self, title, params):
+        """:return: (items, {index: result}), or (None, {}) if there is no usable checkpoint for this job"""
+        if not self.matches(title, params):
+            return None, {}
+        results = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be cut short by a crash.
+                    break
+                results[record['index']] = record['result']
+        return header['items'], results
+
+    def start(self, title, params, items):
+        if not self.path:
+            return
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.write(json.dumps({'title': title, 'params': params, 'items': items}, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def resume(self):
+        if self.path:
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, index, result):
+        if self._file is None:
+            return
+        self._file.write(json.dumps({'index': index, 'result': result}, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if self.exists():
+            os.remove(self.path)
+
+
+def _describe(item):
+    if isinstance(item, (list, tuple)) and item:
+        return str(item[0])
+    return str(item)
+
+
+def run_job(job, workers=1, progress=None, is_cancelled=None, checkpoint_path=None, use_processes=False):
+    """
+    处理一个批量任务。
+    :param job: BatchJob
+    :param workers: 并行数，job.max_workers 会限制该值
+    :param progress: 可选回调 progress(done, total)
+    :param is_cancelled: 可选回调，返回 True 时不再开始新的条目；已完成的条目保留在检查点中
+    :param checkpoint_path: 检查点文件路径，存在且任务参数相同时从中断处继续
+    :param use_processes: 用进程池代替线程池，job 必须可以被 pickle
+    :return: JobReport
+    """
+    report = JobReport(job.title)
+    checkpoint = JobCheckpoint(checkpoint_path)
+    try:
+        params = job.param_values()
+        job.setup()
+        items, results = checkpoint.load(job.title, params)
+        if items is None:
+            items = job.prepare()
+            checkpoint.start(job.title, params, items)
+        else:
+            checkpoint.resume()
+    except Exception as e:
+        checkpoint.close()
+        report.failed = str(e)
+        return report
+
+    report.total = len(items)
+    report.resumed = report.done = len(results)
+    todo = [index for index in range(len(items)) if index not in results]
+    if job.max_workers:
+        workers = min(workers, job.max_workers)
+    workers = max(1, int(workers or 1))
+
+    def cancelled():
+        return is_cancelled is not None and is_cancelled()
+
+    def collect(index, result=None, error=None):
+        if error is None:
+            results[index] = result
+            checkpoint.record(index, result)
+        else:
+            report.errors.append((_describe(items[index]), error))
+        report.done += 1
+        if progress is not None:
+            progress(report.done, report.total)
+
+    if progress is not None:
+        progress(report.done, report.total)
+    try:
+        if workers == 1:
+            for index in todo:
+                if cancelled():
+                    report.cancelled = True
+                    break
+                try:
+                    result = job.process(items[index])
+                except Exception as e:
+                    collect(index, error=str(e))
+                    continue
+                collect(index, result)
+        else:
+            executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            # Keep a bounded number of items in flight so huge folders do not queue every item up front.
+            max_pending = workers * 4
+            pending = {}
+            queue = iter(todo)
+            with executor_class(max_workers=workers) as executor:
+                while True:
+                    if cancelled():
+                        report.cancelled = True
+                    while not report.cancelled and len(pending) < max_pending:
+                        index = next(queue, None)
+                        if index is None:
+                            break
+                        pending[executor.submit(job.process, items[index])] = index
+                    if not pending:
+                        break
+                    done, _ = wait(list(pending), timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = pending.pop(future)
+                        error = future.exception()
+                        if error is not None:
+                            collect(index, error=str(error))
+                        else:
+                            collect(index, future.result())
+                    if not done and progress is not None:
+                        # Give the caller a chance to keep its UI responsive while items are in flight.
+                        progress(report.done, report.total)
+    finally:
+        checkpoint.close()
+
+    if report.cancelled:
+        report.summary = '已取消，完成 %d / %d，再次运行将从中断处继续' % (report.done, report.total)
+        return report
+    try:
+        report.summary = job.finish([(items[index], results[index]) for index in sorted(results)])
+    except Exception as e:
+        report.failed = str(e)
+        return report
+    checkpoint.remove()
+    return report
@@ -1,6 +1,3 @@
-import cv2
-import numpy as np
-
 try:
     from PyQt5.QtGui import *
     from PyQt5.QtCore import *
@@ -15,7 +12,11 @@ if 'QMessageBox' not in dir():
 
 # from PyQt4.QtOpenGL import *
 
-from libs.shape import Shape
+from libs.fog_metrics import DEFAULT_FOG_METRIC, DEFAULT_FOG_THRESHOLD, RoiFogEvaluator, detect_fog
+from libs.imageBuffer import qimage_to_bgr
+from libs.imagePyramid import PYRAMID_MIN_SIDE, ImagePyramid
+from libs.shape import Shape, is_rectangle
+from libs.shapeIndex import ShapeIndex
 from libs.utils import distance
 
 CURSOR_DEFAULT = Qt.ArrowCursor
@@ -40,12 +41,16 @@ class Canvas(QWidget):
     CREATE, EDIT = list(range(2))
 
     epsilon = 24.0
+    # 批量绘制的矩形在屏幕上的短边小于该值（像素）时不画顶点
+    vertex_min_screen_size = 3 * Shape.point_size
 
     def __init__(self, *args, **kwargs):
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
         self.shapes = []
+        # 形状包围盒的网格索引，用于悬停和点击拾取
+        self.shape_index = ShapeIndex(margin=self.epsilon)
         self.current = None
         self.selected_shape = None  # save the selected shape here
         self.selected_shape_copy = None
@@ -56,8 +61,16 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.overlay_color = None
+        # ((pixmap cacheKey, overlay rgba), 叠加亮度后的pixmap)
+        self._overlay_cache = None
+        # 大图的分块金字塔，小图为 None 并直接绘制 pixmap
+        self.pyramid = None
         self.label_font_size = 8
+        # ((形状索引 generation, 字号), (最宽标签宽度, 行高))
+        self._label_extent = None
         self.pixmap = QPixmap()
+        # 图像大小；大图只从金字塔分块绘制，此时 pixmap 为空
+        self.image_size = QSize()
         self.visible = {}
         self._hide_background = False
         self.hide_background = False
@@ -73,6 +86,7 @@ class Canvas(QWidget):
         self.verified = False
         self.draw_square = False
         self.drawing_mode = 'fixed'  # 'fixed' or 'freehand'
+        self.fog_evaluator = RoiFogEvaluator()
 
         # initialisation for panning
         self.pan_initial_pos = QPoint()
@@ -105,7 +119,7 @@ class Canvas(QWidget):
             self.un_highlight()
             self.de_select_shape()
         self.prev_point = QPointF()
-        self.repaint()
+        self.update()
 
     def un_highlight(self, shape=None):
         if shape == None or shape == self.h_shape:
@@ -128,6 +142,7 @@ class Canvas(QWidget):
 
         # Polygon drawing.
         if self.drawing():
+            dirty = self.drawing_region()
             self.override_cursor(CURSOR_DRAW)
             if self.current:
                 # Display annotation width and height while drawing
@@ -141,7 +156,7 @@ class Canvas(QWidget):
                     # Don't allow the user to draw outside the pixmap.
                     # Clip the coordinates to 0 or max,
                     # if they are outside the range [0, max]
-                    size = self.pixmap.size()
+                    size = self.image_size
                     clipped_x = min(max(0, pos.x()), size.width())
                     clipped_y = min(max(0, pos.y()), size.height())
                     pos = QPointF(clipped_x, clipped_y)
@@ -180,26 +195,29 @@ class Canvas(QWidget):
                 self.current.highlight_clear()
             else:
                 self.prev_point = pos
-            self.repaint()
+            self.update(dirty.united(self.drawing_region()))
             return
 
         # Polygon copy moving.
         if Qt.RightButton & ev.buttons():
             if self.selected_shape_copy and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
+                dirty = self.shape_region(self.selected_shape_copy)
                 self.bounded_move_shape(self.selected_shape_copy, pos)
-                self.repaint()
+                self.update(dirty.united(self.shape_region(self.selected_shape_copy)))
             elif self.selected_shape:
                 self.selected_shape_copy = self.selected_shape.copy()
-                self.repaint()
+                self.update(self.shape_region(self.selected_shape_copy))
             return
 
         # Polygon/Vertex moving.
         if Qt.LeftButton & ev.buttons():
             if self.selected_vertex():
+                dirty = self.shape_region(self.h_shape)
                 self.bounded_move_vertex(pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update(dirty.united(self.shape_region(self.h_shape)))
+                self.update_fog_result(self.shape_roi(self.h_shape))
 
                 # Display annotation width and height while moving vertex
                 point1 = self.h_shape[1]
@@ -210,9 +228,11 @@ class Canvas(QWidget):
                     'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
             elif self.selected_shape and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
+                dirty = self.shape_region(self.selected_shape)
                 self.bounded_move_shape(self.selected_shape, pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update(dirty.united(self.shape_region(self.selected_shape)))
+                self.update_fog_result(self.shape_roi(self.selected_shape))
 
                 # Display annotation width and height while moving shape
                 point1 = self.selected_shape[1]
@@ -234,8 +254,11 @@ class Canvas(QWidget):
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
         self.setToolTip("Image")
-        priority_list = self.shapes + ([self.selected_shape] if self.selected_shape else [])
-        for shape in reversed([s for s in priority_list if self.isVisible(s)]):
+        self.shape_index.sync(self.shapes)
+        priority_list = self.shape_index.candidates(pos)
+        if self.selected_shape:
+            priority_list.insert(0, self.selected_shape)
+        for shape in [s for s in priority_list if self.isVisible(s)]:
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             index = shape.nearest_vertex(pos, self.epsilon)
@@ -297,74 +320,21 @@ class Canvas(QWidget):
         self.update()
 
     def mouseReleaseEvent(self, ev):
-        threshold = float(self.parent().window().fog_threshold_edit.text())
         if ev.button() == Qt.RightButton:
             menu = self.menus[bool(self.selected_shape_copy)]
             self.restore_cursor()
             if not menu.exec_(self.mapToGlobal(ev.pos())) \
                     and self.selected_shape_copy:
                 # Cancel the move by deleting the shadow copy.
+                self.update(self.shape_region(self.selected_shape_copy))
                 self.selected_shape_copy = None
-                self.repaint()
         elif ev.button() == Qt.LeftButton and self.selected_shape:
             if self.selected_vertex():
                 self.override_cursor(CURSOR_POINT)
-                # 获取父类中当前框的坐标
-                x0 = self.selected_shape[1].x()
-                y0 = self.selected_shape[1].y()
-                x1 = self.selected_shape[3].x()
-                y1 = self.selected_shape[3].y()
-                x = int(min(x0, x1))
-                y = int(min(y0, y1))
-                w = int(abs(x1 - x0))
-                h = int(abs(y1 - y0))
-                roi = [x, y, w, h]
-                # 加载父类中的图像数据
-                image = self.parent().window().image
-                # 调用转换方法
-                image = self.QImage2CV(image)
-                # 调用雾检测函数
-                has_fog, ratio = self.detect_fog(image, roi, threshold=threshold)
-                # 在父类的fog_result_label中显示结果
-                if has_fog:  # 父类显示
-                    # 设置字体大小大字体
-                    self.parent().window().fog_result_label.setStyleSheet(
-                        "QLabel{background-color:white;color:green;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为绿色
-                    self.parent().window().fog_result_label.setText(f" V/S ratio: {ratio:.2f}")
-
-                else:  # 父类显示
-                    self.parent().window().fog_result_label.setStyleSheet(
-                        "QLabel{background-color:white;color:red;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为红色
-                    self.parent().window().fog_result_label.setText(f"V/S ratio: {ratio:.2f}")
             else:
                 self.override_cursor(CURSOR_GRAB)
-                # 获取父类中当前框的坐标
-                x0 = self.selected_shape[1].x()
-                y0 = self.selected_shape[1].y()
-                x1 = self.selected_shape[3].x()
-                y1 = self.selected_shape[3].y()
-                x = int(min(x0, x1))
-                y = int(min(y0, y1))
-                w = int(abs(x1 - x0))
-                h = int(abs(y1 - y0))
-                roi = [x, y, w, h]
-                # 加载父类中的图像数据
-                image = self.parent().window().image
-                # 调用转换方法
-                image = self.QImage2CV(image)
-                # 调用雾检测函数
-                has_fog, ratio = self.detect_fog(image, roi, threshold=threshold)
-                # 在父类的fog_result_label中显示结果
-                if has_fog:  # 父类显示
-                    # 设置字体大小大字体
-                    self.parent().window().fog_result_label.setStyleSheet(
-                        "QLabel{background-color:white;color:green;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为绿色
-                    self.parent().window().fog_result_label.setText(f" V/S ratio: {ratio:.2f}")
-
-                else:  # 父类显示
-                    self.parent().window().fog_result_label.setStyleSheet(
-                        "QLabel{background-color:white;color:red;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为红色
-                    self.parent().window().fog_result_label.setText(f"V/S ratio: {ratio:.2f}")
+            # 对当前框做雾检测
+            self.update_fog_result(self.shape_roi(self.selected_shape))
         elif ev.button() == Qt.LeftButton:
             pos = self.transform_pos(ev.pos())
             if self.drawing() and self.current and len(self.current) > 0:
@@ -377,87 +347,71 @@ class Canvas(QWidget):
                 y = int(min(y0, y1))
                 w = int(abs(x1 - x0))
                 h = int(abs(y1 - y0))
-                roi = [x, y, w, h]
-                # 加载父类中的图像数据
-                image = self.parent().window().image
-                # 调用转换方法
-                image = self.QImage2CV(image)
-                # 调用雾检测函数
-                has_fog, ratio = self.detect_fog(image, roi, threshold=threshold)
-                # 在父类的fog_result_label中显示结果
-                if has_fog:  # 父类显示
-                    # 设置字体大小大字体
-                    self.parent().window().fog_result_label.setStyleSheet(
-                        "QLabel{background-color:white;color:green;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为绿色
-                    self.parent().window().fog_result_label.setText(f" V/S ratio: {ratio:.2f}")
-
-                else:  # 父类显示
-                    self.parent().window().fog_result_label.setStyleSheet(
-                        "QLabel{background-color:white;color:red;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为红色
-                    self.parent().window().fog_result_label.setText(f"V/S ratio: {ratio:.2f}")
+                self.update_fog_result([x, y, w, h])
                 self.handle_drawing(pos)
             else:
                 # pan
                 QApplication.restoreOverrideCursor()
 
-    def QImage2CV(self, qimg):
-
-        tmp = qimg
-
-        # 使用numpy创建空的图象
-        cv_image = np.zeros((tmp.height(), tmp.width(), 3), dtype=np.uint8)
-
-        for row in range(0, tmp.height()):
-            for col in range(0, tmp.width()):
-                r = qRed(tmp.pixel(col, row))
-                g = qGreen(tmp.pixel(col, row))
-                b = qBlue(tmp.pixel(col, row))
-                cv_image[row, col, 0] = b
-                cv_image[row, col, 1] = g
-                cv_image[row, col, 2] = r
+    def shape_roi(self, shape):
+        """Return the [x, y, w, h] box around a shape."""
+        xs = [p.x() for p in shape.points]
+        ys = [p.y() for p in shape.points]
+        x = int(min(xs))
+        y = int(min(ys))
+        return [x, y, int(max(xs) - min(xs)), int(max(ys) - min(ys))]
+
+    def fog_threshold(self):
+        try:
+            return float(self.parent().window().fog_threshold_edit.text())
+        except ValueError:
+            return DEFAULT_FOG_THRESHOLD
+
+    def update_fog_result(self, roi):
+        """只对ROI区域做雾检测，并在父类的fog_result_label中显示结果"""
+        window = self.parent().window()
+        has_fog, ratio = self.fog_evaluator.evaluate(window.image_buffer, roi, threshold=self.fog_threshold(),
+                                                     metric=window.fog_metric)
+        if has_fog:
+            window.fog_result_label.setStyleSheet(
+                "QLabel{background-color:white;color:green;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为绿色
+            window.fog_result_label.setText(f" V/S ratio: {ratio:.2f}")
+        else:
+            window.fog_result_label.setStyleSheet(
+                "QLabel{background-color:white;color:red;font-size:40px;font-weight:bold;border-radius:5px;padding:10px;}")  # 设置为红色
+            window.fog_result_label.setText(f"V/S ratio: {ratio:.2f}")
 
-        return cv_image
+    def QImage2CV(self, qimg):
+        """Convert a QImage to a BGR numpy array by wrapping its pixel buffer."""
+        return qimage_to_bgr(qimg)
 
-    def detect_fog(self, image, roi, threshold=12.0):
+    def detect_fog(self, image, roi, threshold=DEFAULT_FOG_THRESHOLD, metric=DEFAULT_FOG_METRIC):
         """
         检测图像中是否存在雾。
         :param image: 输入图像（BGR格式）
         :param roi: 感兴趣区域（ROI）的坐标 [x, y, width, height]
         :param threshold: V/S比值的阈值
+        :param metric: 计算方式，见 libs.fog_metrics
         :return: 是否存在雾，V/S比值
         """
-        x, y, w, h = roi
-        roi_image = image[y:y + h, x:x + w]
-
-        if roi_image.size == 0:
-            return False, 0.0
-
-        hsv_image = cv2.cvtColor(roi_image, cv2.COLOR_BGR2HSV)
-        s = hsv_image[:, :, 1].astype(np.float32)  # 饱和度
-        v = hsv_image[:, :, 2].astype(np.float32)  # 亮度
-
-        # 计算饱和度和亮度的均值
-        s_avg = np.nanmean(s)
-        v_avg = np.nanmean(v)
-
-        with np.errstate(divide='ignore', invalid='ignore'):
-            ratio = np.nanmean(v_avg / s_avg)  # 忽略NaN值
-            ratio = ratio * 10
-        return ratio > threshold, ratio
+        return detect_fog(image, roi, threshold, metric)
 
     def end_move(self, copy=False):
         assert self.selected_shape and self.selected_shape_copy
         shape = self.selected_shape_copy
         # del shape.fill_color
         # del shape.line_color
+        dirty = self.shape_region(self.selected_shape).united(self.shape_region(shape))
         if copy:
             self.shapes.append(shape)
+            self.shape_index.invalidate()
             self.selected_shape.selected = False
             self.selected_shape = shape
-            self.repaint()
         else:
             self.selected_shape.points = [p for p in shape.points]
+            self.shape_index.update(self.selected_shape)
         self.selected_shape_copy = None
+        self.update(dirty)
 
     def hide_background_shapes(self, value):
         self.hide_background = value
@@ -465,7 +419,7 @@ class Canvas(QWidget):
             # Only hide other shapes if there is a current selection.
             # Otherwise the user will not be able to select a shape.
             self.set_hiding(True)
-            self.repaint()
+            self.update()
 
     def handle_drawing(self, pos):
         if self.current and self.current.reach_max_points() is False:
@@ -550,7 +504,8 @@ class Canvas(QWidget):
             shape.highlight_vertex(index, shape.MOVE_VERTEX)
             self.select_shape(shape)
             return self.h_vertex
-        for shape in reversed(self.shapes):
+        self.shape_index.sync(self.shapes)
+        for shape in self.shape_index.candidates(point):
             if self.isVisible(shape) and shape.contains_point(point):
                 self.select_shape(shape)
                 self.calculate_offsets(shape, point)
@@ -570,11 +525,11 @@ class Canvas(QWidget):
         Moves a point x,y to within the boundaries of the canvas.
         :return: (x,y,snapped) where snapped is True if x or y were changed, False if not.
         """
-        if x < 0 or x > self.pixmap.width() or y < 0 or y > self.pixmap.height():
+        if x < 0 or x > self.image_size.width() or y < 0 or y > self.image_size.height():
             x = max(x, 0)
             y = max(y, 0)
-            x = min(x, self.pixmap.width())
-            y = min(y, self.pixmap.height())
+            x = min(x, self.image_size.width())
+            y = min(y, self.image_size.height())
             return x, y, True
 
         return x, y, False
@@ -583,7 +538,7 @@ class Canvas(QWidget):
         index, shape = self.h_vertex, self.h_shape
         point = shape[index]
         if self.out_of_pixmap(pos):
-            size = self.pixmap.size()
+            size = self.image_size
             clipped_x = min(max(0, pos.x()), size.width())
             clipped_y = min(max(0, pos.y()), size.height())
             pos = QPointF(clipped_x, clipped_y)
@@ -614,6 +569,7 @@ class Canvas(QWidget):
             right_shift = QPointF(0, shift_pos.y())
         shape.move_vertex_by(right_index, right_shift)
         shape.move_vertex_by(left_index, left_shift)
+        self.shape_index.update(shape)
 
     def bounded_move_shape(self, shape, pos):
         if self.out_of_pixmap(pos):
@@ -623,8 +579,8 @@ class Canvas(QWidget):
             pos -= QPointF(min(0, o1.x()), min(0, o1.y()))
         o2 = pos + self.offsets[1]
         if self.out_of_pixmap(o2):
-            pos += QPointF(min(0, self.pixmap.width() - o2.x()),
-                           min(0, self.pixmap.height() - o2.y()))
+            pos += QPointF(min(0, self.image_size.width() - o2.x()),
+                           min(0, self.image_size.height() - o2.y()))
         # The next line tracks the new position of the cursor
         # relative to the shape, but also results in making it
         # a bit "shaky" when nearing the border and allows it to
@@ -633,6 +589,7 @@ class Canvas(QWidget):
         dp = pos - self.prev_point
         if dp:
             shape.move_by(dp)
+            self.shape_index.update(shape)
             self.prev_point = pos
             return True
         return False
@@ -650,6 +607,7 @@ class Canvas(QWidget):
             shape = self.selected_shape
             self.un_highlight(shape)
             self.shapes.remove(self.selected_shape)
+            self.shape_index.invalidate()
             self.selected_shape = None
             self.update()
             return shape
@@ -659,6 +617,7 @@ class Canvas(QWidget):
             shape = self.selected_shape.copy()
             self.de_select_shape()
             self.shapes.append(shape)
+            self.shape_index.invalidate()
             shape.selected = True
             self.selected_shape = shape
             self.bounded_shift_shape(shape)
@@ -675,7 +634,7 @@ class Canvas(QWidget):
             self.bounded_move_shape(shape, point + offset)
 
     def paintEvent(self, event):
-        if not self.pixmap:
+        if self.image_size.isEmpty():
             return super(Canvas, self).paintEvent(event)
 
         p = self._painter
@@ -687,21 +646,13 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offset_to_center())
 
-        temp = self.pixmap
-        if self.overlay_color:
-            temp = QPixmap(self.pixmap)
-            painter = QPainter(temp)
-            painter.setCompositionMode(painter.CompositionMode_Overlay)
-            painter.fillRect(temp.rect(), self.overlay_color)
-            painter.end()
-
-        p.drawPixmap(0, 0, temp)
+        if self.pyramid is not None:
+            self.pyramid.draw(p, self.widget_rect_to_image(event.rect()), self.scale, self.overlay_color)
+        else:
+            p.drawPixmap(0, 0, self.display_pixmap())
         Shape.scale = self.scale
         Shape.label_font_size = self.label_font_size
-        for shape in self.shapes:
-            if (shape.selected or not self._hide_background) and self.isVisible(shape):
-                shape.fill = shape.selected or shape == self.h_shape
-                shape.paint(p)
+        self.paint_shapes(p, self.visible_shapes(event.rect()))
         if self.current:
             self.current.paint(p)
             self.line.paint(p)
@@ -721,8 +672,8 @@ class Canvas(QWidget):
 
         if self.drawing() and not self.prev_point.isNull() and not self.out_of_pixmap(self.prev_point):
             p.setPen(QColor(0, 0, 0))
-            p.drawLine(int(self.prev_point.x()), 0, int(self.prev_point.x()), int(self.pixmap.height()))
-            p.drawLine(0, int(self.prev_point.y()), int(self.pixmap.width()), int(self.prev_point.y()))
+            p.drawLine(int(self.prev_point.x()), 0, int(self.prev_point.x()), int(self.image_size.height()))
+            p.drawLine(0, int(self.prev_point.y()), int(self.image_size.width()), int(self.prev_point.y()))
 
         self.setAutoFillBackground(True)
         if self.verified:
@@ -736,6 +687,143 @@ class Canvas(QWidget):
 
         p.end()
 
+    def image_rect_to_widget(self, rect, margin=0.0):
+        """Map an image-space QRectF to the widget QRect covering it, grown by margin screen pixels."""
+        offset = self.offset_to_center()
+        return QRectF((rect.x() + offset.x()) * self.scale - margin, (rect.y() + offset.y()) * self.scale - margin,
+                      rect.width() * self.scale + 2 * margin,
+                      rect.height() * self.scale + 2 * margin).toAlignedRect()
+
+    def shape_region(self, shape):
+        """Widget region a shape paints into: outline, highlighted vertices and its label."""
+        if shape is None or not shape.points:
+            return QRegion()
+        bounds = shape.bounding_rect()
+        # 高亮顶点最大为 4 倍顶点大小，另加画笔宽度
+        margin = 2 * Shape.point_size + 4
+        region = QRegion(self.image_rect_to_widget(bounds, margin))
+        if shape.paint_label and shape.label:
+            font = QFont()
+            font.setPointSize(self.label_font_size)
+            font.setBold(True)
+            metrics = QFontMetricsF(font)
+            text = QRectF(bounds.left(), bounds.top() - metrics.height(),
+                          metrics.width(shape.label), 3 * metrics.height())
+            region = region.united(QRegion(self.image_rect_to_widget(text, 2)))
+        return region
+
+    def drawing_region(self):
+        """Widget region of the shape being drawn, the rubber band and the crosshair."""
+        region = self.shape_region(self.current)
+        if self.current is not None and len(self.line) == 2:
+            band = QRectF(self.line[0], self.line[1]).normalized()
+            region = region.united(QRegion(self.image_rect_to_widget(band, Shape.point_size + 4)))
+        if not self.prev_point.isNull() and not self.image_size.isEmpty():
+            x, y = self.prev_point.x(), self.prev_point.y()
+            region = region.united(QRegion(self.image_rect_to_widget(QRectF(x, 0, 0, self.image_size.height()), 2)))
+            region = region.united(QRegion(self.image_rect_to_widget(QRectF(0, y, self.image_size.width(), 0), 2)))
+        return region
+
+    def display_pixmap(self):
+        """
+        The pixmap with the brightness overlay composited on it. The result is cached
+        and only recomputed when the image or the light level changes.
+        """
+        if not self.overlay_color:
+            self._overlay_cache = None
+            return self.pixmap
+        key = (self.pixmap.cacheKey(), self.overlay_color.rgba())
+        if self._overlay_cache is None or self._overlay_cache[0] != key:
+            temp = QPixmap(self.pixmap)
+            painter = QPainter(temp)
+            painter.setCompositionMode(painter.CompositionMode_Overlay)
+            painter.fillRect(temp.rect(), self.overlay_color)
+            painter.end()
+            self._overlay_cache = (key, temp)
+        return self._overlay_cache[1]
+
+    def widget_rect_to_image(self, widget_rect):
+        """Map a widget QRect to the image-space QRectF it shows."""
+        offset = self.offset_to_center()
+        return QRectF(widget_rect.x() / self.scale - offset.x(), widget_rect.y() / self.scale - offset.y(),
+                      widget_rect.width() / self.scale, widget_rect.height() / self.scale)
+
+    def visible_shapes(self, widget_rect):
+        """
+        Shapes that can touch widget_rect, in paint order. The rect is mapped to image
+        coordinates and grown by the vertex and label size; when it covers the whole
+        image the shape list is returned as is.
+        """
+        # 顶点按屏幕像素绘制，换算到图像坐标
+        margin = (2 * Shape.point_size + 4) / self.scale
+        rect = self.widget_rect_to_image(widget_rect)
+        rect.adjust(-margin, -margin, margin, margin)
+        self.shape_index.sync(self.shapes)
+        width, height = self.label_extent()
+        if width:
+            # 标签从包围盒左上角向右书写，向上约一行、向下约两行，与 shape_region 一致
+            rect.adjust(-width, -2 * height, 0, height)
+        if rect.contains(QRectF(0, 0, self.image_size.width(), self.image_size.height())):
+            return self.shapes
+        return self.shape_index.in_rect(rect)
+
+    def label_extent(self):
+        """
+        (widest painted label, line height) in image coordinates. Label text is drawn
+        through the scaled painter, so it does not change with zoom. Measured again
+        only after the shape index was rebuilt or the font size changed.
+        """
+        key = (self.shape_index.generation, self.label_font_size)
+        if self._label_extent is None or self._label_extent[0] != key:
+            labels = self.shape_index.labels
+            font = QFont()
+            font.setPointSize(self.label_font_size)
+            font.setBold(True)
+            metrics = QFontMetricsF(font)
+            width = max(metrics.width(label) for label in labels) if labels else 0.0
+            self._label_extent = (key, (width, metrics.height()))
+        return self._label_extent[1]
+
+    def paint_shapes(self, p, shapes):
+        """
+        Plain rectangles (not selected, hovered, highlighted or labelled) are drawn in
+        batches: one drawRects and one vertex path per line color. Everything else is
+        painted by Shape.paint on top of them.
+        """
+        batches = {}
+        custom = []
+        for shape in shapes:
+            if not ((shape.selected or not self._hide_background) and self.isVisible(shape)):
+                continue
+            shape.fill = shape.selected or shape == self.h_shape
+            if shape.fill or shape.paint_label or shape._highlight_index is not None or not is_rectangle(shape):
+                custom.append(shape)
+            else:
+                batches.setdefault(shape.line_color.rgba(), []).append(shape.bounding_rect())
+
+        pen_width = max(1, int(round(2.0 / self.scale)))
+        min_side = self.vertex_min_screen_size / self.scale
+        radius = Shape.point_size / self.scale / 2.0
+        p.setBrush(Qt.NoBrush)
+        for rgba, rects in batches.items():
+            pen = QPen(QColor.fromRgba(rgba))
+            pen.setWidth(pen_width)
+            p.setPen(pen)
+            p.drawRects(rects)
+
+            # 顶点只在放大到能看清时绘制
+            vertex_path = QPainterPath()
+            for rect in rects:
+                if rect.width() >= min_side and rect.height() >= min_side:
+                    for corner in (rect.topLeft(), rect.topRight(), rect.bottomRight(), rect.bottomLeft()):
+                        vertex_path.addEllipse(corner, radius, radius)
+            if not vertex_path.isEmpty():
+                p.drawPath(vertex_path)
+                p.fillPath(vertex_path, Shape.vertex_fill_color)
+
+        for shape in custom:
+            shape.paint(p)
+
     def transform_pos(self, point):
         """Convert from widget-logical coordinates to painter-logical coordinates."""
         return point / self.scale - self.offset_to_center()
@@ -743,14 +831,14 @@ class Canvas(QWidget):
     def offset_to_center(self):
         s = self.scale
         area = super(Canvas, self).size()
-        w, h = self.pixmap.width() * s, self.pixmap.height() * s
+        w, h = self.image_size.width() * s, self.image_size.height() * s
         aw, ah = area.width(), area.height()
         x = (aw - w) / (2 * s) if aw > w else 0
         y = (ah - h) / (2 * s) if ah > h else 0
         return QPointF(x, y)
 
     def out_of_pixmap(self, p):
-        w, h = self.pixmap.width(), self.pixmap.height()
+        w, h = self.image_size.width(), self.image_size.height()
         return not (0 <= p.x() <= w and 0 <= p.y() <= h)
 
     def finalise(self):
@@ -763,12 +851,13 @@ class Canvas(QWidget):
             
         # 检查是否首尾点相同，如果是则移除最后一点再闭合
         if self.current.points[0] == self.current.points[-1]:
-            self.current.points.pop()
+            self.current.pop_point()
         
         # 关闭多边形
         self.current.close()
         # 添加到形状列表
         self.shapes.append(self.current)
+        self.shape_index.invalidate()
         # 清除当前形状
         self.current = None
         # 恢复背景显示
@@ -795,8 +884,8 @@ class Canvas(QWidget):
         return self.minimumSizeHint()
 
     def minimumSizeHint(self):
-        if self.pixmap:
-            return self.scale * self.pixmap.size()
+        if not self.image_size.isEmpty():
+            return self.scale * self.image_size
         return super(Canvas, self).minimumSizeHint()
 
     def wheelEvent(self, ev):
@@ -865,33 +954,19 @@ class Canvas(QWidget):
             QMessageBox.information(None, "模式切换", "已切换到自定义选区E模式")
 
     def move_one_pixel(self, direction):
-        # print(self.selectedShape.points)
-        if direction == 'Left' and not self.move_out_of_bound(QPointF(-1.0, 0)):
-            # print("move Left one pixel")
-            self.selected_shape.points[0] += QPointF(-1.0, 0)
-            self.selected_shape.points[1] += QPointF(-1.0, 0)
-            self.selected_shape.points[2] += QPointF(-1.0, 0)
-            self.selected_shape.points[3] += QPointF(-1.0, 0)
-        elif direction == 'Right' and not self.move_out_of_bound(QPointF(1.0, 0)):
-            # print("move Right one pixel")
-            self.selected_shape.points[0] += QPointF(1.0, 0)
-            self.selected_shape.points[1] += QPointF(1.0, 0)
-            self.selected_shape.points[2] += QPointF(1.0, 0)
-            self.selected_shape.points[3] += QPointF(1.0, 0)
-        elif direction == 'Up' and not self.move_out_of_bound(QPointF(0, -1.0)):
-            # print("move Up one pixel")
-            self.selected_shape.points[0] += QPointF(0, -1.0)
-            self.selected_shape.points[1] += QPointF(0, -1.0)
-            self.selected_shape.points[2] += QPointF(0, -1.0)
-            self.selected_shape.points[3] += QPointF(0, -1.0)
-        elif direction == 'Down' and not self.move_out_of_bound(QPointF(0, 1.0)):
-            # print("move Down one pixel")
-            self.selected_shape.points[0] += QPointF(0, 1.0)
-            self.selected_shape.points[1] += QPointF(0, 1.0)
-            self.selected_shape.points[2] += QPointF(0, 1.0)
-            self.selected_shape.points[3] += QPointF(0, 1.0)
+        steps = {
+            'Left': QPointF(-1.0, 0),
+            'Right': QPointF(1.0, 0),
+            'Up': QPointF(0, -1.0),
+            'Down': QPointF(0, 1.0),
+        }
+        step = steps[direction]
+        dirty = self.shape_region(self.selected_shape)
+        if not self.move_out_of_bound(step):
+            self.selected_shape.move_by(step)
+        self.shape_index.update(self.selected_shape)
         self.shapeMoved.emit()
-        self.repaint()
+        self.update(dirty.united(self.shape_region(self.selected_shape)))
 
     def move_out_of_bound(self, step):
         points = [p1 + p2 for p1, p2 in zip(self.selected_shape.points, [step] * 4)]
@@ -900,6 +975,7 @@ class Canvas(QWidget):
     def set_last_label(self, text, line_color=None, fill_color=None):
         assert text
         self.shapes[-1].label = text
+        self.shape_index.invalidate()
         if line_color:
             self.shapes[-1].line_color = line_color
 
@@ -911,6 +987,7 @@ class Canvas(QWidget):
     def undo_last_line(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.invalidate()
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -918,6 +995,7 @@ class Canvas(QWidget):
     def reset_all_lines(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.invalidate()
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -925,19 +1003,43 @@ class Canvas(QWidget):
         self.drawingPolygon.emit(False)
         self.update()
 
-    def load_pixmap(self, pixmap):
-        self.pixmap = pixmap
+    def load_image(self, image):
+        """
+        Show a QImage. Large images get a tile pyramid and no full-size QPixmap,
+        so only the QImage and its coarser levels are held in memory.
+        """
+        if max(image.width(), image.height()) >= PYRAMID_MIN_SIDE:
+            self.load_pixmap(QPixmap(), image)
+        else:
+            self.load_pixmap(QPixmap.fromImage(image))
+
+    def load_pixmap(self, pixmap, image=None):
+        """
+        :param image: 可选，pixmap 对应的 QImage；长边不小于 PYRAMID_MIN_SIDE 时用于构建分块金字塔，
+                      此时只从分块绘制，不保留 pixmap
+        """
+        self.image_size = image.size() if image is not None else pixmap.size()
         self.shapes = []
-        self.repaint()
+        self.set_pyramid(image)
+        self.pixmap = pixmap if self.pyramid is None else QPixmap()
+        self._overlay_cache = None
+        self.update()
+
+    def set_pyramid(self, image):
+        if self.pyramid is not None:
+            self.pyramid.cancel()
+            self.pyramid = None
+        if image is not None and max(image.width(), image.height()) >= PYRAMID_MIN_SIDE:
+            self.pyramid = ImagePyramid(image, on_level_ready=lambda level: self.update())
 
     def load_shapes(self, shapes):
         self.shapes = list(shapes)
         self.current = None
-        self.repaint()
+        self.update()
 
     def set_shape_visible(self, shape, value):
         self.visible[shape] = value
-        self.repaint()
+        self.update()
 
     def current_cursor(self):
         cursor = QApplication.overrideCursor()
@@ -962,6 +1064,9 @@ class Canvas(QWidget):
 
         self.restore_cursor()
         self.pixmap = None
+        self.image_size = QSize()
+        self._overlay_cache = None
+        self.set_pyramid(None)
         self.update()
 
     def set_drawing_shape_to_square(self, status):
@@ -31,3 +31,42 @@ class ComboBox(QWidget):
 
         self.cb.clear()
         self.cb.addItems(self.items)
+
+    def update_counts(self, counts):
+        """
+        按标签计数更新下拉框，只插入、删除或改写有变化的项。
+        The first item is empty and shows all labels; the others read "label (count)"
+        and keep the bare label as item data.
+        :param counts: {label: count}
+        """
+        labels = sorted(counts)
+        self.items = [""] + labels
+        selected = self.cb.itemData(self.cb.currentIndex()) or ""
+        # 删除当前项时 QComboBox 会自动选中相邻项，改为在最后恢复原来选中的标签
+        self.cb.blockSignals(True)
+        try:
+            self._apply_counts(labels, counts)
+            row = self.cb.findData(selected) if selected else 0
+            self.cb.setCurrentIndex(max(row, 0))
+        finally:
+            self.cb.blockSignals(False)
+        if row < 0:
+            # 筛选的标签已不存在，回到显示全部标签
+            self.cb.currentIndexChanged.emit(0)
+
+    def _apply_counts(self, labels, counts):
+        if self.cb.count() == 0:
+            self.cb.addItem("", "")
+        row = 1
+        for label in labels:
+            while row < self.cb.count() and self.cb.itemData(row) < label:
+                self.cb.removeItem(row)
+            text = "%s (%d)" % (label, counts[label])
+            if row < self.cb.count() and self.cb.itemData(row) == label:
+                if self.cb.itemText(row) != text:
+                    self.cb.setItemText(row, text)
+            else:
+                self.cb.insertItem(row, text, label)
+            row += 1
+        while self.cb.count() > row:
+            self.cb.removeItem(row)
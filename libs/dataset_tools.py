@@ -0,0 +1,788 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+数据集批处理工具。
+
+Each tool is a BatchJob (see libs.batchJob): the GUI runs it on a background
+thread with a progress dock, and it can run just as well without a display.
+Boxes are handled as plain [label, x_min, y_min, x_max, y_max, difficult]
+lists here, so nothing in this module needs a Shape or a QApplication.
+"""
+import json
+import math
+import os
+import random
+import shutil
+
+import cv2
+
+from libs.batchJob import BatchJob
+from libs.create_ml_io import CreateMLReader
+from libs.fast_copy import copy_file_fast
+from libs.fog_metrics import DEFAULT_FOG_METRIC, detect_fog_batch
+from libs.labelFile import LabelFileFormat
+from libs.pascal_voc_io import PascalVocReader, PascalVocWriter
+from libs.yolo_io import YoloReader
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
+
+
+def list_images(dir_path):
+    """目录中所有图像文件的完整路径"""
+    return [os.path.join(dir_path, file) for file in os.listdir(dir_path)
+            if any(file.lower().endswith(ext) for ext in IMAGE_EXTENSIONS)]
+
+
+def list_label_txt_files(dir_path):
+    """目录中除classes.txt以外的所有txt文件名"""
+    return [file for file in os.listdir(dir_path) if file.endswith('.txt') and file != 'classes.txt']
+
+
+def frame_number(txt_file):
+    """
+    根据文件名获取视频帧号(后缀前面的数字)
+    例如：fog-T01S01I01L0202H700BTctotalLtotal_video_1_20250102_125143_ori_2.txt
+    则获取的视频帧号为_2.txt中的2
+    """
+    return int(os.path.splitext(os.path.basename(txt_file))[0].split('_')[-1])
+
+
+def label_path_for(image_path, label_format):
+    """根据图像路径获取对应的标签文件路径"""
+    if label_format == LabelFileFormat.YOLO:
+        return os.path.splitext(image_path)[0] + '.txt'
+    elif label_format == LabelFileFormat.CREATE_ML:
+        return os.path.splitext(image_path)[0] + '.json'
+    return os.path.splitext(image_path)[0] + '.xml'
+
+
+def image_path_for_label(label_path):
+    """根据标签文件路径获取对应的图像文件路径，找不到时返回None"""
+    base_path = os.path.splitext(label_path)[0]
+    for ext in IMAGE_EXTENSIONS:
+        image_path = base_path + ext
+        if os.path.exists(image_path):
+            return image_path
+    return None
+
+
+class _ImageSize(object):
+    """The part of the QImage interface YoloReader needs, built from a NumPy shape."""
+
+    def __init__(self, image_shape):
+        self._shape = image_shape
+
+    def height(self):
+        return self._shape[0]
+
+    def width(self):
+        return self._shape[1]
+
+    def isGrayscale(self):
+        return len(self._shape) > 2 and self._shape[2] == 1
+
+
+def load_boxes(label_path, image_shape, label_format):
+    """
+    加载标签文件中的检测框。
+    :param image_shape: 图像的形状 (height, width[, channels])，YOLO格式需要
+    :return: [[label, x_min, y_min, x_max, y_max, difficult]]
+    """
+    if label_format == LabelFileFormat.YOLO:
+        raw_shapes = YoloReader(label_path, _ImageSize(image_shape)).get_shapes()
+    elif label_format == LabelFileFormat.CREATE_ML:
+        image_path = image_path_for_label(label_path)
+        if not image_path:
+            return []
+        raw_shapes = CreateMLReader(label_path, image_path).get_shapes()
+    else:
+        raw_shapes = PascalVocReader(label_path).get_shapes()
+
+    boxes = []
+    for raw_shape in raw_shapes:
+        label, points = raw_shape[0], raw_shape[1]
+        difficult = bool(raw_shape[4]) if len(raw_shape) > 4 else False
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        boxes.append([label, min(xs), min(ys), max(xs), max(ys), difficult])
+    return boxes
+
+
+def class_index(label, class_list):
+    """获取类别ID，用于YOLO格式"""
+    if class_list and label in class_list:
+        return class_list.index(label)
+    return 0
+
+
+def save_boxes(label_path, boxes, image_shape, label_format, class_list=None, image_path=None):
+    """
+    保存检测框到标签文件，覆盖原有内容。
+    :param image_shape: 图像的形状 (height, width[, channels])
+    :param image_path: 对应的图像路径，Pascal VOC格式写入文件名用
+    """
+    img_height, img_width = image_shape[:2]
+    if label_format == LabelFileFormat.YOLO:
+        with open(label_path, 'w') as f:
+            for label, x_min, y_min, x_max, y_max, _ in boxes:
+                # 转换为YOLO格式 (center_x, center_y, width, height)
+                center_x = (x_min + x_max) / 2.0 / img_width
+                center_y = (y_min + y_max) / 2.0 / img_height
+                width = abs(x_max - x_min) / img_width
+                height = abs(y_max - y_min) / img_height
+                f.write(f"{class_index(label, class_list)} {center_x:.6f} {center_y:.6f} {width:.6f} {height:.6f}\n")
+    elif label_format == LabelFileFormat.CREATE_ML:
+        annotations = []
+        for label, x_min, y_min, x_max, y_max, _ in boxes:
+            annotations.append({
+                "label": label,
+                "coordinates": {
+                    "x": (x_min + x_max) / 2.0,
+                    "y": (y_min + y_max) / 2.0,
+                    "width": abs(x_max - x_min),
+                    "height": abs(y_max - y_min)
+                }
+            })
+        with open(label_path, 'w') as f:
+            json.dump({"annotations": annotations}, f, indent=2)
+    else:
+        image_path = image_path or image_path_for_label(label_path) or os.path.splitext(label_path)[0] + '.jpg'
+        channels = image_shape[2] if len(image_shape) > 2 else 1
+        writer = PascalVocWriter(os.path.basename(os.path.dirname(image_path)), os.path.basename(image_path),
+                                 [img_height, img_width, channels], local_img_path=image_path)
+        for label, x_min, y_min, x_max, y_max, difficult in boxes:
+            writer.add_bnd_box(x_min, y_min, x_max, y_max, label, int(difficult))
+        writer.save(target_file=label_path)
+
+
+def boxes_overlap(bbox1, bbox2):
+    """检查两个边界框 (x1, y1, x2, y2) 是否重叠，重叠面积超过任一检测框面积的20%认为重叠"""
+    if not bbox1 or not bbox2:
+        return False
+
+    x1_1, y1_1, x2_1, y2_1 = bbox1
+    x1_2, y1_2, x2_2, y2_2 = bbox2
+
+    # 计算重叠区域
+    overlap_x1 = max(x1_1, x1_2)
+    overlap_y1 = max(y1_1, y1_2)
+    overlap_x2 = min(x2_1, x2_2)
+    overlap_y2 = min(y2_1, y2_2)
+
+    if overlap_x1 < overlap_x2 and overlap_y1 < overlap_y2:
+        overlap_area = (overlap_x2 - overlap_x1) * (overlap_y2 - overlap_y1)
+        bbox1_area = (x2_1 - x1_1) * (y2_1 - y1_1)
+        bbox2_area = (x2_2 - x1_2) * (y2_2 - y1_2)
+        overlap_ratio = overlap_area / min(bbox1_area, bbox2_area)
+        return overlap_ratio > 0.2
+
+    return False
+
+
+def find_free_position(image_shape, roi_shape, existing_bboxes, max_attempts=100):
+    """
+    寻找不重叠的位置放置新的检测框。
+    :param existing_bboxes: [(x1, y1, x2, y2)]
+    :return: (x1, y1, x2, y2)，找不到合适位置时返回None
+    """
+    img_height, img_width = image_shape[:2]
+    roi_height, roi_width = roi_shape[:2]
+    for _ in range(max_attempts):
+        # 随机选择位置
+        x1 = random.randint(0, img_width - roi_width)
+        y1 = random.randint(0, img_height - roi_height)
+        x2 = x1 + roi_width
+        y2 = y1 + roi_height
+        if not any(boxes_overlap((x1, y1, x2, y2), bbox) for bbox in existing_bboxes):
+            return x1, y1, x2, y2
+    return None
+
+
+def box_to_bbox(box):
+    """[label, x_min, y_min, x_max, y_max, difficult] -> 整数 (x1, y1, x2, y2)"""
+    return int(box[1]), int(box[2]), int(box[3]), int(box[4])
+
+
+def rotate_roi(roi, angle):
+    """旋转ROI图像，角度为0, 90, 180, 270度"""
+    if angle == 90:
+        return cv2.rotate(roi, cv2.ROTATE_90_CLOCKWISE)
+    elif angle == 180:
+        return cv2.rotate(roi, cv2.ROTATE_180)
+    elif angle == 270:
+        return cv2.rotate(roi, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return roi
+
+
+def pasted_box(label, new_bbox, angle):
+    """粘贴旋转后的检测框内容后，根据旋转角度计算新的检测框"""
+    x1, y1, x2, y2 = new_bbox
+    if angle in (90, 270):
+        # 宽高互换
+        width = x2 - x1
+        height = y2 - y1
+        return [label, x1, y1, x1 + height, y1 + width, False]
+    return [label, x1, y1, x2, y2, False]
+
+
+def rotate_point(x, y, center, angle):
+    """旋转点坐标"""
+    cx, cy = center
+    rad = math.radians(angle)
+    cos_a = math.cos(rad)
+    sin_a = math.sin(rad)
+    x -= cx
+    y -= cy
+    return x * cos_a - y * sin_a + cx, x * sin_a + y * cos_a + cy
+
+
+def rotate_bbox_center(x_center, y_center, width, height, center, angle):
+    """旋转边界框的四个角点，返回旋转后外接框的中心点"""
+    corners = [
+        (x_center - width / 2, y_center - height / 2),  # 左上
+        (x_center + width / 2, y_center - height / 2),  # 右上
+        (x_center + width / 2, y_center + height / 2),  # 右下
+        (x_center - width / 2, y_center + height / 2)   # 左下
+    ]
+    rotated_corners = [rotate_point(x, y, center, angle) for x, y in corners]
+    x_coords = [x for x, y in rotated_corners]
+    y_coords = [y for x, y in rotated_corners]
+    return (min(x_coords) + max(x_coords)) / 2, (min(y_coords) + max(y_coords)) / 2
+
+
+class VideoLabelJob(BatchJob):
+    """根据每帧标签文件的类别生成视频标签"""
+    title = '生成视频标签'
+    params = ('dir_path',)
+
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+
+    def setup(self):
+        # 统计文件夹中含有图片数量，即视频帧数
+        self.frame_num = len([file for file in os.listdir(self.dir_path) if file.endswith('.jpg')])
+        # 储存标签中数字对应的类别名称
+        self.classes = []
+        classes_file = os.path.join(self.dir_path, 'classes.txt')
+        if os.path.exists(classes_file):
+            with open(classes_file, 'r', encoding='utf-8') as f:
+                self.classes = f.read().split('\n')
+
+    def prepare(self):
+        # 删除文件夹中的空txt文件
+        for file in list_label_txt_files(self.dir_path):
+            path = os.path.join(self.dir_path, file)
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+        return list_label_txt_files(self.dir_path)
+
+    def frame_of(self, file):
+        frame = frame_number(file)
+        if not 1 <= frame <= self.frame_num:
+            raise ValueError(f"帧号 {frame} 超出视频帧数 {self.frame_num}")
+        return frame
+
+    def video_label(self, file, lines):
+        """:return: 该帧的视频标签，None 表示保持默认"""
+        label = int(lines[0].strip().split()[0])
+        if self.classes[label] == 'fog':
+            return '5'
+        elif self.classes[label] == '999':
+            return '999'
+        return None
+
+    def process(self, file):
+        frame = self.frame_of(file)
+        with open(os.path.join(self.dir_path, file), 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        if not (lines and lines[0].strip() and lines[0].strip().split()):
+            return None
+        label_name = self.video_label(file, lines)
+        return None if label_name is None else [frame, label_name]
+
+    @property
+    def output_dir(self):
+        return os.path.join(self.dir_path, 'video_labels')
+
+    def finish(self, results):
+        # 按照视频帧数填充视频标签
+        video_labels = [f"{i}-{i} 4 0" for i in range(self.frame_num)]
+        for _, result in results:
+            if result is not None:
+                frame, label_name = result
+                video_labels[frame - 1] = f"{frame - 1}-{frame - 1} {label_name} 0"
+        # 视频标签文件名按照文件夹的名称命名
+        os.makedirs(self.output_dir, exist_ok=True)
+        video_label_file = os.path.join(self.output_dir, os.path.basename(self.dir_path) + '.txt')
+        with open(video_label_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(video_labels))
+        return "Video label file has been generated successfully."
+
+
+class FogVideoLabelJob(VideoLabelJob):
+    """根据有雾阈值生成视频标签"""
+    title = '根据阈值生成视频标签'
+    params = ('dir_path', 'threshold', 'metric')
+
+    def __init__(self, dir_path, threshold, metric=DEFAULT_FOG_METRIC):
+        super(FogVideoLabelJob, self).__init__(dir_path)
+        self.threshold = threshold
+        self.metric = metric
+
+    def video_label(self, file, lines):
+        label = lines[0].strip().split()[0]
+        # 标签为999的情况
+        if label == '1':
+            return '999'
+        if label != '0':
+            return None
+        # 标签为有雾的情况，读取标签文件对应的图像
+        image_file = os.path.join(self.dir_path, os.path.splitext(file)[0] + '.jpg')
+        if not os.path.exists(image_file):
+            raise IOError(f"Corresponding image file not found: {image_file}")
+        image = cv2.imread(image_file)
+        if image is None:
+            raise IOError(f"无法读取图像: {image_file}")
+        image_height, image_width = image.shape[:2]
+        rois = []  # 储存标签中的有雾标注框
+        for line in lines:
+            values = line.strip().split()
+            if len(values) == 5 and values[0] == '0':
+                # 解析归一化坐标并转换为像素坐标
+                _, x_center, y_center, width, height = map(float, values)
+                x = int((x_center - width / 2) * image_width)
+                y = int((y_center - height / 2) * image_height)
+                w = int(width * image_width)
+                h = int(height * image_height)
+                rois.append((x, y, w, h))
+        # 判断是否有雾（所有ROI一次性评估）
+        if rois:
+            is_fog, ratios = detect_fog_batch(image, rois, self.threshold, self.metric)
+            if is_fog.any():
+                return '5'
+        return '4'
+
+    @property
+    def output_dir(self):
+        return os.path.join(self.dir_path, 'thread_video_labels')
+
+
+class ExtractTrainDataJob(BatchJob):
+    """复制第一行类别为0的标签文件及对应图像到 save_dir/labels 和 save_dir/images"""
+    title = '提取有雾训练数据'
+    params = ('dir_path', 'save_dir')
+
+    def __init__(self, dir_path, save_dir):
+        self.dir_path = dir_path
+        self.save_dir = save_dir
+
+    def setup(self):
+        os.makedirs(os.path.join(self.save_dir, 'labels'), exist_ok=True)
+        os.makedirs(os.path.join(self.save_dir, 'images'), exist_ok=True)
+
+    def prepare(self):
+        return list_label_txt_files(self.dir_path)
+
+    def process(self, file):
+        path = os.path.join(self.dir_path, file)
+        with open(path, 'r', encoding='utf-8') as f:
+            first_line = f.readline().strip()
+        if not (first_line and first_line.split() and first_line.split()[0] == '0'):
+            return 0
+        image_file = os.path.join(self.dir_path, os.path.splitext(file)[0] + '.jpg')
+        if not os.path.exists(image_file):
+            raise IOError("Corresponding image file not found.")
+        shutil.copy(path, os.path.join(self.save_dir, 'labels'))
+        shutil.copy(image_file, os.path.join(self.save_dir, 'images'))
+        return 1
+
+    def finish(self, results):
+        return "Train data has been extracted successfully."
+
+
+class ExtractClass0Job(BatchJob):
+    """提取类别ID为0的标签文件，不进行V/S比计算"""
+    title = '提取类别0标签'
+    params = ('dir_path', 'class0_folder', 'label_hist')
+
+    def __init__(self, dir_path, class0_folder, label_hist=None):
+        self.dir_path = dir_path
+        self.class0_folder = class0_folder
+        self.label_hist = label_hist or []
+
+    def setup(self):
+        os.makedirs(self.class0_folder, exist_ok=True)
+        self.classes_file = os.path.join(self.dir_path, 'classes.txt')
+
+    def prepare(self):
+        txt_files = list_label_txt_files(self.dir_path)
+        if os.path.exists(self.classes_file):
+            # 如果存在classes.txt，直接复制
+            shutil.copy(self.classes_file, self.class0_folder)
+        else:
+            # 如果不存在classes.txt，从标签文件中收集所有唯一的标签，创建一个classes.txt
+            unique_labels = set()
+            for file in txt_files:
+                try:
+                    with open(os.path.join(self.dir_path, file), 'r', encoding='utf-8') as f:
+                        for line in f:
+                            parts = line.strip().split()
+                            if parts:
+                                unique_labels.add(self.class_name(parts[0]))
+                except Exception:
+                    continue
+            if unique_labels:
+                with open(os.path.join(self.class0_folder, 'classes.txt'), 'w', encoding='utf-8') as f:
+                    for label in sorted(unique_labels):
+                        f.write(f"{label}\n")
+        # 出错的文件不在 finish 的结果中，总数在这里记录
+        self.total_files = len(txt_files)
+        return txt_files
+
+    def class_name(self, class_id):
+        """尝试从现有的标签历史中获取标签名称，否则使用默认命名"""
+        try:
+            class_index = int(class_id)
+            if 0 <= class_index < len(self.label_hist):
+                return self.label_hist[class_index]
+        except ValueError:
+            pass
+        return f'class_{class_id}'
+
+    def process(self, file):
+        """:return: [是否为类别0, 是否复制了图像]"""
+        path = os.path.join(self.dir_path, file)
+        with open(path, 'r', encoding='utf-8') as f:
+            first_line = f.readline().strip()
+        if not (first_line and first_line.split() and first_line.split()[0] == '0'):
+            return [False, False]
+        # 先找对应的图片文件，优先jpg，再尝试其他图像格式；找不到时跳过，不留下没有图像的标签
+        base_name = os.path.splitext(file)[0]
+        for ext in ['.jpg', '.png', '.jpeg', '.bmp', '.tiff', '.tif']:
+            image_file = os.path.join(self.dir_path, base_name + ext)
+            if os.path.exists(image_file):
+                shutil.copy(path, self.class0_folder)
+                shutil.copy(image_file, self.class0_folder)
+                return [True, True]
+        return [True, False]
+
+    def finish(self, results):
+        class0_files = sum(1 for _, (is_class0, _) in results if is_class0)
+        copied_images = sum(1 for _, (_, copied) in results if copied)
+        result_msg = f"提取完成！\n\n"
+        result_msg += f"总标签文件数: {self.total_files}\n"
+        result_msg += f"类别0文件数: {class0_files}\n"
+        result_msg += f"成功复制图像数: {copied_images}\n"
+        result_msg += f"未找到图像而跳过: {class0_files - copied_images}\n"
+        failed = self.total_files - len(results)
+        if failed:
+            result_msg += f"读取失败: {failed}\n"
+        classes_status = "已复制" if os.path.exists(self.classes_file) else "已创建"
+        result_msg += f"classes.txt状态: {classes_status}\n"
+        result_msg += f"保存位置: {self.class0_folder}"
+        return result_msg
+
+
+class _LabelledImagesJob(BatchJob):
+    """Base for jobs over the images of a directory that have a label file."""
+    params = ('dir_path', 'label_format', 'class_list')
+
+    def __init__(self, dir_path, label_format, class_list=None):
+        self.dir_path = dir_path
+        self.label_format = label_format
+        self.class_list = class_list or []
+
+    def labelled_images(self):
+        return [image_path for image_path in list_images(self.dir_path)
+                if os.path.exists(label_path_for(image_path, self.label_format))]
+
+    def read_boxes(self, image_path):
+        """:return: (image, boxes)，图像读取失败时为 (None, [])"""
+        img = cv2.imread(image_path)
+        if img is None:
+            return None, []
+        return img, load_boxes(label_path_for(image_path, self.label_format), img.shape, self.label_format)
+
+    def write_boxes(self, image_path, boxes, image_shape):
+        save_boxes(label_path_for(image_path, self.label_format), boxes, image_shape,
+                   self.label_format, self.class_list, image_path)
+
+
+class CopyBboxRandomlyJob(_LabelledImagesJob):
+    """从目录下所有图像中收集检测框，随机旋转后复制到其他图像"""
+    title = '随机复制所有检测框'
+    params = _LabelledImagesJob.params + ('copy_count',)
+    # 同一张目标图像可能被分配多个检测框，必须按顺序写入
+    max_workers = 1
+
+    def __init__(self, dir_path, copy_count, label_format, class_list=None):
+        super(CopyBboxRandomlyJob, self).__init__(dir_path, label_format, class_list)
+        self.copy_count = copy_count
+
+    def prepare(self):
+        """收集所有检测框并随机分配到目标图像，分配方案保存在检查点中"""
+        all_image_files = list_images(self.dir_path)
+        if len(all_image_files) < self.copy_count + 1:  # +1 因为需要排除源图像
+            raise ValueError("目录中图像数量不足")
+
+        all_bbox_info = []  # 存储 (图像路径, 检测框, 标签)
+        for image_path in self.labelled_images():
+            try:
+                img, boxes = self.read_boxes(image_path)
+            except Exception:
+                continue
+            for box in boxes:
+                all_bbox_info.append((image_path, box_to_bbox(box), box[0]))
+        if not all_bbox_info:
+            raise ValueError("当前目录下没有找到任何检测框")
+
+        # 要复制的检测框数量：取用户设置数量和检测框总数的较小值
+        num_to_copy = min(self.copy_count, len(all_bbox_info))
+        selected_bboxes = random.sample(all_bbox_info, num_to_copy)
+        selected_images = random.sample(all_image_files, self.copy_count)
+        random.shuffle(selected_bboxes)
+
+        # 将检测框分散分配到不同的图像上，随机选择旋转角度：0, 90, 180, 270度
+        items = []
+        for i, (source_image, bbox, label) in enumerate(selected_bboxes):
+            target_image = selected_images[i % self.copy_count]
+            items.append([target_image, source_image, list(bbox), label, random.choice([0, 90, 180, 270])])
+        return items
+
+    def process(self, item):
+        target_image_path, source_image_path, source_bbox, source_label, rotation_angle = item
+        target_img, existing_boxes = self.read_boxes(target_image_path)
+        if target_img is None:
+            raise IOError(f"无法读取图像: {target_image_path}")
+        source_img = cv2.imread(source_image_path)
+        if source_img is None:
+            raise IOError(f"无法读取图像: {source_image_path}")
+
+        # 提取检测框内的图像内容并旋转
+        x1, y1, x2, y2 = source_bbox
+        rotated_roi = rotate_roi(source_img[y1:y2, x1:x2], rotation_angle)
+
+        # 寻找合适的位置放置检测框（避免重叠）
+        new_bbox = find_free_position(target_img.shape, rotated_roi.shape,
+                                      [box_to_bbox(box) for box in existing_boxes])
+        if not new_bbox:
+            return 0
+        x1, y1, x2, y2 = new_bbox
+        target_img[y1:y2, x1:x2] = rotated_roi
+        cv2.imwrite(target_image_path, target_img)
+        self.write_boxes(target_image_path, existing_boxes + [pasted_box(source_label, new_bbox, rotation_angle)],
+                         target_img.shape)
+        return 1
+
+    def finish(self, results):
+        success_count = sum(result for _, result in results)
+        return f"成功从目录中随机复制检测框到 {success_count} 张图像"
+
+
+class CopyImagesWithBboxJob(_LabelledImagesJob):
+    """为每张有检测框的图像复制指定数量的副本，每个副本随机保留指定百分比的检测框"""
+    title = '复制图像并随机保留检测框'
+    params = _LabelledImagesJob.params + ('copy_count', 'bbox_keep_percent')
+
+    def __init__(self, dir_path, copy_count, bbox_keep_percent, label_format, class_list=None):
+        super(CopyImagesWithBboxJob, self).__init__(dir_path, label_format, class_list)
+        self.copy_count = copy_count
+        self.bbox_keep_percent = bbox_keep_percent
+
+    def prepare(self):
+        if not list_images(self.dir_path):
+            raise ValueError("目录中没有找到图像文件")
+        return self.labelled_images()
+
+    def process(self, source_image_path):
+        source_img, source_boxes = self.read_boxes(source_image_path)
+        if not source_boxes:  # 只处理有检测框的图像
+            return 0
+        base_name, ext = os.path.splitext(os.path.basename(source_image_path))
+        # 计算要保留的检测框数量（向上取整）
+        total_bboxes = len(source_boxes)
+        keep_count = max(1, int((total_bboxes * self.bbox_keep_percent + 99) / 100))
+
+        created = 0
+        for i in range(self.copy_count):
+            new_image_path = os.path.join(self.dir_path, f"{base_name}_aug_{i+1:03d}.jpg")
+            if ext.lower() in ('.jpg', '.jpeg'):
+                # 原样复制JPEG字节，不重新编码
+                copy_file_fast(source_image_path, new_image_path, allow_link=False)
+            else:
+                cv2.imwrite(new_image_path, source_img)
+            selected_boxes = random.sample(source_boxes, min(keep_count, total_bboxes))
+            self.write_boxes(new_image_path, selected_boxes, source_img.shape)
+            created += 1
+        return created
+
+    def finish(self, results):
+        success_count = sum(result for _, result in results)
+        if not success_count:
+            return "目录中没有找到包含检测框的图像"
+        return f"成功创建 {success_count} 张增强图像到 {self.dir_path} 目录"
+
+
+class UnifyBboxSizesJob(_LabelledImagesJob):
+    """统一调整目录下所有标签的宽高为设定的值，保持检测框中心点不变"""
+    title = '统一检测框大小'
+    params = _LabelledImagesJob.params + ('target_width', 'target_height')
+
+    def __init__(self, dir_path, target_width, target_height, label_format, class_list=None):
+        super(UnifyBboxSizesJob, self).__init__(dir_path, label_format, class_list)
+        self.target_width = target_width
+        self.target_height = target_height
+
+    def prepare(self):
+        if not list_images(self.dir_path):
+            raise ValueError("目录中没有找到图像文件")
+        return self.labelled_images()
+
+    def process(self, image_path):
+        img, boxes = self.read_boxes(image_path)
+        if not boxes:
+            return 0
+        img_height, img_width = img.shape[:2]
+        modified_boxes = []
+        for box in boxes:
+            x1, y1, x2, y2 = box_to_bbox(box)
+            center_x = (x1 + x2) / 2
+            center_y = (y1 + y2) / 2
+            # 计算新的边界框，保持中心点不变，并确保在图像范围内
+            new_x1 = int(center_x - self.target_width / 2)
+            new_y1 = int(center_y - self.target_height / 2)
+            new_x1 = max(0, min(img_width - self.target_width, new_x1))
+            new_y1 = max(0, min(img_height - self.target_height, new_y1))
+            modified_boxes.append([box[0], new_x1, new_y1, new_x1 + self.target_width,
+                                   new_y1 + self.target_height, box[5]])
+        self.write_boxes(image_path, modified_boxes, img.shape)
+        return 1
+
+    def finish(self, results):
+        processed_count = sum(result for _, result in results)
+        if processed_count == 0:
+            return "目录中没有找到需要处理的标签文件"
+        return f"成功处理 {processed_count} 个标签文件，修改了 {processed_count} 个文件"
+
+
+class RotationAugmentationJob(BatchJob):
+    """生成一张图像的随机旋转增强版本，每个增强版本是一个条目"""
+    title = '旋转增强'
+    params = ('image_path', 'boxes', 'aug_count', 'rotation_range', 'label_format', 'class_list', 'verified')
+
+    def __init__(self, image_path, boxes, aug_count, rotation_range, label_format,
+                 class_list=None, verified=False, image=None):
+        """
+        :param boxes: [[label, x_min, y_min, x_max, y_max, difficult]]
+        :param image: 已解码的BGR图像，为None时从image_path读取
+        """
+        self.image_path = image_path
+        self.boxes = boxes
+        self.aug_count = aug_count
+        self.rotation_range = rotation_range
+        self.label_format = label_format
+        self.class_list = class_list or ['object']
+        self.verified = verified
+        self.image = image
+
+    def setup(self):
+        if self.image is None:
+            self.image = cv2.imread(self.image_path)
+        if self.image is None:
+            raise IOError("读取图像失败。")
+        # 保存到当前图像所在的文件夹
+        self.save_dir = os.path.dirname(self.image_path)
+        try:
+            import albumentations
+            self.albumentations = albumentations
+        except ImportError:
+            self.albumentations = None
+
+    def prepare(self):
+        return list(range(self.aug_count))
+
+    def aug_path(self, i, ext):
+        base_name = os.path.splitext(os.path.basename(self.image_path))[0]
+        return os.path.join(self.save_dir, f"{base_name}_aug_{i+1:02d}{ext}")
+
+    def process(self, i):
+        height, width = self.image.shape[:2]
+        # 随机生成旋转角度
+        angle = random.uniform(-self.rotation_range, self.rotation_range)
+        aug_image_path = self.aug_path(i, '.jpg')
+        labels = [box[0] for box in self.boxes]
+
+        if self.albumentations is not None:
+            # 使用albumentations库进行精确的旋转和坐标变换
+            A = self.albumentations
+            transform = A.Compose([
+                A.Rotate(limit=angle, p=1.0, border_mode=cv2.BORDER_CONSTANT, value=0)
+            ], bbox_params=A.BboxParams(format='pascal_voc', label_fields=['class_labels']))
+            bboxes = [list(box[1:5]) for box in self.boxes]
+            transformed = transform(image=self.image, bboxes=bboxes, class_labels=labels)
+            rotated_image = transformed['image']
+            rotated_boxes = [[label, max(0, min(width, b[0])), max(0, min(height, b[1])),
+                              max(0, min(width, b[2])), max(0, min(height, b[3])), False]
+                             for b, label in zip(transformed['bboxes'], transformed['class_labels'])]
+        else:
+            # 使用OpenCV进行旋转（精度较低）
+            center = (width // 2, height // 2)
+            rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+            rotated_image = cv2.warpAffine(self.image, rotation_matrix, (width, height))
+            rotated_boxes = []
+            for label, x_min, y_min, x_max, y_max, difficult in self.boxes:
+                if self.label_format == LabelFileFormat.YOLO:
+                    # 旋转中心点，宽高保持不变
+                    x_center, y_center = rotate_bbox_center((x_min + x_max) / 2, (y_min + y_max) / 2,
+                                                            x_max - x_min, y_max - y_min, center, angle)
+                    half_w, half_h = (x_max - x_min) / 2, (y_max - y_min) / 2
+                    rotated_boxes.append([label, x_center - half_w, y_center - half_h,
+                                          x_center + half_w, y_center + half_h, difficult])
+                else:
+                    # 旋转四个角点后取外接框
+                    corners = [rotate_point(x, y, center, angle)
+                               for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max))]
+                    xs = [p[0] for p in corners]
+                    ys = [p[1] for p in corners]
+                    rotated_boxes.append([label, max(0, min(xs)), max(0, min(ys)),
+                                          min(width, max(xs)), min(height, max(ys)), difficult])
+
+        # 保存增强后的图像
+        cv2.imwrite(aug_image_path, rotated_image)
+        if self.label_format == LabelFileFormat.YOLO:
+            self.save_yolo(i, rotated_boxes, width, height)
+        elif self.label_format == LabelFileFormat.PASCAL_VOC:
+            self.save_pascal_voc(i, rotated_boxes, aug_image_path, width, height)
+        return 1
+
+    def save_yolo(self, i, rotated_boxes, width, height):
+        """YOLO格式：归一化坐标 (x_center, y_center, width, height)，确保坐标在有效范围内"""
+        aug_labels = []
+        for label, x_min, y_min, x_max, y_max, _ in rotated_boxes:
+            x_center_norm = max(0, min(1, (x_min + x_max) / 2 / width))
+            y_center_norm = max(0, min(1, (y_min + y_max) / 2 / height))
+            w_norm = max(0, min(1, (x_max - x_min) / width))
+            h_norm = max(0, min(1, (y_max - y_min) / height))
+            aug_labels.append(f"{class_index(label, self.class_list)} "
+                              f"{x_center_norm:.6f} {y_center_norm:.6f} {w_norm:.6f} {h_norm:.6f}")
+        with open(self.aug_path(i, '.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(aug_labels))
+
+    def save_pascal_voc(self, i, rotated_boxes, aug_image_path, width, height):
+        """Pascal VOC格式：XML文件，只保留在图像范围内的边界框"""
+        writer = PascalVocWriter(os.path.basename(os.path.dirname(aug_image_path)), os.path.basename(aug_image_path),
+                                 [height, width, 3], local_img_path=aug_image_path)
+        writer.verified = self.verified
+        for label, x_min, y_min, x_max, y_max, difficult in rotated_boxes:
+            if x_max > x_min and y_max > y_min:
+                writer.add_bnd_box(x_min, y_min, x_max, y_max, label, int(difficult))
+        writer.save(target_file=self.aug_path(i, '.xml'))
+
+    def finish(self, results):
+        result_msg = f"旋转增强完成！\n\n"
+        result_msg += f"增强数量: {len(results)}\n"
+        result_msg += f"旋转角度范围: ±{self.rotation_range}°\n"
+        if self.albumentations is None:
+            result_msg += "警告: 未安装albumentations库，已使用OpenCV进行旋转（精度较低）\n"
+        result_msg += f"保存位置: {self.save_dir}"
+        return result_msg
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+try:
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtCore import *
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# manifest 保存在用户目录下，写入时不会改变被扫描目录的 mtime
+MANIFEST_DIR = os.path.join(os.path.expanduser('~'), '.labelImg_manifests')
+MANIFEST_VERSION = 2
+# 同时扫描的子目录数量，网络盘上主要在等待 I/O
+SCAN_WORKERS = 8
+
+
+def natural_key(path):
+    """Sort key of natural_sort(images, key=lambda x: x.lower())."""
+    return [int(text) if text.isdigit() else text for text in re.split('([0-9]+)', path.lower())]
+
+
+def manifest_path(root):
+    """:return: root 目录的 manifest 文件路径，按目录的绝对路径区分"""
+    digest = hashlib.sha1(os.path.abspath(root).encode('utf-8', 'surrogatepass')).hexdigest()
+    return os.path.join(MANIFEST_DIR, digest + '.json')
+
+
+def scan_one(dir_path, extensions):
+    """
+    List one directory with a single os.scandir, without a stat per file.
+    :return: (图像文件名列表, 子目录名称列表)，与 os.walk 一样不进入符号链接目录
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                except OSError:
+                    continue
+                if entry.name.lower().endswith(extensions):
+                    files.append(entry.name)
+    except OSError:
+        pass
+    return files, subdirs
+
+
+class DirectoryManifest(object):
+    """
+    Image files under an opened directory, cached in a file under MANIFEST_DIR.
+
+    Every directory is stored with its own mtime, its image file names and its
+    subdirectories, plus the naturally sorted path list. A refresh only stats
+    each directory and lists again the ones whose mtime changed, since adding,
+    removing or renaming a file changes the mtime of its directory. Directories
+    of one tree level are handled in parallel. The manifest is kept outside the
+    scanned tree, because writing it there would change the mtime of the root.
+    """
+
+    def __init__(self, root, extensions):
+        """
+        :param extensions: 小写的图像扩展名，如 ('.jpg', '.png')
+        """
+        self.root = os.path.abspath(root)
+        self.extensions = tuple(extensions)
+        self.path = manifest_path(self.root)
+        # 相对目录 -> {'mtime': ..., 'files': [文件名], 'subdirs': [...]}
+        self.dirs = {}
+        self.paths = []
+
+    def load(self):
+        """:return: 是否读到了可用的 manifest"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get('version') != MANIFEST_VERSION or data.get('root') != self.root
+                or data.get('extensions') != list(self.extensions)):
+            return False
+        self.dirs = data['dirs']
+        self.paths = [os.path.join(self.root, rel) for rel in data['order']]
+        return True
+
+    def save(self):
+        """Write the manifest; failures are skipped silently, the next open scans again."""
+        prefix = len(self.root) + 1
+        data = {
+            'version': MANIFEST_VERSION,
+            'root': self.root,
+            'extensions': list(self.extensions),
+            'dirs': self.dirs,
+            'order': [path[prefix:] for path in self.paths],
+        }
+        tmp_path = self.path + '.tmp'
+        try:
+            os.makedirs(MANIFEST_DIR, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return False
+        return True
+
+    def refresh(self, workers=SCAN_WORKERS, on_first_level=None):
+        """
+        Bring the manifest up to date with the directory tree.
+        :param on_first_level: 可选回调，第一次找到图像的那一层目录列出后，以已找到的图像（已排序）调用，用于尽早显示
+        :return: 文件列表是否有变化
+        """
+        old_dirs = self.dirs
+        dirs = {}
+        modified = []
+        level = ['']
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while level:
+                next_level = []
+                for rel, entry, dir_modified in executor.map(lambda rel: self._visit(rel, old_dirs.get(rel)), level):
+                    if entry is None:
+                        continue
+                    if dir_modified:
+                        modified.append(rel)
+                    dirs[rel] = entry
+                    next_level.extend(os.path.join(rel, name) for name in entry['subdirs'])
+                if on_first_level is not None and any(entry['files'] for entry in dirs.values()):
+                    on_first_level(self._sorted_paths(dirs))
+                    on_first_level = None
+                level = next_level
+        gone = [rel for rel in old_dirs if rel not in dirs]
+        self.dirs = dirs
+        if not modified and not gone:
+            return False
+        self._apply_changes(old_dirs, dirs, modified + gone)
+        return True
+
+    def _apply_changes(self, old_dirs, dirs, changed_dirs):
+        """Update the sorted path list for the listed directories instead of sorting everything again."""
+        removed, added = set(), []
+        for rel in changed_dirs:
+            old_names = set(old_dirs.get(rel, {'files': ()})['files'])
+            new_names = set(dirs.get(rel, {'files': ()})['files'])
+            removed.update(os.path.join(self.root, rel, name) for name in old_names - new_names)
+            added.extend(os.path.join(self.root, rel, name) for name in new_names - old_names)
+        if not self.paths or len(added) > len(self.paths) // 100:
+            self.paths = self._sorted_paths(dirs)
+            return
+        paths = [path for path in self.paths if path not in removed] if removed else self.paths
+        for path in sorted(added, key=natural_key):
+            key = natural_key(path)
+            lo, hi = 0, len(paths)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if natural_key(paths[mid]) <= key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            paths.insert(lo, path)
+        self.paths = paths
+
+    def _visit(self, rel, cached):
+        """:return: (相对目录, 目录条目, 图像或子目录是否有变化)；目录不存在时条目为 None"""
+        dir_path = os.path.join(self.root, rel)
+        try:
+            mtime = os.stat(dir_path).st_mtime
+        except OSError:
+            return rel, None, True
+        if cached is not None and cached['mtime'] == mtime:
+            return rel, cached, False
+        files, subdirs = scan_one(dir_path, self.extensions)
+        entry = {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+        # 非图像文件的变化也会改变目录 mtime
+        listed = cached is None or cached['files'] != files or cached['subdirs'] != subdirs
+        return rel, entry, listed
+
+    def _sorted_paths(self, dirs):
+        paths = [os.path.join(self.root, rel, name) for rel, entry in dirs.items() for name in entry['files']]
+        paths.sort(key=natural_key)
+        return paths
+
+
+class ScanSignals(QObject):
+    first_level = pyqtSignal(object)
+    finished = pyqtSignal(object, bool)
+
+
+class ManifestScanWorker(QRunnable):
+    """Refreshes and saves a DirectoryManifest on a pool thread."""
+
+    def __init__(self, manifest):
+        super(ManifestScanWorker, self).__init__()
+        self.manifest = manifest
+        self.signals = ScanSignals()
+        self.early = not manifest.paths
+
+    def run(self):
+        # 没有 manifest 时，先把最浅一层找到的图像交给界面
+        on_first_level = self.signals.first_level.emit if self.early else None
+        changed = self.manifest.refresh(on_first_level=on_first_level)
+        if changed:
+            self.manifest.save()
+        self.signals.finished.emit(list(self.manifest.paths), changed)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copy dataset files without decoding them.
+
+Tries a copy-on-write clone (reflink), then a plain byte copy; a hard link is
+only tried first when the caller opts in. All three give a bit-identical file,
+but a hard link shares its inode with the source, so writing to it in place
+also changes the source.
+"""
+import os
+import shutil
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+LINK = 'link'
+REFLINK = 'reflink'
+COPY = 'copy'
+
+
+def _reflink(src, dst):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+        return True
+    except OSError:
+        # Not supported by this filesystem, or src and dst are on different ones.
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def copy_file_fast(src, dst, allow_link=False):
+    """
+    将src复制到dst，依次尝试硬链接（需 allow_link）、reflink和字节复制。
+    :param src: 源文件路径
+    :param dst: 目标文件路径，已存在时会被替换
+    :param allow_link: 为 True 时先尝试硬链接，目标文件与源文件共享同一个inode，之后原地修改目标会同时修改源文件
+    :return: 实际使用的方式 LINK / REFLINK / COPY
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if allow_link:
+        try:
+            os.link(src, dst)
+            return LINK
+        except OSError:
+            pass
+    if _reflink(src, dst):
+        return REFLINK
+    shutil.copyfile(src, dst)
+    return COPY
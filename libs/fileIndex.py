@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import re
+from bisect import bisect_right
+
+# 文件名搜索最多返回的结果数
+SEARCH_LIMIT = 10000
+
+
+class FileIndex(object):
+    """
+    Path -> row map over an image path list, plus filename search.
+
+    Looking up the row of the open image no longer walks the list. For search
+    the lower-cased file names are joined into one newline-separated string on
+    first use, so a query is a single regex pass in C over that buffer:
+    substring matches come first, then names that contain the query letters
+    in order (fuzzy matches), each group in list order.
+    """
+
+    def __init__(self, paths=None):
+        self.reset([] if paths is None else paths)
+
+    def reset(self, paths):
+        """:param paths: 被索引的列表本身，不复制"""
+        self.paths = paths
+        self.rows = dict((path, row) for row, path in enumerate(paths))
+        self._names = None
+        self._starts = None
+
+    def __contains__(self, path):
+        return path in self.rows
+
+    def __len__(self):
+        return len(self.paths)
+
+    def row(self, path):
+        """:return: path 所在的行，不在列表中时返回 None"""
+        return self.rows.get(path)
+
+    def remove(self, path):
+        """
+        Remove path from the list, or only from the index if the list no longer
+        holds it at its row, e.g. after a list model deleted it already.
+        """
+        row = self.rows.pop(path, None)
+        if row is None:
+            return None
+        if row < len(self.paths) and self.paths[row] == path:
+            del self.paths[row]
+        for i in range(row, len(self.paths)):
+            self.rows[self.paths[i]] = i
+        self._names = None
+        return row
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """:return: 文件名与 text 匹配的行，最多 limit 个"""
+        text = text.strip().lower()
+        if not text:
+            return []
+        if self._names is None:
+            self._build_names()
+        substring = re.compile(re.escape(text))
+        # 每个字母之前只跳过不是该字母的字符，匹配最早出现的位置，不会回溯
+        fuzzy = re.compile(re.escape(text[0]) + ''.join('[^%s\n]*%s' % (re.escape(c), re.escape(c)) for c in text[1:]))
+        found = {}
+        for pattern in (substring, fuzzy):
+            for match in pattern.finditer(self._names):
+                row = bisect_right(self._starts, match.start()) - 1
+                if row not in found:
+                    found[row] = None
+                    if len(found) >= limit:
+                        return list(found)
+        return list(found)
+
+    def _build_names(self):
+        names = [os.path.basename(path).lower().replace('\n', ' ') for path in self.paths]
+        starts, offset = [], 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + 1
+        self._names = '\n'.join(names) + '\n'
+        self._starts = starts
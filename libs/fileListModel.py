@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+from libs.utils import new_icon
+
+STATUS_EMPTY, STATUS_LABELLED, STATUS_VERIFIED = range(3)
+
+
+class FileListModel(QAbstractListModel):
+    """
+    The image path list of the main window as a list model.
+
+    The model shows the caller's list itself, not a copy, so opening a
+    directory costs one model reset instead of one QListWidgetItem per image.
+    The annotation status icon of a row is computed by status_func only when
+    the view asks for it, i.e. for the rows that are on screen, and cached
+    until invalidate_status().
+    """
+
+    def __init__(self, status_func=None, parent=None):
+        """
+        :param status_func: status_func(path) -> STATUS_EMPTY / STATUS_LABELLED / STATUS_VERIFIED
+        """
+        super(FileListModel, self).__init__(parent)
+        self.paths = []
+        self.status_func = status_func
+        self._status = {}
+        self._icons = None
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = paths
+        self._status.clear()
+        self.endResetModel()
+
+    def remove_row(self, row):
+        """Remove a row, and with it the path from the list passed to set_paths()."""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.paths[row]
+        self._status.clear()
+        self.endRemoveRows()
+
+    def invalidate_status(self):
+        """Forget the cached status icons; the view asks again for the visible rows."""
+        self._status.clear()
+        if self.paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self.paths) - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = index.row()
+        if not index.isValid() or row >= len(self.paths):
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.paths[row]
+        if role == Qt.DecorationRole and self.status_func is not None:
+            status = self._status.get(row)
+            if status is None:
+                status = self._status[row] = self.status_func(self.paths[row])
+            return self.status_icons()[status]
+        return None
+
+    def status_icons(self):
+        if self._icons is None:
+            # 没有标注时用透明图标占位，使各行文字对齐
+            blank = QPixmap(16, 16)
+            blank.fill(Qt.transparent)
+            self._icons = {
+                STATUS_EMPTY: QIcon(blank),
+                STATUS_LABELLED: new_icon('done'),
+                STATUS_VERIFIED: new_icon('verify'),
+            }
+        return self._icons
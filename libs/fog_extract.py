@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+阈值有雾训练数据提取。
+
+Every label file is handled independently (decode, score, write), so the files
+are spread over a process pool by libs.batchJob.run_job. Nothing in here touches
+Qt: the GUI only shows progress, and the same code can run without a display.
+"""
+import os
+
+import cv2
+import numpy as np
+
+from libs.batchJob import BatchJob
+from libs.fast_copy import copy_file_fast
+from libs.fog_metrics import DEFAULT_FOG_METRIC, detect_fog_batch
+
+# 每个结果的状态
+STATUS_WRITTEN = 'written'
+STATUS_SKIPPED = 'skipped'
+
+
+def default_worker_count():
+    return os.cpu_count() or 1
+
+
+def read_txt_labels(txt_path, image_shape):
+    """
+    读取TXT标签文件，解析ROI区域。
+    :param txt_path: TXT文件路径
+    :param image_shape: 图像的形状 (height, width)
+    :return: ROI区域列表 [(x, y, w, h)]
+    """
+    rois = []
+    with open(txt_path, 'r') as file:
+        for line in file.readlines():
+            values = line.strip().split()
+            if len(values) == 5:
+                # 解析归一化坐标
+                _, x_center, y_center, width, height = map(float, values)
+                # 转换为像素坐标
+                x = int((x_center - width / 2) * image_shape[1])
+                y = int((y_center - height / 2) * image_shape[0])
+                w = int(width * image_shape[1])
+                h = int(height * image_shape[0])
+                rois.append((x, y, w, h))
+    return rois
+
+
+def list_label_files(label_folder):
+    return sorted(f for f in os.listdir(label_folder) if f.lower().endswith('.txt'))
+
+
+def extract_fog_label_file(image_folder, label_folder, output_folder, label_file,
+                           threshold, metric=DEFAULT_FOG_METRIC, allow_link=False):
+    """
+    处理一个标签文件：评估所有ROI，写出符合阈值的行和对应图像。
+    The label is checked before the image is decoded, and the output image is a
+    link or byte copy of the source file instead of a re-encoded JPEG.
+    :param allow_link: 是否允许输出图像硬链接到源图像
+    :return: STATUS_WRITTEN 或 STATUS_SKIPPED；文件有问题时抛出异常
+    """
+    ima_name = os.path.splitext(label_file)[0] + ".jpg"
+    ima_path = os.path.join(image_folder, ima_name)
+    if not os.path.exists(ima_path):
+        raise IOError(f"文件不存在: {ima_path}")
+    # 检查第一行第一个值是否为 0，不符合的文件无需解码图像
+    label_path = os.path.join(label_folder, label_file)
+    with open(label_path, 'r') as original_txt:
+        lines = original_txt.readlines()
+    first_line = lines[0].strip().split() if lines else []
+    if not first_line or first_line[0] != '0':
+        return STATUS_SKIPPED
+    if not any(len(line.split()) == 5 for line in lines):
+        raise ValueError(f"未找到ROI区域: {label_file}")
+
+    # 只有需要评估像素时才解码
+    image = cv2.imread(ima_path)
+    if image is None:
+        raise IOError(f"无法读取图像: {ima_path}")
+    rois = read_txt_labels(label_path, image.shape[:2])
+
+    # 所有ROI区域一次性向量化评估
+    is_fog, ratios = detect_fog_batch(image, rois, threshold, metric)
+    del image
+    filtered_lines = [lines[idx] for idx in np.flatnonzero(is_fog)]
+    if not filtered_lines:
+        return STATUS_SKIPPED
+
+    output_txt_path = os.path.join(output_folder, 'labels')
+    output_image_path = os.path.join(output_folder, 'images')
+    os.makedirs(output_txt_path, exist_ok=True)
+    os.makedirs(output_image_path, exist_ok=True)
+    with open(os.path.join(output_txt_path, label_file), 'w') as new_txt:
+        new_txt.writelines(filtered_lines)
+    # 原样复制源文件，输出与源图像逐字节一致
+    copy_file_fast(ima_path, os.path.join(output_image_path, ima_name), allow_link=allow_link)
+    return STATUS_WRITTEN
+
+
+class FogTrainDataJob(BatchJob):
+    """提取阈值有雾训练数据，每个标签文件是一个条目。"""
+    title = '提取阈值有雾训练数据'
+    params = ('image_folder', 'label_folder', 'output_folder', 'threshold', 'metric', 'allow_link')
+
+    def __init__(self, image_folder, label_folder, output_folder, threshold,
+                 metric=DEFAULT_FOG_METRIC, allow_link=False):
+        self.image_folder = image_folder
+        self.label_folder = label_folder
+        self.output_folder = output_folder
+        self.threshold = threshold
+        self.metric = metric
+        self.allow_link = allow_link
+
+    def setup(self):
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    def prepare(self):
+        return list_label_files(self.label_folder)
+
+    def process(self, label_file):
+        return extract_fog_label_file(self.image_folder, self.label_folder, self.output_folder, label_file,
+                                      self.threshold, self.metric, self.allow_link)
+
+    def finish(self, results):
+        written = sum(1 for _, status in results if status == STATUS_WRITTEN)
+        return "提取阈值有雾训练数据完成。\n\n写出文件数: %d / %d\n保存位置: %s" % (
+            written, len(results), self.output_folder)
+
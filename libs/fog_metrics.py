@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+DEFAULT_FOG_THRESHOLD = 12.0
+
+# mean(V / S) * 10: average of the per-pixel ratio
+FOG_METRIC_MEAN_RATIO = 'mean_ratio'
+# mean(V) / mean(S) * 10: ratio of the channel averages
+FOG_METRIC_RATIO_OF_MEANS = 'ratio_of_means'
+FOG_METRICS = (FOG_METRIC_MEAN_RATIO, FOG_METRIC_RATIO_OF_MEANS)
+# The fog threshold has always been tuned against the per-pixel ratio used by the batch tools.
+DEFAULT_FOG_METRIC = FOG_METRIC_MEAN_RATIO
+# 框数不超过此值、且总面积小于整幅图像时逐框直接计算，不建积分图
+DIRECT_ROI_LIMIT = 16
+
+
+def crop_fog_metrics(roi_image):
+    """
+    Score one box directly on its pixels, with the same semantics as FogIntegral.
+    :param roi_image: ROI 区域图像（BGR格式），不能为空
+    :return: (mean_ratio, ratio_of_means)
+    """
+    hsv_image = cv2.cvtColor(roi_image, cv2.COLOR_BGR2HSV)
+    s = hsv_image[:, :, 1]  # 饱和度
+    v = hsv_image[:, :, 2]  # 亮度
+    finite = s > 0
+    finite_count = np.count_nonzero(finite)
+    if finite_count < s.size and v[~finite].any():
+        mean_ratio = np.inf
+    elif finite_count == 0:
+        mean_ratio = np.nan
+    else:
+        mean_ratio = float(np.sum(v[finite] / s[finite].astype(np.float64))) / finite_count * 10
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_of_means = float(np.sum(v, dtype=np.float64) / np.sum(s, dtype=np.float64)) * 10
+    return mean_ratio, ratio_of_means
+
+
+class FogIntegral(object):
+    """
+    Summed-area tables of one image for O(1) fog scoring of any box.
+
+    S, V and the per-pixel V/S ratio are integrated once per image. Pixels with
+    S == 0 are masked out of the ratio table up front: 0/0 is NaN and ignored like
+    np.nanmean does, while V/0 is +inf and is tracked by its own count table so a
+    box containing one still scores inf, exactly as the per-pixel division did.
+    S and V are integrated as int32 whenever their sums fit; only the ratio table
+    needs float64, since box sums are differences of large running totals.
+    """
+
+    def __init__(self, image):
+        """
+        :param image: 输入图像（BGR格式）
+        """
+        hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        s = hsv_image[:, :, 1]  # 饱和度
+        v = hsv_image[:, :, 2]  # 亮度
+        self.height, self.width = s.shape
+
+        finite = s > 0
+        ratio = np.zeros(s.shape, dtype=np.float32)
+        np.divide(v, s, out=ratio, where=finite)
+
+        # 8位通道之和不超过 int32 时用整数积分图，内存只有 float64 的一半
+        depth = cv2.CV_32S if s.size * 255 < 2 ** 31 else cv2.CV_64F
+        self.s_table = cv2.integral(s, sdepth=depth)
+        self.v_table = cv2.integral(v, sdepth=depth)
+        self.ratio_table = cv2.integral(ratio, sdepth=cv2.CV_64F)
+        self.finite_table = cv2.integral(finite.view(np.uint8), sdepth=cv2.CV_32S)
+        self.inf_table = cv2.integral(((~finite) & (v > 0)).view(np.uint8), sdepth=cv2.CV_32S)
+
+    def metrics(self, rois):
+        """
+        Score many boxes at once.
+        :param rois: (N, 4) array of [x, y, width, height]; boxes are clipped to the image
+        :return: (mean_ratio, ratio_of_means), two float64 arrays of length N. Empty boxes score 0,
+                 boxes whose pixels all have S == V == 0 score NaN.
+        """
+        rois = np.asarray(rois, dtype=np.float64).reshape(-1, 4).astype(np.int64)
+        x1 = np.clip(rois[:, 0], 0, self.width)
+        y1 = np.clip(rois[:, 1], 0, self.height)
+        x2 = np.clip(rois[:, 0] + rois[:, 2], 0, self.width)
+        y2 = np.clip(rois[:, 1] + rois[:, 3], 0, self.height)
+        empty = (x2 <= x1) | (y2 <= y1)
+
+        def box_sums(table):
+            return table[y2, x2].astype(np.float64) - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+        # 没有 S > 0 像素的框与 np.nanmean 一样记为 NaN，不用比值表的舍入残差去除以 0
+        mean_ratio = np.full(len(rois), np.nan)
+        finite_count = box_sums(self.finite_table)
+        np.divide(box_sums(self.ratio_table), finite_count, out=mean_ratio, where=finite_count > 0)
+        mean_ratio *= 10
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio_of_means = box_sums(self.v_table) / box_sums(self.s_table) * 10
+        mean_ratio[box_sums(self.inf_table) > 0] = np.inf
+        mean_ratio[empty] = 0.0
+        ratio_of_means[empty] = 0.0
+        return mean_ratio, ratio_of_means
+
+    def ratios(self, rois, metric=DEFAULT_FOG_METRIC):
+        return select_metric(self.metrics(rois), metric)
+
+    def detect_batch(self, rois, threshold=DEFAULT_FOG_THRESHOLD, metric=DEFAULT_FOG_METRIC):
+        """
+        :return: (是否存在雾的布尔数组, V/S比值数组)
+        """
+        ratios = self.ratios(rois, metric)
+        return ratios > threshold, ratios
+
+    def detect(self, roi, threshold=DEFAULT_FOG_THRESHOLD, metric=DEFAULT_FOG_METRIC):
+        """
+        :param roi: 感兴趣区域（ROI）的坐标 [x, y, width, height]
+        :param threshold: V/S比值的阈值
+        :param metric: FOG_METRIC_MEAN_RATIO 或 FOG_METRIC_RATIO_OF_MEANS
+        :return: 是否存在雾，V/S比值
+        """
+        is_fog, ratios = self.detect_batch([roi], threshold, metric)
+        return bool(is_fog[0]), float(ratios[0])
+
+
+def select_metric(metrics, metric=DEFAULT_FOG_METRIC):
+    """:param metrics: (mean_ratio, ratio_of_means)"""
+    return metrics[0] if metric == FOG_METRIC_MEAN_RATIO else metrics[1]
+
+
+def batch_fog_metrics(image, rois):
+    """
+    Batch entry point: score N boxes of one image with both metrics.
+
+    Up to DIRECT_ROI_LIMIT boxes covering less than the image are scored on
+    their own pixels; only more boxes pay for the full-frame FogIntegral.
+    :param image: 输入图像（BGR格式）
+    :param rois: (N, 4) array of [x, y, width, height]
+    :return: (mean_ratio, ratio_of_means) arrays of length N
+    """
+    rois = np.asarray(rois, dtype=np.float64).reshape(-1, 4).astype(np.int64)
+    height, width = image.shape[:2]
+    clipped = [_clip_roi(roi, width, height) for roi in rois]
+    if len(rois) > DIRECT_ROI_LIMIT or sum(c[2] * c[3] for c in clipped if c) >= width * height:
+        return FogIntegral(image).metrics(rois)
+    mean_ratio = np.zeros(len(rois))
+    ratio_of_means = np.zeros(len(rois))
+    for i, box in enumerate(clipped):
+        if box is not None:
+            x, y, w, h = box
+            mean_ratio[i], ratio_of_means[i] = crop_fog_metrics(image[y:y + h, x:x + w])
+    return mean_ratio, ratio_of_means
+
+
+def detect_fog_batch(image, rois, threshold=DEFAULT_FOG_THRESHOLD, metric=DEFAULT_FOG_METRIC):
+    """
+    :return: (是否存在雾的布尔数组, V/S比值数组)
+    """
+    ratios = select_metric(batch_fog_metrics(image, rois), metric)
+    return ratios > threshold, ratios
+
+
+def detect_fog(image, roi, threshold=DEFAULT_FOG_THRESHOLD, metric=DEFAULT_FOG_METRIC):
+    """
+    检测图像中单个ROI是否存在雾，只对ROI内的像素做计算。
+    :param image: 输入图像（BGR格式）
+    :param roi: 感兴趣区域（ROI）的坐标 [x, y, width, height]
+    :param threshold: V/S比值的阈值
+    :param metric: FOG_METRIC_MEAN_RATIO 或 FOG_METRIC_RATIO_OF_MEANS
+    :return: 是否存在雾，V/S比值
+    """
+    clipped = _clip_roi(roi, image.shape[1], image.shape[0])
+    if clipped is None:
+        return False, 0.0
+    x, y, w, h = clipped
+    ratio = select_metric(crop_fog_metrics(image[y:y + h, x:x + w]), metric)
+    return ratio > threshold, ratio
+
+
+def _clip_roi(roi, width, height):
+    x, y, w, h = [int(v) for v in roi]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + w, width), min(y + h, height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2 - x1, y2 - y1
+
+
+class RoiFogEvaluator(object):
+    """
+    Interactive fog check for a single box of the loaded image.
+
+    Only the clipped ROI is converted to HSV, and recent results are cached
+    by (image key, roi, metric) so re-checking an unchanged box is free.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+
+    def clear(self):
+        self._cache.clear()
+
+    def ratio(self, image_buffer, roi, metric=DEFAULT_FOG_METRIC):
+        clipped = image_buffer.clip_roi(roi)
+        if clipped is None:
+            return 0.0
+        key = (image_buffer.key, metric) + clipped
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        value = select_metric(crop_fog_metrics(image_buffer.roi_bgr(clipped)), metric)
+        self._cache[key] = value
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return value
+
+    def evaluate(self, image_buffer, roi, threshold=DEFAULT_FOG_THRESHOLD, metric=DEFAULT_FOG_METRIC):
+        """
+        :param image_buffer: ImageBuffer of the loaded image
+        :param roi: 感兴趣区域（ROI）的坐标 [x, y, width, height]
+        :param threshold: V/S比值的阈值
+        :param metric: FOG_METRIC_MEAN_RATIO 或 FOG_METRIC_RATIO_OF_MEANS
+        :return: 是否存在雾，V/S比值
+        """
+        ratio = self.ratio(image_buffer, roi, metric)
+        return ratio > threshold, ratio
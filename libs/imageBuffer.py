@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+
+import cv2
+import numpy as np
+
+try:
+    from PyQt5.QtGui import QImage
+except ImportError:
+    from PyQt4.QtGui import QImage
+
+# QImage formats whose memory layout can be wrapped without any conversion.
+# 32-bit formats store 0xAARRGGBB words, i.e. B, G, R, A bytes on little endian.
+_WRAPPABLE_32BIT = (QImage.Format_RGB32, QImage.Format_ARGB32)
+if sys.byteorder == 'little':
+    _BGR_CHANNELS = slice(0, 3)
+else:
+    _BGR_CHANNELS = slice(3, 0, -1)
+
+
+def qimage_to_ndarray(image):
+    """
+    Wrap the pixel buffer of a QImage as a read-only NumPy view.
+    :param image: QImage; converted once to a 32-bit layout if it is not wrappable as is
+    :return: (view, backing_image) where view has shape (height, width, 4) or (height, width, 1)
+             and backing_image is the QImage that owns the memory. Keep it alive as long as the view.
+    """
+    if image.format() == QImage.Format_Grayscale8:
+        channels = 1
+    elif image.format() in _WRAPPABLE_32BIT:
+        channels = 4
+    else:
+        image = image.convertToFormat(QImage.Format_RGB32)
+        channels = 4
+
+    height, width = image.height(), image.width()
+    stride = image.bytesPerLine()
+    ptr = image.constBits()
+    ptr.setsize(stride * height)
+    # Rows may be padded, so index through the real stride and crop the padding off.
+    rows = np.frombuffer(ptr, dtype=np.uint8).reshape(height, stride)
+    view = rows[:, :width * channels].reshape(height, width, channels)
+    return view, image
+
+
+def qimage_to_bgr(image):
+    """Return a contiguous BGR copy of a QImage, suitable for OpenCV."""
+    view, _ = qimage_to_ndarray(image)
+    return _view_to_bgr(view)
+
+
+def _view_to_bgr(view):
+    if view.shape[2] == 1:
+        return cv2.cvtColor(np.ascontiguousarray(view[:, :, 0]), cv2.COLOR_GRAY2BGR)
+    return np.ascontiguousarray(view[:, :, _BGR_CHANNELS])
+
+
+class ImageBuffer(object):
+    """
+    Shares the pixels of the currently loaded image with NumPy/OpenCV code.
+
+    The QImage bits are wrapped once per loaded image, and the BGR array is built
+    lazily and cached, so fog checks, cutting and augmentation reuse the same data.
+    """
+
+    def __init__(self, image=None):
+        self.clear()
+        if image is not None:
+            self.set_image(image)
+
+    def clear(self):
+        self.key = None
+        self._image = None
+        self._view = None
+        self._bgr = None
+
+    def set_image(self, image):
+        if image is None or image.isNull():
+            self.clear()
+            return
+        key = image.cacheKey()
+        if key == self.key:
+            return
+        self._view, self._image = qimage_to_ndarray(image)
+        self._bgr = None
+        self.key = key
+
+    def is_null(self):
+        return self._view is None
+
+    @property
+    def shape(self):
+        """(height, width, 3), matching what cv2.imread would return."""
+        if self._view is None:
+            return 0, 0, 3
+        return self._view.shape[0], self._view.shape[1], 3
+
+    def view(self):
+        """Zero-copy, read-only view of the image memory."""
+        return self._view
+
+    def clip_roi(self, roi):
+        """
+        Clip an [x, y, w, h] rectangle to the image.
+        :return: clipped (x, y, w, h), or None if nothing of it lies inside the image
+        """
+        if self._view is None:
+            return None
+        height, width = self._view.shape[:2]
+        x, y, w, h = [int(v) for v in roi]
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, width), min(y + h, height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2 - x1, y2 - y1
+
+    def roi_bgr(self, roi):
+        """BGR pixels of just the (clipped) [x, y, w, h] region, without converting the rest of the frame."""
+        clipped = self.clip_roi(roi)
+        if clipped is None:
+            return None
+        x, y, w, h = clipped
+        if self._bgr is not None:
+            return self._bgr[y:y + h, x:x + w]
+        return _view_to_bgr(self._view[y:y + h, x:x + w])
+
+    def bgr(self):
+        """Read-only BGR array of the whole image, converted on first use only."""
+        if self._view is None:
+            return None
+        if self._bgr is None:
+            self._bgr = _view_to_bgr(self._view)
+            self._bgr.flags.writeable = False
+        return self._bgr
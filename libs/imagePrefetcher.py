@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+import os
+from collections import OrderedDict
+
+# 预解码缓存的大小上限
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+# 预解码当前图像之后和之前的图像数量
+PREFETCH_NEXT = 3
+PREFETCH_PREV = 1
+# 像素数不小于该值的图像先按缩小的分辨率解码显示，原图在后台解码
+PROGRESSIVE_MIN_PIXELS = 20 * 1000 * 1000
+
+
+def decode_image(path):
+    """Decode an image the way the main window does, honouring the EXIF orientation."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    return reader.read()
+
+
+def decode_preview(path, view_size, min_pixels=PROGRESSIVE_MIN_PIXELS):
+    """
+    Decode a huge image at 1/2, 1/4 or 1/8 of its size, the largest reduction
+    that still covers view_size. JPEG decoders do this in the DCT stage, so it
+    costs a fraction of a full decode.
+    :param view_size: QSize，显示区域大小
+    :return: (QImage, factor)，不需要预览时返回 (None, 1)
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if not size.isValid() or size.width() * size.height() < min_pixels:
+        return None, 1
+    for factor in (8, 4, 2):
+        if size.width() // factor >= view_size.width() and size.height() // factor >= view_size.height():
+            break
+    else:
+        return None, 1
+    reader.setScaledSize(QSize(size.width() // factor, size.height() // factor))
+    image = reader.read()
+    if image.isNull():
+        return None, 1
+    return image, factor
+
+
+def image_bytes(image):
+    if hasattr(image, 'sizeInBytes'):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+class DecodeSignals(QObject):
+    decoded = pyqtSignal(str, object, object)
+
+
+class DecodeWorker(QRunnable):
+
+    def __init__(self, path):
+        super(DecodeWorker, self).__init__()
+        self.path = path
+        self.signals = DecodeSignals()
+
+    def run(self):
+        stamp = file_stamp(self.path)
+        self.signals.decoded.emit(self.path, stamp, decode_image(self.path))
+
+
+class ImagePrefetcher(QObject):
+    """
+    Decodes the images next to the current one on worker threads and keeps
+    them in an LRU cache bounded by bytes, so stepping to the next or previous
+    image does not wait for the decoder. Entries are dropped when the file
+    changes on disk. image_decoded is emitted for every finished decode, also
+    for images too large to be cached, and with a null QImage when decoding
+    failed.
+    """
+    image_decoded = pyqtSignal(str, object)
+
+    def __init__(self, parent=None, max_bytes=DEFAULT_CACHE_BYTES, threads=2):
+        super(ImagePrefetcher, self).__init__(parent)
+        self.max_bytes = max_bytes
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+        # path -> (stamp, QImage)
+        self._cache = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+
+    def take(self, path):
+        """:return: 已解码且文件未变化的 QImage，否则 None"""
+        entry = self._cache.get(path)
+        if entry is None:
+            return None
+        stamp, image = entry
+        if stamp != file_stamp(path):
+            self._drop(path)
+            return None
+        self._cache.move_to_end(path)
+        return image
+
+    def prefetch(self, paths, priority=0):
+        """在后台解码尚未缓存的图像，paths 按优先级排列"""
+        for path in paths:
+            if path in self._cache or path in self._pending:
+                continue
+            worker = DecodeWorker(path)
+            worker.signals.decoded.connect(self._decoded)
+            self._pending[path] = worker
+            self.pool.start(worker, priority)
+
+    def clear(self):
+        self.pool.clear()
+        self._pending.clear()
+        self._cache.clear()
+        self._bytes = 0
+
+    def _decoded(self, path, stamp, image):
+        if self._pending.pop(path, None) is None:
+            return
+        self.image_decoded.emit(path, image)
+        if image.isNull():
+            return
+        self._drop(path)
+        size = image_bytes(image)
+        if size > self.max_bytes:
+            return
+        self._cache[path] = (stamp, image)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._cache)))
+
+    def _drop(self, path):
+        entry = self._cache.pop(path, None)
+        if entry is not None:
+            self._bytes -= image_bytes(entry[1])
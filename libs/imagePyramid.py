@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+import math
+from collections import OrderedDict
+
+TILE_SIZE = 512
+# 长边不小于该值的图像使用金字塔分块绘制
+PYRAMID_MIN_SIDE = 4096
+# 缓存的分块数量上限，512x512 的分块约 1MB
+MAX_CACHED_TILES = 256
+
+
+class PyramidSignals(QObject):
+    level_ready = pyqtSignal(int, object)
+
+
+class PyramidBuilder(QRunnable):
+    """Halves the image level by level on a pool thread; each finished level is sent back to the GUI thread."""
+
+    def __init__(self, image, tile_size):
+        super(PyramidBuilder, self).__init__()
+        self.image = image
+        self.tile_size = tile_size
+        self.signals = PyramidSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        image = self.image
+        level = 0
+        while max(image.width(), image.height()) > self.tile_size and not self._cancelled:
+            image = image.scaled(max(1, image.width() // 2), max(1, image.height() // 2),
+                                 Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            level += 1
+            if not self._cancelled:
+                self.signals.level_ready.emit(level, image)
+        self.image = None
+
+
+class ImagePyramid(object):
+    """
+    Multi-resolution tiles of one large image.
+
+    Level 0 is the image itself; level k is the image halved k times. The
+    coarser levels are built in the background, and until a level is ready
+    the next finer one is drawn instead. Only the tiles that intersect the
+    exposed rect are turned into pixmaps, and at most MAX_CACHED_TILES of them
+    are kept, so painting cost depends on the screen size and not the image size.
+    """
+
+    def __init__(self, image, tile_size=TILE_SIZE, max_tiles=MAX_CACHED_TILES, on_level_ready=None):
+        """
+        :param image: QImage
+        :param on_level_ready: 可选回调，某一层生成后在主线程中调用
+        """
+        self.width = image.width()
+        self.height = image.height()
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.on_level_ready = on_level_ready
+        self.levels = [image]
+        self._tiles = OrderedDict()
+        self._builder = PyramidBuilder(image, tile_size)
+        self._builder.signals.level_ready.connect(self._level_ready)
+        QThreadPool.globalInstance().start(self._builder)
+
+    def cancel(self):
+        self._builder.cancel()
+
+    def _level_ready(self, level, image):
+        if level == len(self.levels):
+            self.levels.append(image)
+            if self.on_level_ready is not None:
+                self.on_level_ready(level)
+
+    def level_for_scale(self, scale):
+        """The coarsest ready level that still has at least one level pixel per screen pixel."""
+        if scale >= 1.0:
+            return 0
+        wanted = int(math.floor(math.log(1.0 / scale, 2)))
+        return max(0, min(wanted, len(self.levels) - 1))
+
+    def tile(self, level, tx, ty, overlay_color=None):
+        key = (level, tx, ty, overlay_color.rgba() if overlay_color else None)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+        image = self.levels[level]
+        ts = self.tile_size
+        rect = QRect(tx * ts, ty * ts, ts, ts).intersected(image.rect())
+        pixmap = QPixmap.fromImage(image.copy(rect))
+        if overlay_color:
+            painter = QPainter(pixmap)
+            painter.setCompositionMode(painter.CompositionMode_Overlay)
+            painter.fillRect(pixmap.rect(), overlay_color)
+            painter.end()
+        self._tiles[key] = pixmap
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return pixmap
+
+    def draw(self, painter, rect, scale, overlay_color=None):
+        """
+        绘制与 rect 相交的分块。
+        :param painter: 已变换到图像坐标的 QPainter
+        :param rect: 需要绘制的区域，图像坐标
+        :param scale: 画布缩放比例，用于选择层级
+        """
+        level = self.level_for_scale(scale)
+        image = self.levels[level]
+        # 逐层减半时宽高向下取整，用实际比例映射回原图坐标
+        fx = float(self.width) / image.width()
+        fy = float(self.height) / image.height()
+        visible = QRectF(rect.x() / fx, rect.y() / fy, rect.width() / fx, rect.height() / fy)
+        visible = visible.intersected(QRectF(image.rect()))
+        if visible.isEmpty():
+            return
+        ts = self.tile_size
+        for ty in range(int(visible.top() // ts), int(visible.bottom() // ts) + 1):
+            for tx in range(int(visible.left() // ts), int(visible.right() // ts) + 1):
+                pixmap = self.tile(level, tx, ty, overlay_color)
+                target = QRectF(tx * ts * fx, ty * ts * fy, pixmap.width() * fx, pixmap.height() * fy)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+from libs.batchJob import run_job
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+
+
+class JobWorker(QRunnable):
+    """Runs a BatchJob on a QThreadPool thread and reports back through queued signals."""
+
+    def __init__(self, job, workers=1, checkpoint_path=None, use_processes=False):
+        super(JobWorker, self).__init__()
+        self.job = job
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+        self.use_processes = use_processes
+        self.signals = JobSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        report = run_job(self.job, workers=self.workers, progress=self.signals.progress.emit,
+                         is_cancelled=self.is_cancelled, checkpoint_path=self.checkpoint_path,
+                         use_processes=self.use_processes)
+        self.signals.finished.emit(report)
+
+
+class JobProgressDock(QDockWidget):
+    """
+    Shows the running batch job: progress, a cancel button and the items that failed.
+    Only one job runs at a time.
+    """
+
+    def __init__(self, title, parent=None):
+        super(JobProgressDock, self).__init__(title, parent)
+        self.worker = None
+        self.on_finished = None
+
+        self.title_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.cancel_button = QPushButton('取消')
+        self.cancel_button.clicked.connect(self.cancel)
+        self.error_list = QListWidget()
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(5, 5, 5, 5)
+        layout.addWidget(self.title_label)
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+        layout.addWidget(self.error_list)
+        container = QWidget()
+        container.setLayout(layout)
+        self.setWidget(container)
+        self.cancel_button.setEnabled(False)
+
+    def is_running(self):
+        return self.worker is not None
+
+    def start(self, job, workers=1, checkpoint_path=None, use_processes=False, on_finished=None):
+        """
+        在后台线程中运行任务。
+        :param on_finished: 可选回调 on_finished(report)，在主线程中调用
+        :return: 已有任务在运行时返回 False
+        """
+        if self.is_running():
+            return False
+        self.worker = JobWorker(job, workers, checkpoint_path, use_processes)
+        self.worker.signals.progress.connect(self.update_progress)
+        self.worker.signals.finished.connect(self.job_finished)
+        self.on_finished = on_finished
+
+        self.title_label.setText(job.title)
+        # Busy indicator until the item list is known
+        self.progress_bar.setRange(0, 0)
+        self.error_list.clear()
+        self.cancel_button.setEnabled(True)
+        self.show()
+        self.raise_()
+        QThreadPool.globalInstance().start(self.worker)
+        return True
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.title_label.setText('%s (正在取消...)' % self.worker.job.title)
+
+    def update_progress(self, done, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat('%d / %d' % (done, total))
+
+    def job_finished(self, report):
+        self.worker = None
+        self.cancel_button.setEnabled(False)
+        for item, message in report.errors:
+            self.error_list.addItem('%s: %s' % (item, message))
+        if report.failed is not None:
+            self.title_label.setText('%s: 失败 - %s' % (report.title, report.failed))
+        elif report.cancelled:
+            self.title_label.setText('%s: %s' % (report.title, report.summary))
+        else:
+            self.title_label.setText('%s: 完成，失败 %d 项' % (report.title, len(report.errors)))
+        on_finished, self.on_finished = self.on_finished, None
+        if on_finished is not None:
+            on_finished(report)
@@ -124,6 +124,17 @@ class PascalVocWriter:
         out_file.close()
 
 
+def is_verified(file_path):
+    """Read only the root element of an annotation file and check its verified attribute."""
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(512)
+    except (IOError, OSError):
+        return False
+    start = head.find(b'<annotation')
+    return start >= 0 and b'verified="yes"' in head[start:head.find(b'>', start)]
+
+
 class PascalVocReader:
 
     def __init__(self, file_path):
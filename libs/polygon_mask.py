@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多边形选区的像素覆盖率。
+
+The selection polygon is rasterized once into a mask over its bounding box,
+and a summed-area table of that mask gives the number of covered pixels of
+any axis-aligned rectangle with four lookups. Rectangles are given as arrays,
+so a whole grid of candidate cells is scored in one NumPy pass.
+"""
+import cv2
+import numpy as np
+
+# fillPoly 的亚像素精度位数
+_SHIFT = 4
+
+
+class PolygonCoverage(object):
+
+    def __init__(self, points):
+        """
+        :param points: 多边形顶点 [(x, y)]，浮点坐标
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.x0 = int(np.floor(points[:, 0].min()))
+        self.y0 = int(np.floor(points[:, 1].min()))
+        width = int(np.ceil(points[:, 0].max())) - self.x0 + 1
+        height = int(np.ceil(points[:, 1].max())) - self.y0 + 1
+
+        mask = np.zeros((height, width), dtype=np.uint8)
+        local = np.round((points - (self.x0, self.y0)) * (1 << _SHIFT)).astype(np.int32)
+        cv2.fillPoly(mask, [local], 1, lineType=cv2.LINE_8, shift=_SHIFT)
+        # (height + 1, width + 1)，第一行第一列为0
+        self.integral = cv2.integral(mask, sdepth=cv2.CV_32S)
+
+    def covered_pixels(self, x1, y1, x2, y2):
+        """
+        矩形 [x1, x2) x [y1, y2) 中位于多边形内的像素数，坐标取整方式与 range(int(x1), int(x2)) 相同。
+        参数可以是标量或形状相同的数组。
+        :return: int64 数组
+        """
+        height, width = self.integral.shape[0] - 1, self.integral.shape[1] - 1
+        cx1 = np.clip(np.trunc(x1).astype(np.int64) - self.x0, 0, width)
+        cx2 = np.clip(np.trunc(x2).astype(np.int64) - self.x0, 0, width)
+        cy1 = np.clip(np.trunc(y1).astype(np.int64) - self.y0, 0, height)
+        cy2 = np.clip(np.trunc(y2).astype(np.int64) - self.y0, 0, height)
+        cx2 = np.maximum(cx1, cx2)
+        cy2 = np.maximum(cy1, cy2)
+        table = self.integral.astype(np.int64, copy=False)
+        return table[cy2, cx2] - table[cy1, cx2] - table[cy2, cx1] + table[cy1, cx1]
+
+    def ratios(self, x1, y1, x2, y2):
+        """
+        矩形与多边形的重叠像素比例。
+        :return: float64 数组，空矩形为0
+        """
+        area = ((np.trunc(x2) - np.trunc(x1)) * (np.trunc(y2) - np.trunc(y1))).astype(np.float64)
+        covered = self.covered_pixels(x1, y1, x2, y2)
+        return np.divide(covered, area, out=np.zeros(np.shape(area)), where=area > 0)
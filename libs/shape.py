@@ -10,7 +10,6 @@ except ImportError:
     from PyQt4.QtCore import *
 
 from libs.utils import distance
-import sys
 
 DEFAULT_LINE_COLOR = QColor(0, 255, 0, 128)
 DEFAULT_FILL_COLOR = QColor(255, 0, 0, 128)
@@ -25,10 +24,17 @@ class Shape(object):
 
     MOVE_VERTEX, NEAR_VERTEX = range(2)
 
+    # Images with tens of thousands of boxes keep as many Shape objects alive,
+    # so instances have no __dict__.
+    __slots__ = ('label', '_points', 'fill', 'selected', 'difficult', 'paint_label',
+                 '_highlight_index', '_highlight_mode', '_closed', '_line_color', '_fill_color',
+                 '_path', '_line_path', '_bounds')
+
     # The following class variables influence the drawing
     # of _all_ shape objects.
-    line_color = DEFAULT_LINE_COLOR
-    fill_color = DEFAULT_FILL_COLOR
+    # Shapes without their own line_color / fill_color use these.
+    default_line_color = DEFAULT_LINE_COLOR
+    default_fill_color = DEFAULT_FILL_COLOR
     select_line_color = DEFAULT_SELECT_LINE_COLOR
     select_fill_color = DEFAULT_SELECT_FILL_COLOR
     vertex_fill_color = DEFAULT_VERTEX_FILL_COLOR
@@ -38,6 +44,11 @@ class Shape(object):
     scale = 1.0
     label_font_size = 8
 
+    _highlight_settings = {
+        NEAR_VERTEX: (4, P_ROUND),
+        MOVE_VERTEX: (1.5, P_SQUARE),
+    }
+
     def __init__(self, label=None, line_color=None, difficult=False, paint_label=False):
         self.label = label
         self.points = []
@@ -48,21 +59,48 @@ class Shape(object):
 
         self._highlight_index = None
         self._highlight_mode = self.NEAR_VERTEX
-        self._highlight_settings = {
-            self.NEAR_VERTEX: (4, self.P_ROUND),
-            self.MOVE_VERTEX: (1.5, self.P_SQUARE),
-        }
 
         self._closed = False
 
-        if line_color is not None:
-            # Override the class line_color attribute
-            # with an object attribute. Currently this
-            # is used for drawing the pending line a different color.
-            self.line_color = line_color
+        # Override the class default_line_color with an object attribute.
+        # Currently this is used for drawing the pending line a different color.
+        self._line_color = line_color
+        self._fill_color = None
+
+    @property
+    def line_color(self):
+        return self.default_line_color if self._line_color is None else self._line_color
+
+    @line_color.setter
+    def line_color(self, color):
+        self._line_color = color
+
+    @property
+    def fill_color(self):
+        return self.default_fill_color if self._fill_color is None else self._fill_color
+
+    @fill_color.setter
+    def fill_color(self, color):
+        self._fill_color = color
+
+    @property
+    def points(self):
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the cached path and bounds. Call it after changing the points list in place."""
+        self._path = None
+        self._line_path = None
+        self._bounds = None
 
     def close(self):
         self._closed = True
+        self._line_path = None
 
     def reach_max_points(self):
         # 对于自由绘制模式，不限制点数
@@ -72,10 +110,13 @@ class Shape(object):
     def add_point(self, point):
         if not self.reach_max_points():
             self.points.append(point)
+            self.invalidate()
 
     def pop_point(self):
         if self.points:
-            return self.points.pop()
+            point = self.points.pop()
+            self.invalidate()
+            return point
         return None
 
     def is_closed(self):
@@ -83,6 +124,7 @@ class Shape(object):
 
     def set_open(self):
         self._closed = False
+        self._line_path = None
 
     def paint(self, painter):
         if self.points:
@@ -92,43 +134,39 @@ class Shape(object):
             pen.setWidth(max(1, int(round(2.0 / self.scale))))
             painter.setPen(pen)
 
-            line_path = QPainterPath()
+            line_path = self.make_line_path()
             vertex_path = QPainterPath()
 
-            line_path.moveTo(self.points[0])
             # Uncommenting the following line will draw 2 paths
             # for the 1st vertex, and make it non-filled, which
             # may be desirable.
             # self.drawVertex(vertex_path, 0)
 
-            for i, p in enumerate(self.points):
-                line_path.lineTo(p)
+            for i in range(len(self.points)):
                 self.draw_vertex(vertex_path, i)
-            if self.is_closed():
-                line_path.lineTo(self.points[0])
 
             painter.drawPath(line_path)
             painter.drawPath(vertex_path)
-            painter.fillPath(vertex_path, self.vertex_fill_color)
+            if self._highlight_index is not None:
+                painter.fillPath(vertex_path, self.h_vertex_fill_color)
+            else:
+                painter.fillPath(vertex_path, self.vertex_fill_color)
 
             # Draw text at the top-left
             if self.paint_label:
-                min_x = sys.maxsize
-                min_y = sys.maxsize
                 min_y_label = int(1.25 * self.label_font_size)
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    font.setPointSize(self.label_font_size)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    if self.label is None:
-                        self.label = ""
-                    if min_y < min_y_label:
-                        min_y += min_y_label
-                    painter.drawText(int(min_x), int(min_y), self.label)
+                bounds = self.bounding_rect()
+                min_x = bounds.left()
+                min_y = bounds.top()
+                font = QFont()
+                font.setPointSize(self.label_font_size)
+                font.setBold(True)
+                painter.setFont(font)
+                if self.label is None:
+                    self.label = ""
+                if min_y < min_y_label:
+                    min_y += min_y_label
+                painter.drawText(int(min_x), int(min_y), self.label)
 
             if self.fill:
                 color = self.select_fill_color if self.selected else self.fill_color
@@ -141,10 +179,6 @@ class Shape(object):
         if i == self._highlight_index:
             size, shape = self._highlight_settings[self._highlight_mode]
             d *= size
-        if self._highlight_index is not None:
-            self.vertex_fill_color = self.h_vertex_fill_color
-        else:
-            self.vertex_fill_color = Shape.vertex_fill_color
         if shape == self.P_SQUARE:
             path.addRect(point.x() - d / 2, point.y() - d / 2, d, d)
         elif shape == self.P_ROUND:
@@ -165,19 +199,37 @@ class Shape(object):
         return self.make_path().contains(point)
 
     def make_path(self):
-        path = QPainterPath(self.points[0])
-        for p in self.points[1:]:
-            path.lineTo(p)
-        return path
+        """Path through the points, cached until the points change. Do not modify the returned path."""
+        if self._path is None:
+            path = QPainterPath(self.points[0])
+            for p in self.points[1:]:
+                path.lineTo(p)
+            self._path = path
+        return self._path
+
+    def make_line_path(self):
+        """Outline drawn by paint(), closed back to the first point for closed shapes."""
+        if self._line_path is None:
+            path = QPainterPath()
+            path.moveTo(self.points[0])
+            for p in self.points:
+                path.lineTo(p)
+            if self.is_closed():
+                path.lineTo(self.points[0])
+            self._line_path = path
+        return self._line_path
 
     def bounding_rect(self):
-        return self.make_path().boundingRect()
+        if self._bounds is None:
+            self._bounds = self.make_path().boundingRect()
+        return self._bounds
 
     def move_by(self, offset):
         self.points = [p + offset for p in self.points]
 
     def move_vertex_by(self, i, offset):
         self.points[i] = self.points[i] + offset
+        self.invalidate()
 
     def highlight_vertex(self, i, action):
         self._highlight_index = i
@@ -192,10 +244,8 @@ class Shape(object):
         shape.fill = self.fill
         shape.selected = self.selected
         shape._closed = self._closed
-        if self.line_color != Shape.line_color:
-            shape.line_color = self.line_color
-        if self.fill_color != Shape.fill_color:
-            shape.fill_color = self.fill_color
+        shape._line_color = self._line_color
+        shape._fill_color = self._fill_color
         shape.difficult = self.difficult
         return shape
 
@@ -207,3 +257,13 @@ class Shape(object):
 
     def __setitem__(self, key, value):
         self.points[key] = value
+        self.invalidate()
+
+
+def is_rectangle(shape):
+    """Closed four-point shape whose edges are axis-aligned, as drawn by the box tool and the cutter."""
+    if len(shape.points) != 4 or not shape.is_closed():
+        return False
+    p0, p1, p2, p3 = shape.points
+    return ((p0.y() == p1.y() and p1.x() == p2.x() and p2.y() == p3.y() and p3.x() == p0.x()) or
+            (p0.x() == p1.x() and p1.y() == p2.y() and p2.x() == p3.x() and p3.y() == p0.y()))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+
+class ShapeIndex(object):
+    """
+    Uniform grid over the bounding rects of the canvas shapes.
+
+    Hover and click hit-testing only look at the shapes registered in the cell
+    under the cursor instead of walking every shape. The index follows the
+    canvas shape list lazily: sync() rebuilds it when the list is replaced or
+    invalidate() was called after shapes were added, removed or relabelled, and
+    update() re-registers a shape after its points move. It also counts the
+    labels that are painted, so the canvas sizes its culling margin without
+    walking the shapes; generation changes whenever those counts may have.
+    """
+
+    def __init__(self, cell_size=128, margin=0.0):
+        """
+        :param cell_size: 网格大小（图像像素）
+        :param margin: 包围盒向外扩展的距离，使顶点拾取范围内的形状也成为候选
+        """
+        self.cell_size = cell_size
+        self.margin = margin
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self._cells = {}
+        # shape -> (加入顺序, 所在网格)
+        self._entries = {}
+        self._source = None
+        self._dirty = False
+        self._next_order = 0
+        # 显示标签的形状的标签 -> 数量
+        self.labels = Counter()
+        self.generation += 1
+
+    def invalidate(self):
+        """Mark the index stale; call it after adding, removing or relabelling shapes, or toggling their labels."""
+        self._dirty = True
+
+    def sync(self, shapes):
+        if shapes is not self._source or self._dirty:
+            self.rebuild(shapes)
+
+    def rebuild(self, shapes):
+        self.clear()
+        self._source = shapes
+        for shape in shapes:
+            self._insert(shape)
+
+    def update(self, shape):
+        """Re-register a shape whose points changed; shapes that are not indexed are ignored."""
+        entry = self._entries.get(shape)
+        if entry is None:
+            return
+        order, old_cells = entry
+        new_cells = self._cells_of(shape)
+        if new_cells == old_cells:
+            return
+        for cell in old_cells:
+            members = self._cells[cell]
+            members.remove(shape)
+            if not members:
+                del self._cells[cell]
+        for cell in new_cells:
+            self._cells.setdefault(cell, []).append(shape)
+        self._entries[shape] = (order, new_cells)
+
+    def candidates(self, point):
+        """
+        :return: 包围盒（含margin）覆盖 point 的形状，后加入的在前，与从后往前遍历形状列表的顺序一致
+        """
+        cell = (int(point.x() // self.cell_size), int(point.y() // self.cell_size))
+        shapes = self._cells.get(cell)
+        if not shapes:
+            return []
+        return sorted(shapes, key=lambda s: self._entries[s][0], reverse=True)
+
+    def in_rect(self, rect):
+        """
+        :param rect: QRectF，图像坐标
+        :return: 包围盒与 rect 相交的形状，按加入顺序从前到后，即绘制顺序
+        """
+        size = self.cell_size
+        x1, x2 = int(rect.left() // size), int(rect.right() // size)
+        y1, y2 = int(rect.top() // size), int(rect.bottom() // size)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > len(self._cells):
+            cells = [members for (cx, cy), members in self._cells.items()
+                     if x1 <= cx <= x2 and y1 <= cy <= y2]
+        else:
+            cells = [self._cells[cell] for cell in ((cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1))
+                     if cell in self._cells]
+        found = {}
+        for members in cells:
+            for shape in members:
+                if shape not in found and shape.bounding_rect().intersects(rect):
+                    found[shape] = self._entries[shape][0]
+        return sorted(found, key=found.get)
+
+    def _insert(self, shape):
+        cells = self._cells_of(shape)
+        self._entries[shape] = (self._next_order, cells)
+        self._next_order += 1
+        if shape.paint_label and shape.label:
+            self.labels[shape.label] += 1
+        for cell in cells:
+            self._cells.setdefault(cell, []).append(shape)
+
+    def _cells_of(self, shape):
+        if not shape.points:
+            return ()
+        rect = shape.bounding_rect()
+        size, margin = self.cell_size, self.margin
+        x1, x2 = int((rect.left() - margin) // size), int((rect.right() + margin) // size)
+        y1, y2 = int((rect.top() - margin) // size), int((rect.bottom() + margin) // size)
+        return tuple((cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1))
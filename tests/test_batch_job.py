@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.batchJob import BatchJob, JobCheckpoint, run_job
+
+
+class SquareJob(BatchJob):
+    title = 'square'
+    params = ('count', 'fail')
+
+    def __init__(self, count, fail=()):
+        self.count = count
+        self.fail = list(fail)
+        self.processed = []
+
+    def prepare(self):
+        return list(range(self.count))
+
+    def process(self, item):
+        self.processed.append(item)
+        if item in self.fail:
+            raise ValueError('bad item %d' % item)
+        return item * item
+
+    def finish(self, results):
+        return 'sum %d' % sum(result for _, result in results)
+
+
+class TestRunJob(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.tmp_dir, 'job.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_cancelled_after(self, job, done_before_cancel):
+        progress = []
+        report = run_job(job, progress=lambda done, total: progress.append(done),
+                         is_cancelled=lambda: progress[-1] >= done_before_cancel,
+                         checkpoint_path=self.checkpoint)
+        return report
+
+    def test_errors_are_collected(self):
+        report = run_job(SquareJob(5, fail=[2]), workers=2)
+        self.assertTrue(report.ok())
+        self.assertEqual((report.total, report.done), (5, 5))
+        self.assertEqual(report.errors, [('2', 'bad item 2')])
+        self.assertEqual(report.summary, 'sum %d' % (0 + 1 + 9 + 16))
+
+    def test_empty_job(self):
+        report = run_job(SquareJob(0), checkpoint_path=self.checkpoint)
+        self.assertTrue(report.ok())
+        self.assertEqual(report.total, 0)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_after_cancel(self):
+        report = self.run_cancelled_after(SquareJob(6), 2)
+        self.assertTrue(report.cancelled)
+        self.assertEqual(report.done, 2)
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+        job = SquareJob(6)
+        report = run_job(job, checkpoint_path=self.checkpoint)
+        self.assertTrue(report.ok())
+        self.assertEqual(report.resumed, 2)
+        self.assertEqual(job.processed, [2, 3, 4, 5])
+        self.assertEqual(report.summary, 'sum %d' % sum(i * i for i in range(6)))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_other_parameters_start_over(self):
+        self.run_cancelled_after(SquareJob(6), 2)
+        self.assertFalse(JobCheckpoint(self.checkpoint).matches('square', SquareJob(4).param_values()))
+        job = SquareJob(4)
+        report = run_job(job, checkpoint_path=self.checkpoint)
+        self.assertEqual(report.resumed, 0)
+        self.assertEqual(job.processed, [0, 1, 2, 3])
+
+    def test_truncated_last_line_is_ignored(self):
+        self.run_cancelled_after(SquareJob(6), 3)
+        with open(self.checkpoint, 'a', encoding='utf-8') as f:
+            f.write('{"index": 3, "res')
+        items, results = JobCheckpoint(self.checkpoint).load('square', SquareJob(6).param_values())
+        self.assertEqual(items, list(range(6)))
+        self.assertEqual(results, {0: 0, 1: 1, 2: 4})
+
+    def test_checkpoint_header(self):
+        self.run_cancelled_after(SquareJob(3, fail=[1]), 1)
+        with open(self.checkpoint, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+        self.assertEqual(header['title'], 'square')
+        self.assertEqual(header['params'], {'count': 3, 'fail': [1]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.fileIndex import FileIndex
+
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = [os.path.join('data', name) for name in
+                      ('cat_01.jpg', 'Dog_02.jpg', 'c_a_t.png', 'bird.jpg', 'scatter.jpg')]
+        self.index = FileIndex(self.paths)
+
+    def test_row(self):
+        self.assertEqual(self.index.row(self.paths[3]), 3)
+        self.assertIsNone(self.index.row('missing.jpg'))
+        self.assertIn(self.paths[0], self.index)
+        self.assertEqual(len(self.index), 5)
+
+    def test_remove_shifts_rows(self):
+        path = self.paths[1]
+        self.assertEqual(self.index.remove(path), 1)
+        self.assertEqual(len(self.paths), 4)
+        self.assertNotIn(path, self.index)
+        self.assertEqual(self.index.row(os.path.join('data', 'bird.jpg')), 2)
+        self.assertIsNone(self.index.remove(path))
+
+    def test_remove_after_list_changed(self):
+        # 列表模型已经删除了这一行，只需更新索引
+        path = self.paths.pop(0)
+        self.assertEqual(self.index.remove(path), 0)
+        self.assertEqual(len(self.paths), 4)
+        self.assertEqual(self.index.row(os.path.join('data', 'scatter.jpg')), 3)
+
+    def test_search_substring_before_fuzzy(self):
+        self.assertEqual(self.index.search('cat'), [0, 4, 2])
+        self.assertEqual(self.index.search('DOG'), [1])
+        self.assertEqual(self.index.search('  '), [])
+        self.assertEqual(self.index.search('zzz'), [])
+
+    def test_search_file_name_only(self):
+        self.assertEqual(self.index.search('data'), [])
+
+    def test_search_limit_and_update(self):
+        self.assertEqual(self.index.search('cat', limit=2), [0, 4])
+        self.index.remove(self.paths[0])
+        self.assertEqual(self.index.search('cat'), [3, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+import warnings
+
+import cv2
+import numpy as np
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.fog_metrics import (DIRECT_ROI_LIMIT, FOG_METRIC_RATIO_OF_MEANS, FogIntegral, batch_fog_metrics,
+                              crop_fog_metrics, detect_fog)
+
+
+def baseline_metrics(image, roi):
+    """The per-crop computation the batch tools used before the summed-area tables."""
+    x, y, w, h = roi
+    crop = image[y:y + h, x:x + w]
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+    s = hsv[:, :, 1].astype(np.float64)
+    v = hsv[:, :, 2].astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(v / s) * 10, np.nanmean(v) / np.nanmean(s) * 10
+
+
+class TestFogMetrics(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.image = rng.randint(0, 256, (300, 400, 3)).astype(np.uint8)
+        # 全黑块：S == V == 0；灰色块：S == 0 且 V > 0
+        self.image[60:70, 60:70] = 0
+        self.image[200:230, 300:330] = 128
+        self.rois = [(60, 60, 10, 10), (300, 200, 30, 30), (0, 0, 400, 300), (50, 60, 70, 80),
+                     (10, 20, 1, 1), (100, 100, 57, 33), (55, 55, 20, 20)]
+
+    def assert_matches_baseline(self, mean_ratio, ratio_of_means):
+        for i, roi in enumerate(self.rois):
+            expected = baseline_metrics(self.image, roi)
+            np.testing.assert_allclose([mean_ratio[i], ratio_of_means[i]], expected, rtol=1e-6)
+
+    def test_integral_matches_baseline(self):
+        self.assert_matches_baseline(*FogIntegral(self.image).metrics(self.rois))
+
+    def test_direct_matches_baseline(self):
+        self.assertLessEqual(len(self.rois), DIRECT_ROI_LIMIT)
+        self.assert_matches_baseline(*batch_fog_metrics(self.image, self.rois))
+        for roi in self.rois:
+            x, y, w, h = roi
+            np.testing.assert_allclose(crop_fog_metrics(self.image[y:y + h, x:x + w]),
+                                       baseline_metrics(self.image, roi), rtol=1e-6)
+
+    def test_many_boxes_use_the_same_semantics(self):
+        rois = self.rois * (DIRECT_ROI_LIMIT // len(self.rois) + 1)
+        mean_ratio, ratio_of_means = batch_fog_metrics(self.image, rois)
+        self.rois = rois
+        self.assert_matches_baseline(mean_ratio, ratio_of_means)
+
+    def test_all_black_roi_is_not_fog(self):
+        roi = (60, 60, 10, 10)
+        mean_ratio, _ = FogIntegral(self.image).metrics([roi])
+        self.assertTrue(np.isnan(mean_ratio[0]))
+        self.assertEqual(FogIntegral(self.image).detect(roi)[0], False)
+        is_fog, ratio = detect_fog(self.image, roi)
+        self.assertFalse(is_fog)
+        self.assertTrue(np.isnan(ratio))
+
+    def test_grey_roi_is_infinite(self):
+        roi = (300, 200, 30, 30)
+        self.assertEqual(FogIntegral(self.image).detect(roi), (True, float('inf')))
+        self.assertEqual(detect_fog(self.image, roi), (True, float('inf')))
+
+    def test_empty_roi_scores_zero(self):
+        rois = [(10, 10, 0, 5), (500, 500, 10, 10), (-20, -20, 5, 5)]
+        for metrics in (FogIntegral(self.image).metrics(rois), batch_fog_metrics(self.image, rois)):
+            np.testing.assert_array_equal(metrics[0], [0, 0, 0])
+            np.testing.assert_array_equal(metrics[1], [0, 0, 0])
+        self.assertEqual(detect_fog(self.image, (500, 500, 10, 10)), (False, 0.0))
+
+    def test_roi_is_clipped_to_image(self):
+        inside = FogIntegral(self.image).metrics([(350, 250, 50, 50)])
+        outside = FogIntegral(self.image).metrics([(350, 250, 80, 90)])
+        np.testing.assert_allclose(inside, outside)
+        self.assertEqual(detect_fog(self.image, (350, 250, 80, 90), metric=FOG_METRIC_RATIO_OF_MEANS)[1],
+                         detect_fog(self.image, (350, 250, 50, 50), metric=FOG_METRIC_RATIO_OF_MEANS)[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+import numpy as np
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.polygon_mask import PolygonCoverage
+
+
+class TestPolygonCoverage(unittest.TestCase):
+
+    def setUp(self):
+        # fillPoly 包含边界像素：覆盖 x, y 为 10..20 的 11 x 11 个像素
+        self.square = PolygonCoverage([(10, 10), (20, 10), (20, 20), (10, 20)])
+
+    def test_covered_pixels(self):
+        self.assertEqual(self.square.covered_pixels(0, 0, 100, 100), 121)
+        self.assertEqual(self.square.covered_pixels(10, 10, 15, 15), 25)
+        self.assertEqual(self.square.covered_pixels(15, 15, 30, 30), 36)
+        self.assertEqual(self.square.covered_pixels(30, 30, 40, 40), 0)
+
+    def test_coordinates_truncate_like_range(self):
+        self.assertEqual(self.square.covered_pixels(10.9, 10.9, 12.9, 12.9), 4)
+
+    def test_ratios(self):
+        ratios = self.square.ratios(np.array([10, 15, 30, 12]), np.array([10, 15, 30, 12]),
+                                    np.array([20, 25, 40, 12]), np.array([20, 25, 40, 20]))
+        np.testing.assert_allclose(ratios, [1.0, 36 / 100.0, 0.0, 0.0])
+
+    def test_matches_brute_force_for_triangle(self):
+        coverage = PolygonCoverage([(0, 0), (40, 0), (0, 40)])
+        mask = np.zeros((41, 41), dtype=np.int64)
+        for y in range(41):
+            for x in range(41):
+                mask[y, x] = coverage.covered_pixels(x, y, x + 1, y + 1)
+        for x1, y1, x2, y2 in ((0, 0, 41, 41), (5, 5, 20, 30), (30, 0, 41, 12), (0, 35, 8, 41)):
+            self.assertEqual(coverage.covered_pixels(x1, y1, x2, y2), mask[y1:y2, x1:x2].sum())
+        self.assertGreater(mask[:5, :5].sum(), 20)
+        self.assertEqual(mask[35:, 35:].sum(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
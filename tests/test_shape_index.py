@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+try:
+    from PyQt5.QtCore import QPointF, QRectF
+except ImportError:
+    from PyQt4.QtCore import QPointF, QRectF
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.shape import Shape
+from libs.shapeIndex import ShapeIndex
+
+
+def make_box(x, y, w, h, label='a'):
+    shape = Shape(label=label)
+    for px, py in ((x, y), (x + w, y), (x + w, y + h), (x, y + h)):
+        shape.add_point(QPointF(px, py))
+    shape.close()
+    return shape
+
+
+class TestShapeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.shapes = [make_box(10, 10, 20, 20), make_box(20, 20, 20, 20), make_box(500, 500, 10, 10)]
+        self.index = ShapeIndex(cell_size=64)
+        self.index.sync(self.shapes)
+
+    def test_candidates_latest_first(self):
+        candidates = self.index.candidates(QPointF(25, 25))
+        self.assertEqual(candidates, [self.shapes[1], self.shapes[0]])
+        self.assertEqual(self.index.candidates(QPointF(300, 300)), [])
+
+    def test_in_rect_paint_order(self):
+        self.assertEqual(self.index.in_rect(QRectF(0, 0, 100, 100)), self.shapes[:2])
+        self.assertEqual(self.index.in_rect(QRectF(0, 0, 1000, 1000)), self.shapes)
+        self.assertEqual(self.index.in_rect(QRectF(200, 200, 50, 50)), [])
+
+    def test_replaced_list_is_rebuilt(self):
+        shapes = [make_box(300, 300, 5, 5)]
+        self.index.sync(shapes)
+        self.assertEqual(self.index.in_rect(QRectF(0, 0, 1000, 1000)), shapes)
+
+    def test_same_length_change_needs_invalidate(self):
+        # 切割：删除一个形状并加入一个新形状，列表长度不变
+        new_shape = make_box(700, 700, 10, 10)
+        self.shapes.remove(self.shapes[2])
+        self.shapes.append(new_shape)
+        self.index.invalidate()
+        self.index.sync(self.shapes)
+        self.assertEqual(self.index.in_rect(QRectF(600, 600, 200, 200)), [new_shape])
+        self.assertEqual(self.index.in_rect(QRectF(450, 450, 100, 100)), [])
+
+    def test_update_after_move(self):
+        shape = self.shapes[2]
+        shape.move_by(QPointF(-480, -480))
+        self.index.update(shape)
+        self.assertIn(shape, self.index.candidates(QPointF(25, 25)))
+        self.assertEqual(self.index.in_rect(QRectF(450, 450, 100, 100)), [])
+
+    def test_painted_labels(self):
+        self.assertEqual(sum(self.index.labels.values()), 0)
+        generation = self.index.generation
+        for shape in self.shapes:
+            shape.paint_label = True
+        self.shapes[0].label = 'b'
+        self.index.invalidate()
+        self.index.sync(self.shapes)
+        self.assertEqual(self.index.labels, {'a': 2, 'b': 1})
+        self.assertNotEqual(self.index.generation, generation)
+
+
+if __name__ == '__main__':
+    unittest.main()